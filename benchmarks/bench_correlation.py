@@ -0,0 +1,32 @@
+"""Matrices de correlación y correlaciones móviles (Pearson y Spearman)."""
+from benchmarks.synthetic import SCALES, open_store
+from dashboard.correlation import LABELS, METHODS, CorrelationEngine
+
+# La matriz es k × k: con 10.000 series serían 800 MB por resultado, así que
+# a escala se toman las series del dashboard más relleno hasta este total
+MAX_SERIES = 1_000
+
+
+class Correlation:
+    params = [list(SCALES), list(METHODS)]
+    param_names = ['escala', 'método']
+
+    def setup(self, scale, method):
+        store = open_store(scale)
+        extra = [n for n in store.names if n.startswith('s') and n[1:].isdigit()]
+        labels = {**LABELS, **{n: n for n in extra[:MAX_SERIES - len(LABELS)]}}
+        self.engine = CorrelationEngine(store, labels)
+        years = self.engine.years
+        self.window = (int(years[len(years) // 2]), int(years[-1]))
+
+    def time_matrix(self, scale, method):
+        self.engine._cache.clear()
+        self.engine.matrix(method=method)
+
+    def time_matrix_window(self, scale, method):
+        self.engine._cache.clear()
+        self.engine.matrix(*self.window, method=method)
+
+    def time_rolling(self, scale, method):
+        self.engine._cache.clear()
+        self.engine.rolling('Total', 8, method=method)
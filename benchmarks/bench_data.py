@@ -0,0 +1,61 @@
+"""Carga del bundle, métricas derivadas (participaciones, YoY, CAGR, rankings) y anomalías."""
+import numpy as np
+
+from benchmarks.synthetic import SCALES, open_store
+from dashboard.anomaly import AnomalyDetector
+from dashboard.datastore import INDEX, DataStore
+from dashboard.derived import MEDIA, Derived
+
+
+class DataLoad:
+    """``load_data`` de app.py: abrir el bundle (mmap) y leer todas las columnas."""
+    params = [list(SCALES)]
+    param_names = ['escala']
+
+    def setup(self, scale):
+        self.root = open_store(scale).root
+
+    def time_open(self, scale):
+        DataStore.open(self.root)
+
+    def time_open_read_all(self, scale):
+        store = DataStore.open(self.root)
+        store.matrix([n for n in store.names if n != INDEX]).sum()
+
+
+class DerivedMetrics:
+    """``Derived`` sobre los medios más todas las series de relleno del bundle."""
+    params = [list(SCALES)]
+    param_names = ['escala']
+
+    def setup(self, scale):
+        self.store = open_store(scale)
+        self.names = MEDIA + tuple(n for n in self.store.names if n.startswith('s') and n[1:].isdigit())
+        self.derived = Derived(self.store, names=self.names)
+        years = self.derived.years
+        self.start = np.full(len(self.names), years[0])
+        self.end = np.full(len(self.names), years[-1])
+
+    def time_build(self, scale):
+        # Participaciones, YoY, rankings y CAGR del período real, todo de una vez
+        Derived(self.store, names=self.names)
+
+    def time_cagr(self, scale):
+        self.derived.cagr(self.names, self.start, self.end)
+
+    def time_ranking(self, scale):
+        self.derived.ranking(int(self.derived.years[-1]))
+
+
+class Anomalies:
+    """Detector de años anómalos sobre todas las series del bundle, en una pasada (con la lectura de las columnas)."""
+    params = [list(SCALES)]
+    param_names = ['escala']
+    timeout = 300
+
+    def setup(self, scale):
+        self.store = open_store(scale)
+        AnomalyDetector(self.store).alerts()      # archivos ya en la caché de páginas
+
+    def time_scan(self, scale):
+        AnomalyDetector(self.store).alerts()
@@ -0,0 +1,38 @@
+"""Construcción, serialización y compactación de cada figura de las pestañas (lo que paga un fallo de caché)."""
+from benchmarks.synthetic import SCALES, open_store
+from dashboard import figures
+from dashboard.context import data_view
+from dashboard.models import FAMILIES, model_service
+from dashboard.payload import compact_json
+from dashboard.warm import default_charts
+
+# Los mismos gráficos que precalienta ``dashboard.warm``, con los valores iniciales de los widgets
+CHARTS = (
+    'total_trend', 'media_stack', 'media_share', 'total_yoy', 'macro_context',
+    'forecast_category', 'cagr_bars', 'forecast_comparison',
+    'media_lines', 'share_pie', 'media_ranking',
+    'digital_vs_internet', 'digital_growth', 'digital_share', 'internet_vs_digital',
+    'corr_heatmap', 'trm_scatter', 'ipc_scatter', 'corr_ranking', 'rolling_corr',
+    'model_aic', 'model_rmse', 'forecast_ci', 'backtest_horizon',
+    'scenario_drivers', 'scenario_total', 'scenario_categories',
+    'budget_frontier', 'budget_allocation',
+)
+
+
+class Figures:
+    params = [list(SCALES), list(CHARTS)]
+    param_names = ['escala', 'gráfico']
+    timeout = 300
+
+    def setup(self, scale, chart):
+        store = open_store(scale)
+        self.D = data_view(store)
+        self.kwargs = dict(default_charts(self.D, model_service().comparison(store), FAMILIES))[chart]
+        self.build = getattr(figures, chart)
+        self.raw = self.build(self.D, **self.kwargs).to_json()   # pronósticos, escenarios y corridas ya en D
+
+    def time_build(self, scale, chart):
+        self.build(self.D, **self.kwargs).to_json()
+
+    def time_compact(self, scale, chart):
+        compact_json(self.raw)
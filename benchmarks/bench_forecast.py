@@ -0,0 +1,105 @@
+"""Pronóstico: ajustes log-lineales, bootstrap, jerarquía, reconciliación y backtest."""
+import numpy as np
+
+from benchmarks.synthetic import SCALES, open_store
+from dashboard.backtest import Backtester
+from dashboard.cache import MemoryBackend
+from dashboard.forecast import CATEGORIES, N_BOOT, ForecastEngine
+from dashboard.hierarchy import METHODS, Hierarchy, fit_loglinear
+from dashboard.models import FAMILIES
+
+# Series de relleno por grupo en la jerarquía sintética (país → grupo → serie)
+GROUP_SIZE = 100
+
+
+def _engine(store):
+    # Caché de memoria sin compartir: cada llamada mide el cálculo, no un acierto
+    return ForecastEngine(store, shared=MemoryBackend())
+
+
+class Forecast:
+    params = [list(SCALES)]
+    param_names = ['escala']
+
+    def setup(self, scale):
+        self.store = open_store(scale)
+        self.fit = _engine(self.store).fit('TOTAL')
+        last = int(self.store.years[-1])
+        self.fc_yrs = np.arange(last + 1, last + 7)
+        _engine(self.store).reconciled()       # jerarquía del bundle, fuera de la medición
+
+    def time_fit_categories(self, scale):
+        engine = _engine(self.store)
+        for c in CATEGORIES:
+            engine.fit(c)
+
+    def time_bootstrap(self, scale):
+        self.fit.bootstrap(self.fc_yrs, n_boot=N_BOOT)
+
+    def time_forecast_all(self, scale):
+        engine = _engine(self.store)
+        for c in CATEGORIES:
+            engine.forecast(c)
+
+    def time_coherent_all(self, scale):
+        # ``D['forecast']``: base + reconciliación MinT + IC escalado
+        engine = _engine(self.store)
+        for c in CATEGORIES:
+            engine.coherent(c)
+
+
+def _leaves(store):
+    """Todas las series del bundle como hojas de una jerarquía país → grupo → serie."""
+    names = [n for n in store.names if n != 'years' and n not in ('total', 'tv')]
+    return names, {n: ('Total', f'g{i // GROUP_SIZE:03d}', n) for i, n in enumerate(names)}
+
+
+class HierarchyFit:
+    params = [list(SCALES)]
+    param_names = ['escala']
+
+    def setup(self, scale):
+        store = open_store(scale)
+        names, self.paths = _leaves(store)
+        self.years = np.asarray(store.years)
+        self.Y = store.matrix(names)
+        self.mask = self.Y > 0
+
+    def time_hierarchy(self, scale):
+        Hierarchy(self.paths)
+
+    def time_fit_loglinear(self, scale):
+        fit_loglinear(self.years, self.Y, self.mask)
+
+
+class Reconcile:
+    params = [list(SCALES), list(METHODS)]
+    param_names = ['escala', 'método']
+
+    def setup(self, scale, method):
+        store = open_store(scale)
+        names, paths = _leaves(store)
+        years = np.asarray(store.years)
+        self.h = Hierarchy(paths)
+        Y = self.h.aggregate(store.matrix(names))
+        a, b, var = fit_loglinear(years, Y, Y > 0)
+        t = np.arange(1, 7) + years[-1] - years[0]
+        self.base = np.exp(a[:, None] + b[:, None] * t)
+        self.var = var[:, None] * self.base ** 2
+
+    def time_reconcile(self, scale, method):
+        self.h.reconcile(self.base, method, self.var)
+
+
+class Backtest:
+    params = [list(SCALES), list(FAMILIES)]
+    param_names = ['escala', 'familia']
+
+    def setup(self, scale, family):
+        self.store = open_store(scale)
+
+    def time_rolling_origin(self, scale, family):
+        # Sin caché en disco: todos los orígenes y horizontes de las 8 categorías
+        bt = Backtester(self.store, cache_dir=None)
+        for c in CATEGORIES:
+            bt.folds(family, c)
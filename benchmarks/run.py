@@ -0,0 +1,169 @@
+"""
+Suite de benchmarks del dashboard, sin servidor de Streamlit.
+
+Los módulos ``benchmarks/bench_*.py`` siguen la convención de asv: clases con
+``params``/``param_names``, ``setup`` y métodos ``time_*``. Cubren la carga
+del bundle, las métricas derivadas, los ajustes y el bootstrap del
+pronóstico, la reconciliación, las correlaciones, las anomalías y la
+construcción de cada figura, sobre el bundle embebido y uno sintético de 10.000 series × 500
+períodos (``benchmarks/synthetic.py``; se escribe la primera vez, unos 80 MB).
+
+    python benchmarks/run.py                       # todo, compara contra suite.json
+    python benchmarks/run.py -b Figures -s embebido
+    python benchmarks/run.py --update              # registra la línea base actual
+
+Cada caso se calienta con una llamada y se toma la mínima de ``--repeat``
+rondas (cada ronda repite la llamada hasta durar al menos ``MIN_TIME``): la
+carga de la máquina sólo suma tiempo, así que el mínimo es lo más estable.
+
+Las líneas base son tiempos absolutos de la máquina que corrió ``--update``.
+Para compararlas en otra (o en la misma con otra carga) la suite mide primero
+un caso de calibración fijo (NumPy y Python puro) y escala la línea base por
+su cociente contra el ``calibración`` guardado, que se vuelve a medir cada
+``RECALIBRATE`` segundos. Por debajo de ``NOISE_FLOOR``
+los tiempos se comparan como si valieran ese piso: un caso de microsegundos
+no falla por ruido. Un caso que supera la tolerancia se vuelve a medir hasta
+``CONFIRM`` veces, con calibración nueva, antes de darlo por regresión. Sale
+con código 1 si alguno sigue por encima o falla.
+"""
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import re
+import sys
+import time
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+BASELINE = Path(__file__).with_name('suite.json')
+# Esta clase de máquinas (VM compartidas) varía hasta ~1,8× entre minutos: se falla recién al doble
+TOLERANCE = 1.0
+MIN_TIME = 0.05
+NOISE_FLOOR = 1e-3
+CONFIRM = 2
+# La carga de la máquina cambia durante la corrida: la calibración se renueva cada tanto
+RECALIBRATE = 30.0
+CALIBRATION = 'calibración'
+
+
+def discover(pattern=None, scale=None):
+    """[(nombre, clase, parámetros, método)] de los módulos ``bench_*``."""
+    cases = []
+    for path in sorted(Path(__file__).parent.glob('bench_*.py')):
+        module = importlib.import_module(f'benchmarks.{path.stem}')
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            grid = list(itertools.product(*getattr(cls, 'params', [])))
+            methods = sorted(m for m in dir(cls) if m.startswith('time_'))
+            for params in grid:
+                if scale is not None and scale not in params:
+                    continue
+                for method in methods:
+                    name = f"{path.stem[6:]}.{cls_name}.{method}({', '.join(map(str, params))})"
+                    if pattern is None or re.search(pattern, name):
+                        cases.append((name, cls, params, method))
+    return cases
+
+
+def measure(fn, repeat):
+    t = time.perf_counter()
+    fn()                                     # calentamiento
+    number = max(1, int(MIN_TIME / max(time.perf_counter() - t, 1e-9)))
+    return min(timeit.Timer(fn).repeat(repeat, number)) / number
+
+
+def calibrate(n=256):
+    """Carga fija parecida a la de la suite: álgebra y ordenamientos de NumPy más un bucle de Python."""
+    a = np.random.default_rng(0).standard_normal((n, n))
+    for _ in range(3):
+        a = np.tanh(a @ a.T / n)
+    np.sort(a, axis=1).cumsum(axis=0)
+    return sum(i * i for i in range(50_000))
+
+
+def machine_scale(base, repeat):
+    """(tiempo de calibración, factor de esta máquina respecto de la línea base)."""
+    t = measure(calibrate, repeat)
+    return t, (t / base[CALIBRATION] if CALIBRATION in base else 1.0)
+
+
+def ratio(result, base, speed):
+    """Cociente contra la línea base escalada, con ``NOISE_FLOOR`` como piso de ambos tiempos."""
+    return max(result, NOISE_FLOOR) / max(base * speed, NOISE_FLOOR)
+
+
+def _fmt(seconds):
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:9.1f} µs'
+    return f'{seconds * 1e3:9.2f} ms' if seconds < 1 else f'{seconds:9.2f} s '
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks de datos, pronóstico, correlaciones y figuras')
+    parser.add_argument('-b', '--bench', help='regex sobre el nombre del caso')
+    parser.add_argument('-s', '--scale', help='sólo una escala (embebido, 10k×500)')
+    parser.add_argument('-n', '--repeat', type=int, default=5)
+    parser.add_argument('--update', action='store_true', help='guarda los tiempos como línea base')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    base = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    cal, speed = machine_scale(base, args.repeat)
+    print(f'{CALIBRATION:<70} {_fmt(cal)}  {speed:5.2f}× (máquina)', flush=True)
+    results, failed = {CALIBRATION: cal}, False
+    key = bench = fn = None
+    calibrated = time.perf_counter()
+    for name, cls, params, method in discover(args.bench, args.scale):
+        if time.perf_counter() - calibrated > RECALIBRATE:
+            _, speed = machine_scale(base, args.repeat)
+            calibrated = time.perf_counter()
+        try:
+            # Un setup por clase y parámetros, compartido por sus métodos consecutivos
+            if key != (cls, params):
+                bench = fn = None                # suelta los datos del caso anterior
+                bench = cls()
+                if hasattr(bench, 'setup'):
+                    bench.setup(*params)
+                key = (cls, params)
+            fn = getattr(bench, method)
+            results[name] = measure(lambda: fn(*params), args.repeat)
+        except Exception as exc:
+            print(f'{name:<70} error: {exc!r}')
+            failed = True
+            continue
+        line = f'{name:<70} {_fmt(results[name])}'
+        if name in base:
+            r = ratio(results[name], base[name], speed)
+            for _ in range(CONFIRM):
+                if r <= 1 + args.tolerance:
+                    break
+                # Se confirma con otra medición: un pico de carga no alcanza para fallar
+                _, speed = machine_scale(base, args.repeat)
+                calibrated = time.perf_counter()
+                again = measure(lambda: fn(*params), args.repeat)
+                results[name] = min(results[name], again)
+                r = min(r, ratio(again, base[name], speed))
+            line += f'  {r:5.2f}×'
+            if r > 1 + args.tolerance:
+                line += '  ← regresión'
+                failed = True
+        print(line, flush=True)
+
+    if args.update:
+        BASELINE.write_text(json.dumps({**base, **{k: round(v, 6) for k, v in results.items()}},
+                                       indent=2, ensure_ascii=False, sort_keys=True) + '\n')
+        print(f'línea base actualizada en {BASELINE.name} ({len(results)} casos)')
+    return 1 if failed and not args.update else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Benchmark de arranque en frío del dashboard.
+
+Cada medición abre un proceso nuevo y ejecuta ``app.py`` una vez en modo
+headless (``streamlit.testing``): importación de módulos, carga del bundle,
+KPIs y la primera pestaña. Es lo que paga la primera sesión de una réplica
+recién escalada.
+
+    python benchmarks/startup.py            # compara contra startup.json
+    python benchmarks/startup.py --update   # registra la línea base actual
+
+Como en ``benchmarks/run.py``, se toma la mínima de las mediciones y la línea
+base se escala por el caso de calibración (``calibración`` en startup.json)
+medido en esta máquina. Sale con código 1 si el mínimo supera la línea base
+escalada más la tolerancia, o si el primer render importa alguno de los
+módulos que deben cargarse a demanda.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.run import CALIBRATION, machine_scale  # noqa: E402
+
+BASELINE = Path(__file__).with_name('startup.json')
+TOLERANCE = 0.25
+# No deben entrar en el primer render: sólo los usan pestañas o métodos puntuales
+LAZY_MODULES = ('scipy.stats', 'pandas', 'plotly.express')
+
+_CHILD = '''
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+before = set(sys.modules)
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({"harness_ms": (t1 - t0) * 1000, "first_run_ms": (t2 - t1) * 1000,
+                  "errors": [str(e.value) for e in at.exception],
+                  "loaded": [m for m in sys.argv[2:] if m in sys.modules and m not in before]}))
+'''
+
+
+def measure(app=ROOT / 'app.py', env=None):
+    # Los módulos que ya importó el arnés de pruebas no cuentan como del render
+    out = subprocess.run([sys.executable, '-c', _CHILD, str(app), *LAZY_MODULES],
+                         cwd=ROOT, env={**os.environ, **(env or {})},
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Arranque en frío de app.py')
+    parser.add_argument('-n', '--repeat', type=int, default=5)
+    parser.add_argument('--update', action='store_true', help='guarda el mínimo como línea base')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    base = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    cal, speed = machine_scale(base, args.repeat)
+    runs = [measure() for _ in range(args.repeat)]
+    first = min(r['first_run_ms'] for r in runs)
+    each = ', '.join(f"{r['first_run_ms']:.0f}" for r in runs)
+    print(f'primer render: mínimo {first:.0f} ms · {each} ms · máquina {speed:.2f}×')
+    failed = False
+    for r in runs:
+        if r['errors']:
+            print(f"error en la app: {r['errors'][0]}")
+            failed = True
+    loaded = sorted({m for r in runs for m in r['loaded']})
+    if loaded:
+        print(f"importados en el primer render: {', '.join(loaded)}")
+        failed = True
+
+    if args.update:
+        BASELINE.write_text(json.dumps({CALIBRATION: round(cal, 6), 'first_run_ms': round(first)},
+                                       indent=2, ensure_ascii=False) + '\n')
+        print(f'línea base actualizada en {BASELINE.name}')
+    elif 'first_run_ms' in base:
+        limit = base['first_run_ms'] * speed * (1 + args.tolerance)
+        print(f"línea base {base['first_run_ms']} ms · límite {limit:.0f} ms")
+        if first > limit:
+            print('regresión de arranque en frío')
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Bundles sintéticos para los benchmarks.
+
+Mismas series que el bundle real (medios, total, tv, IPC, TRM, Internet) pero
+con ``n_periods`` años terminando en 2025, más series de relleno ``s00000``…
+hasta ``n_series`` columnas (el caso de un bundle por anunciante). Pasa por la
+limpieza y los agregados de ``dashboard.build``, así que la app y los motores
+lo abren como a cualquier bundle; los ajustes de modelos no se corren (la
+tabla ``metrics`` queda vacía).
+
+Se escribe una sola vez por forma y semilla en ``DASHBOARD_BENCH_DIR`` (por
+defecto el directorio temporal): asv corre cada benchmark en un proceso nuevo.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from dashboard.build import clean, periods, regression
+from dashboard.datastore import DEFAULT_DATA_DIR, DataStore, write_bundle
+from dashboard.derived import MEDIA
+from dashboard.hierarchy import NATIONAL
+
+BENCH_DIR = Path(os.environ.get('DASHBOARD_BENCH_DIR', Path(tempfile.gettempdir()) / 'dashboard-bench'))
+LAST_YEAR = 2025
+SEED = 7
+# Escalas de los benchmarks: el bundle embebido y uno sintético grande
+SCALES = {'embebido': None, '10k×500': (10_000, 500)}
+# Año de inicio relativo de cada medio (Digital y Exterior arrancan tarde, como en el real)
+LATE_START = {'digital': 0.55, 'exterior': 0.3, 'revistas': 0.1}
+
+
+def _walk(rng, n_rows, n_periods, level, drift, vol):
+    steps = rng.normal(drift, vol, size=(n_rows, n_periods))
+    return level * np.exp(np.cumsum(steps, axis=1))
+
+
+def synthetic_columns(n_series, n_periods, seed=SEED):
+    """(años, {serie: valores}, {serie: [primer, último] año observado})."""
+    rng = np.random.default_rng(seed)
+    years = np.arange(LAST_YEAR - n_periods + 1, LAST_YEAR + 1)
+    media = _walk(rng, len(MEDIA), n_periods, rng.uniform(5e4, 5e5, (len(MEDIA), 1)), 0.03, 0.08)
+    obs = {}
+    for name, values in zip(MEDIA, media):
+        first = int(n_periods * LATE_START.get(name, 0))
+        obs[name] = dict(zip(years[first:].tolist(), values[first:].tolist()))
+    t = np.linspace(-6, 4, n_periods)
+    obs['internet'] = dict(zip(years.tolist(), (1 / (1 + np.exp(-t)) * 0.9).tolist()))
+    obs['ipc'] = dict(zip(years.tolist(), np.abs(rng.normal(0.05, 0.02, n_periods)).tolist()))
+    obs['trm'] = dict(zip(years.tolist(), _walk(rng, 1, n_periods, 1000.0, 0.004, 0.05)[0].tolist()))
+    years, columns, observed = clean(obs)
+    extra = n_series - len(columns)
+    if extra > 0:
+        X = _walk(rng, extra, n_periods, rng.uniform(1e3, 1e6, (extra, 1)), 0.02, 0.1)
+        columns.update({f's{i:05d}': X[i] for i in range(extra)})
+    return years, columns, observed
+
+
+def synthetic_bundle(n_series, n_periods, seed=SEED, root=None):
+    """Ruta del bundle sintético; lo escribe si todavía no existe."""
+    root = Path(root or BENCH_DIR / f'synthetic-{n_series}x{n_periods}-{seed}')
+    if not (root / 'meta.json').exists():
+        years, columns, observed = synthetic_columns(n_series, n_periods, seed)
+        per = periods(years, columns, observed)
+        tables = {'regression': regression(years, columns, per['Digital']), 'metrics': {},
+                  'periods': per, 'observed': observed,
+                  'hierarchy': {n: list(p) for n, p in NATIONAL.items()}}
+        write_bundle(root, years, columns, tables)
+    return root
+
+
+def open_store(scale):
+    """``DataStore`` de una de las ``SCALES``."""
+    shape = SCALES[scale]
+    return DataStore.open(DEFAULT_DATA_DIR if shape is None else synthetic_bundle(*shape))
@@ -0,0 +1,4 @@
+"""
+Núcleo de datos y cálculo del dashboard de inversión publicitaria.
+app.py sólo se encarga de la presentación; todo lo que no es Streamlit vive aquí.
+"""
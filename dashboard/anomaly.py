@@ -0,0 +1,201 @@
+"""
+Detección de años anómalos en todas las series del bundle.
+
+Complementa las rupturas de ``dashboard.breaks``: una ruptura es un cambio
+persistente en el nivel o la pendiente de la tendencia; una anomalía es un año
+que se sale de su tendencia y vuelve (la caída de 2020 por COVID, un pico de
+inflación).
+
+Cada serie se descompone como STL sin componente estacional (los datos son
+anuales): tendencia loess local lineal de ``WINDOW`` años con
+``ROBUST_ITERS`` pasadas de pesos bicuadrados, y residuo. Los medios y demás
+series positivas se analizan en log (desvío relativo); IPC e Internet, que
+son tasas, en niveles (desvío en puntos). Un año queda marcado cuando su
+residuo es atípico frente a las dos escalas robustas:
+
+  z        residuo / (1,4826 · MAD de los residuos de la serie)  ≥ ``Z_STL``
+  z local  (residuo − mediana móvil) / (1,4826 · MAD móvil de ``MAD_WINDOW``
+           años)                                                  ≥ ``Z_LOCAL``
+
+La primera descarta el ruido habitual de la serie; la segunda, los tramos
+volátiles donde un residuo grande es normal. Todo corre sobre la matriz
+series × años por bloques de ``CHUNK`` filas, sin bucles por serie, así que
+un bundle regional de miles de columnas sale en una pasada. El resultado se
+calcula una vez por versión de datos (``anomalies_for``).
+"""
+import threading
+
+import numpy as np
+
+from dashboard.datastore import INDEX, VersionRegistry
+from dashboard.forecast import CATEGORIES
+
+WINDOW = 7
+MAD_WINDOW = 9
+ROBUST_ITERS = 2
+Z_STL = 3.5
+Z_LOCAL = 3.0
+MIN_POINTS = 8
+# Piso de las escalas: 0,1 % en log o 0,1 pp en las tasas
+MIN_SCALE = 1e-3
+# Filas por bloque: las sumas de un bloque de 128 × 500 años entran en la caché del procesador
+CHUNK = 128
+MAD_K = 1.4826
+RATES = ('ipc', 'internet')
+LABELS = {**{col: cat for cat, col in CATEGORIES.items()},
+          'tv': 'TV', 'ipc': 'IPC', 'trm': 'TRM', 'internet': 'Internet'}
+
+
+def _nanmedian(a):
+    """Mediana del último eje ignorando NaN (NaN si no hay valores); más rápida que ``np.nanmedian``."""
+    s = np.sort(a, axis=-1)                 # los NaN quedan al final
+    n = (~np.isnan(a)).sum(axis=-1, keepdims=True)
+    lo = np.take_along_axis(s, np.maximum(n - 1, 0) // 2, axis=-1)
+    hi = np.take_along_axis(s, n // 2 - (n == 0), axis=-1)
+    return np.where(n > 0, (lo + hi) / 2, np.nan)[..., 0]
+
+
+def _windows(T, width):
+    """Índices (T × ``width``) de la ventana de cada año; en los bordes se desplaza, como en loess."""
+    width = min(width, T)
+    start = np.clip(np.arange(T) - width // 2, 0, T - width)
+    return start[:, None] + np.arange(width)
+
+
+def trend(X, M, window=WINDOW, iters=ROBUST_ITERS):
+    """Tendencia loess robusta de cada fila de ``X`` sobre sus valores en ``M``.
+
+    Regresión lineal local ponderada (tricúbica por distancia) en la ventana de
+    cada año; cada pasada robusta repondera con bicuadrados de los residuos.
+    Las sumas ponderadas se acumulan desplazamiento por desplazamiento de la
+    ventana: operaciones series × años, sin copias series × años × ventana.
+    """
+    T = X.shape[1]
+    idx = _windows(T, window)
+    u = idx - np.arange(T)[:, None]
+    d = np.abs(u) / (np.abs(u).max(axis=1, keepdims=True) + 1)
+    tri = (1 - d ** 3) ** 3
+    # Una fila por desplazamiento (contiguas) en lugar de una columna por año
+    tri, tu, tuu = tri.T.copy(), (tri * u).T.copy(), (tri * u * u).T.copy()
+    X0 = np.where(M, X, 0.0)
+    rob = M.astype(np.float64)
+    for _ in range(iters + 1):
+        V, VX = rob, rob * X0
+        s0, s1, s2, sy, suy = (np.zeros_like(X0) for _ in range(5))
+        for k in range(idx.shape[1]):
+            v, vx = V[:, idx[:, k]], VX[:, idx[:, k]]
+            s0 += v * tri[k]
+            s1 += v * tu[k]
+            s2 += v * tuu[k]
+            sy += vx * tri[k]
+            suy += vx * tu[k]
+        det = s0 * s2 - s1 * s1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fit = np.where(det > 1e-9 * np.maximum(s0 * s2, 1e-300), (s2 * sy - s1 * suy) / det,
+                           sy / np.maximum(s0, 1e-12))
+        r = np.where(M, X - fit, np.nan)
+        h = 6 * np.maximum(_nanmedian(np.abs(r)), MIN_SCALE)[:, None]
+        rob = np.where(M, np.clip(1 - (r / h) ** 2, 0, 1) ** 2, 0.0)
+    return fit
+
+
+def scores(X, M, window=WINDOW):
+    """(tendencia, residuo, z) de cada fila de ``X`` (series × años, válidos en ``M``)."""
+    fit = trend(X, M, window)
+    r = np.where(M, X - fit, np.nan)
+    scale = MAD_K * _nanmedian(np.abs(r - _nanmedian(r)[:, None]))
+    scale = np.maximum(np.nan_to_num(scale), MIN_SCALE)
+    return fit, r, r / scale[:, None], scale
+
+
+def local_z(r, scale, rows, cols, mad_window=MAD_WINDOW):
+    """z local de los puntos (``rows``, ``cols``) de ``r``: mediana y MAD de su ventana de residuos.
+
+    Sólo se calcula donde hace falta (los candidatos por ``z``), no en toda la matriz.
+    """
+    rw = r[rows[:, None], _windows(r.shape[1], mad_window)[cols]]
+    med = _nanmedian(rw)
+    mad = MAD_K * _nanmedian(np.abs(rw - med[:, None]))
+    # Una ventana muy tranquila no debe convertir un residuo chico en anomalía
+    return (r[rows, cols] - med) / np.maximum(np.nan_to_num(mad), scale[rows] / 2)
+
+
+_FIELDS = ('year', 'value', 'expected', 'deviation', 'z', 'z_local')
+
+
+def detect(years, Y, M, rates, z_stl=Z_STL, z_local=Z_LOCAL):
+    """Anomalías de cada fila de ``Y``: {fila: [{'year', 'value', 'expected', 'deviation', 'z', 'z_local'}]}.
+
+    ``rates`` (bool por fila) marca las que se analizan en niveles; ``deviation`` es %
+    sobre lo esperado en las demás y puntos porcentuales en esas.
+    """
+    years = np.asarray(years)
+    Y = np.asarray(Y, dtype=np.float64)
+    M = np.asarray(M, dtype=bool) & np.isfinite(Y) & (rates[:, None] | (Y > 0))
+    M &= M.sum(axis=1, keepdims=True) >= MIN_POINTS
+    out = {}
+    for lo in range(0, len(Y), CHUNK):
+        sl = slice(lo, lo + CHUNK)
+        rate = rates[sl, None]
+        X = np.where(rate, Y[sl], np.log(np.where(M[sl], Y[sl], 1.0)))
+        fit, r, z, scale = scores(X, M[sl])
+        with np.errstate(invalid='ignore'):
+            rows, cols = np.nonzero(M[sl] & (np.abs(z) >= z_stl))
+        zl = local_z(r, scale, rows, cols)
+        keep = (np.abs(zl) >= z_local) & (np.sign(zl) == np.sign(z[rows, cols]))
+        rows, cols, zl = rows[keep], cols[keep], zl[keep]
+        value, rate_k = Y[lo + rows, cols], rates[lo + rows]
+        expected = np.where(rate_k, fit[rows, cols], np.exp(fit[rows, cols]))
+        dev = np.where(rate_k, value - expected, value / expected - 1) * 100
+        for i, *vals in zip((lo + rows).tolist(), years[cols].tolist(), value.tolist(), expected.tolist(),
+                            np.round(dev, 2).tolist(), np.round(z[rows, cols], 2).tolist(),
+                            np.round(zl, 2).tolist()):
+            out.setdefault(i, []).append(dict(zip(_FIELDS, vals)))
+    return out
+
+
+class AnomalyDetector:
+    """Anomalías de todas las series de un bundle, calculadas en una pasada la primera vez que se piden."""
+
+    def __init__(self, store):
+        self.store = store
+        self.names = [n for n in store.names if n != INDEX]
+        self._alerts = None
+        self._lock = threading.Lock()
+
+    def _mask(self):
+        years = np.asarray(self.store.years)
+        M = np.ones((len(self.names), len(years)), dtype=bool)
+        pos = {n: i for i, n in enumerate(self.names)}
+        for table, index in (('observed', lambda k: k), ('periods', CATEGORIES.get)):
+            for key, (first, last) in self.store.tables.get(table, {}).items():
+                i = pos.get(index(key))
+                if i is not None:
+                    M[i] &= (years >= first) & (years <= last)
+        return M
+
+    def _scan(self):
+        with self._lock:
+            if self._alerts is None:
+                rates = np.array([n in RATES for n in self.names])
+                found = detect(self.store.years, self.store.matrix(self.names), self._mask(), rates)
+                self._alerts = {self.names[i]: sorted(a, key=lambda x: x['year']) for i, a in found.items()}
+        return self._alerts
+
+    def anomalies(self, name):
+        """[{'year', 'value', 'expected', 'deviation', 'z', 'z_local'}] de ``name``, por año."""
+        return self._scan().get(name, [])
+
+    def alerts(self, names=None):
+        """Tabla de alertas (``names`` o todas las series), de la más a la menos atípica."""
+        found = self._scan()
+        rows = [{'series': n, 'label': LABELS.get(n, n), 'unit': 'pp' if n in RATES else '%', **a}
+                for n in (found if names is None else names) for a in found.get(n, [])]
+        return sorted(rows, key=lambda a: -abs(a['z']))
+
+
+_DETECTORS = VersionRegistry(AnomalyDetector)
+
+
+def anomalies_for(store):
+    return _DETECTORS.get(store)
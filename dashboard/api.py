@@ -0,0 +1,311 @@
+"""
+API HTTP sin interfaz con los datos y pronósticos del dashboard.
+
+    python -m dashboard.api --port 8502
+
+Rutas (GET/HEAD):
+  /v1/meta                                  versión, series, categorías y períodos
+  /v1/series?names=tv,digital               histórico (año × serie)
+  /v1/forecast?categories=TOTAL,Digital     ``D['forecast']`` en formato largo
+              &horizon=6                    (histórico + pronóstico con IC)
+              &reconcile=mint               reconciliación (bu, ols, wls_struct, mint)
+                                            o ``none`` para el pronóstico base
+  /v1/projection                            la "Tabla de Proyección" de Pronóstico
+  /v1/metrics                               ``D['metrics']`` por categoría y familia
+  /metrics                                  instrumentación del proceso en texto
+                                            Prometheus (``dashboard.telemetry``)
+
+Las tablas salen como JSON columnar compacto o, con ``?format=arrow`` o
+``Accept: application/vnd.apache.arrow.stream``, como Arrow IPC. El ETag es la
+versión del bundle más la consulta: un cliente que repite con
+``If-None-Match`` recibe 304 sin cuerpo mientras los datos no cambien. Las
+respuestas se comprimen con gzip si el cliente lo acepta y se cachean ya
+codificadas.
+
+Usa el mismo bundle (``DASHBOARD_DATA_DIR``) y el mismo motor de pronóstico que
+app.py; dentro del mismo proceso comparten la caché
+(``python -m dashboard.warm --api-port 8502``). Si el pipeline reescribe el
+bundle, la próxima petición abre la versión nueva.
+"""
+import argparse
+import gzip
+import hashlib
+import importlib.util
+import json
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from dashboard.context import data_view
+from dashboard.datastore import DEFAULT_DATA_DIR, live_store
+from dashboard.forecast import CATEGORIES, HORIZON, RECONCILE, TABLE_CATEGORIES, engine_for
+from dashboard.hierarchy import METHODS
+from dashboard.telemetry import telemetry
+
+ARROW = 'application/vnd.apache.arrow.stream'
+# Arrow es opcional (pip install pyarrow): sin él, pedirlo responde 406
+ARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+JSON = 'application/json'
+PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+MAX_HORIZON = 20
+MIN_GZIP = 512
+CACHE_SIZE = 512
+
+
+def _column(values):
+    """Lista serializable: NaN → None (null en JSON, nulo en Arrow)."""
+    arr = np.asarray(values)
+    if arr.dtype.kind == 'f':
+        return [None if v != v else v for v in arr.tolist()]
+    return arr.tolist()
+
+
+def _names(params, key, allowed):
+    raw = params.get(key)
+    if not raw:
+        return list(allowed)
+    names = [n.strip() for n in raw.split(',') if n.strip()]
+    unknown = [n for n in names if n not in allowed]
+    if unknown:
+        raise ValueError(f"{key}: desconocidos {', '.join(unknown)}")
+    return names
+
+
+# ─── RUTAS ──────────────────────────────────────────────────────
+# route(store, params) -> tabla {columna: lista}; meta devuelve un dict libre
+
+def route_meta(store, params):
+    years = np.asarray(store.years)
+    return {'version': store.version, 'years': [int(years[0]), int(years[-1])],
+            'series': list(store.names), 'categories': list(CATEGORIES),
+            'periods': store.tables.get('periods', {})}
+
+
+def route_series(store, params):
+    names = _names(params, 'names', store.names)
+    return {'year': _column(store.years), **{n: _column(store[n]) for n in names}}
+
+
+def route_forecast(store, params):
+    categories = _names(params, 'categories', CATEGORIES)
+    try:
+        horizon = int(params.get('horizon', HORIZON))
+    except ValueError:
+        raise ValueError('horizon debe ser un entero') from None
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f'horizon debe estar entre 1 y {MAX_HORIZON}')
+    method = params.get('reconcile', RECONCILE or 'none')
+    if method not in METHODS + ('none',):
+        raise ValueError(f"reconcile debe ser uno de {', '.join(METHODS + ('none',))}")
+    engine = engine_for(store)
+    out = {'category': [], 'year': [], 'kind': [], 'value': [], 'lo': [], 'hi': []}
+    for c in categories:
+        fc = engine.forecast(c, horizon=horizon) if method == 'none' else engine.coherent(c, horizon, method)
+        n_h, n_f = len(fc['hist_x']), len(fc['fc_yrs'])
+        out['category'] += [c] * (n_h + n_f)
+        out['year'] += fc['hist_x'] + fc['fc_yrs']
+        out['kind'] += ['hist'] * n_h + ['fc'] * n_f
+        out['value'] += fc['hist_y'] + fc['fc']
+        out['lo'] += [None] * n_h + fc['lo']
+        out['hi'] += [None] * n_h + fc['hi']
+    return out
+
+
+def route_projection(store, params):
+    D = data_view(store)
+    out = {'year': list(D['forecast']['TOTAL']['fc_yrs'])}
+    for c in TABLE_CATEGORIES:
+        fc = D['forecast'][c]
+        out[c], out[f'{c} lo'], out[f'{c} hi'] = fc['fc'], fc['lo'], fc['hi']
+    return out
+
+
+def route_metrics(store, params):
+    cols = ('category', 'family', 'n', 'k', 'aic', 'bic', 'rmse', 'cagr')
+    out = {c: [] for c in cols}
+    for category, m in store.tables.get('metrics', {}).items():
+        for family, res in m.get('models', {}).items():
+            row = {**res, 'category': category, 'family': family, 'cagr': m.get('cagr')}
+            for c in cols:
+                out[c].append(row.get(c))
+    return out
+
+
+ROUTES = {
+    '/v1/meta': route_meta, '/v1/series': route_series, '/v1/forecast': route_forecast,
+    '/v1/projection': route_projection, '/v1/metrics': route_metrics,
+}
+TABULAR = {'/v1/series', '/v1/forecast', '/v1/projection', '/v1/metrics'}
+
+
+def encode(payload, fmt, version, tabular=True):
+    """Arrow IPC (stream) o JSON; las tablas JSON van como {'version', 'columns'}."""
+    if fmt == 'arrow':
+        import pyarrow as pa
+
+        table = pa.table(payload).replace_schema_metadata({'version': version})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    body = {'version': version, 'columns': payload} if tabular else payload
+    return json.dumps(body, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode()
+
+
+# ─── SERVICIO ───────────────────────────────────────────────────
+
+class DataApi:
+    """Resuelve peticiones contra la versión vigente del bundle, con caché de respuestas."""
+
+    def __init__(self, root=DEFAULT_DATA_DIR, cache_size=CACHE_SIZE):
+        self.root = Path(root)
+        self.cache_size = cache_size
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        # Se reabre cuando cambia meta.json; la app y la ingesta comparten la instancia
+        return live_store(self.root)
+
+    @staticmethod
+    def etag(version, path, query, fmt):
+        h = hashlib.sha1(f'{path}?{query}|{fmt}'.encode()).hexdigest()[:12]
+        return f'W/"{version}-{h}"'
+
+    def response(self, path, params, fmt, compress, if_none_match=None):
+        """(cuerpo, etag, gzip?) de la ruta; cuerpo None si el ETag del cliente sigue vigente.
+
+        Lanza LookupError (ruta) o ValueError (parámetros).
+        """
+        if path not in ROUTES:
+            raise LookupError(path)
+        if fmt == 'arrow' and path not in TABULAR:
+            raise ValueError(f'{path} sólo está disponible en JSON')
+        store = self.store
+        query = '&'.join(f'{k}={v}' for k, v in sorted(params.items()))
+        etag = self.etag(store.version, path, query, fmt)
+        if if_none_match and (if_none_match.strip() == '*'
+                              or etag in [t.strip() for t in if_none_match.split(',')]):
+            return None, etag, False
+        key = (store.version, path, query, fmt)
+        with self._lock:
+            entry = self._responses.get(key)
+            if entry is not None:
+                self._responses.move_to_end(key)
+        if entry is None:
+            entry = {'body': encode(ROUTES[path](store, params), fmt, store.version, path in TABULAR)}
+            with self._lock:
+                self._responses[key] = entry
+                while len(self._responses) > self.cache_size:
+                    self._responses.popitem(last=False)
+        if compress and len(entry['body']) >= MIN_GZIP:
+            if 'gzip' not in entry:
+                entry['gzip'] = gzip.compress(entry['body'], compresslevel=6)
+            return entry['gzip'], etag, True
+        return entry['body'], etag, False
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'DashboardAPI/1'
+    api = None
+    quiet = False
+
+    def _format(self, params):
+        fmt = params.pop('format', None)
+        if fmt is None:
+            fmt = 'arrow' if ARROW in self.headers.get('Accept', '') else 'json'
+        if fmt not in ('json', 'arrow'):
+            raise ValueError(f'format desconocido: {fmt}')
+        return fmt
+
+    def _send(self, status, body=b'', headers=(), head=False):
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and not head:
+            self.wfile.write(body)
+
+    def _error(self, status, message, head=False):
+        body = json.dumps({'error': message}, ensure_ascii=False).encode()
+        self._send(status, body, [('Content-Type', JSON)], head)
+
+    def do_GET(self, head=False):
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/') or '/'
+        if path == '/metrics':
+            body = telemetry().prometheus().encode()
+            return self._send(200, body, [('Content-Type', PROMETHEUS), ('Cache-Control', 'no-store')], head)
+        params = dict(parse_qsl(url.query))
+        try:
+            fmt = self._format(params)
+            if fmt == 'arrow' and not ARROW_AVAILABLE:
+                return self._error(406, 'Arrow no disponible en este servidor (pip install pyarrow)', head)
+            compress = 'gzip' in self.headers.get('Accept-Encoding', '')
+            with telemetry().section('api', route=path if path in ROUTES else 'other'):
+                body, etag, gz = self.api.response(path, params, fmt, compress, self.headers.get('If-None-Match'))
+        except LookupError:
+            return self._error(404, f'ruta desconocida: {url.path}', head)
+        except ValueError as exc:
+            return self._error(400, str(exc), head)
+        except Exception:  # se registra siempre (también con --quiet) y el cliente recibe un 500
+            sys.stderr.write(f'{self.requestline}\n{traceback.format_exc()}')
+            telemetry().count('api_errors', route=path if path in ROUTES else 'other')
+            return self._error(500, 'error interno', head)
+        headers = [('ETag', etag), ('Cache-Control', 'no-cache'), ('Vary', 'Accept, Accept-Encoding')]
+        if body is None:
+            return self._send(304, headers=headers, head=True)
+        headers.append(('Content-Type', ARROW if fmt == 'arrow' else JSON))
+        if gz:
+            headers.append(('Content-Encoding', 'gzip'))
+        self._send(200, body, headers, head)
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host='127.0.0.1', port=8502, root=DEFAULT_DATA_DIR, quiet=False):
+    handler = type('BoundHandler', (Handler,), {'api': DataApi(root), 'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start(host='127.0.0.1', port=8502, root=DEFAULT_DATA_DIR, quiet=True):
+    """Levanta la API en un hilo de este proceso (comparte cachés con la app)."""
+    server = make_server(host, port, root, quiet)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dashboard.api', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--quiet', action='store_true', help='sin log por petición')
+    args = parser.parse_args(argv)
+    server = make_server(args.host, args.port, quiet=args.quiet)
+    print(f'API en http://{args.host}:{server.server_port}/v1/meta')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
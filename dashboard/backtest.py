@@ -0,0 +1,260 @@
+"""
+Backtest rolling-origin de las familias de ``dashboard.models``.
+
+Para cada categoría, cada origen ``o`` desde ``MIN_TRAIN`` años de historia
+ajusta la familia con los primeros ``o`` años y pronostica los ``HORIZON``
+siguientes; se compara contra lo observado con MAPE, RMSE y cobertura del
+intervalo al ``LEVEL`` %. Es lo que reemplaza, para elegir modelo, al único
+corte leave-last-3-out de ``fit_series``.
+
+Los folds no se recorren en Python: cada familia arma una matriz de pesos
+(orígenes × años, 1 si el año entra al entrenamiento) y resuelve todos los
+orígenes en una sola llamada apilada de NumPy (ecuaciones normales o
+pseudo-inversa por lotes); la recursión de ARIMAX avanza los ``HORIZON`` pasos
+de todos los orígenes a la vez. Una familia sin versión por lotes en
+``_BATCHED`` se evalúa con su ``fit``/``predict`` origen por origen.
+
+Los folds de cada (familia, categoría) se guardan en
+``DASHBOARD_CACHE_DIR/backtest`` por hash de datos y configuración: agregar
+una familia sólo calcula la suya. ``D['backtest']`` es el backtester de la
+versión de datos.
+"""
+import hashlib
+import json
+import os
+import threading
+from statistics import NormalDist
+
+import numpy as np
+
+from dashboard.datastore import VersionRegistry
+from dashboard.forecast import CATEGORIES, HORIZON, LEVEL
+from dashboard.models import (
+    _FAMILY_FNS, DEFAULT_CACHE_DIR, EXOG, FAMILIES, MAX_CHANGEPOINTS, RIDGE, _arimax_exog,
+)
+
+# Años mínimos de entrenamiento del primer origen (ARIMAX estima 5 coeficientes)
+MIN_TRAIN = 8
+METRICS = {'mape': 'MAPE %', 'rmse': 'RMSE', 'coverage': f'Cobertura IC {LEVEL}%'}
+
+
+# ─── FAMILIAS POR LOTES ─────────────────────────────────────────
+# batched(t, logy, exog, W, horizon) -> (log ŷ, σ del pronóstico), ambos orígenes × horizonte.
+# W: orígenes × años, 1 en los años de entrenamiento de cada origen (un prefijo).
+
+def _train_len(W):
+    return W.sum(axis=1).astype(np.int64)
+
+
+def _future_t(t, W, horizon):
+    return t[_train_len(W) - 1][:, None] + np.arange(1, horizon + 1)
+
+
+def _normal_fit(X, logy, W):
+    """Mínimos cuadrados ponderados por ``W`` para todos los orígenes: (beta, (XᵀWX)⁻¹, σ²)."""
+    Ainv = np.linalg.inv(np.einsum('oj,jk,jl->okl', W, X, X))
+    beta = np.einsum('okl,oj,jl,j->ok', Ainv, W, X, logy)
+    resid = (logy[None, :] - beta @ X.T) * W
+    sigma2 = (resid ** 2).sum(axis=1) / np.maximum(_train_len(W) - X.shape[1], 1)
+    return beta, Ainv, sigma2
+
+
+def _loglineal(t, logy, exog, W, horizon):
+    X = np.column_stack([np.ones_like(t), t])
+    beta, Ainv, sigma2 = _normal_fit(X, logy, W)
+    tf = _future_t(t, W, horizon)
+    Xf = np.stack([np.ones_like(tf), tf], axis=-1)                       # orígenes × h × 2
+    lev = np.einsum('ohk,okl,ohl->oh', Xf, Ainv, Xf)
+    return np.einsum('ohk,ok->oh', Xf, beta), np.sqrt(sigma2[:, None] * (1 + lev))
+
+
+def _prophet(t, logy, exog, W, horizon):
+    # Changepoints de cada origen como en _fit_prophet; los que sobran (∞) dan columnas nulas
+    cps = np.full((len(W), MAX_CHANGEPOINTS), np.inf)
+    for i, n in enumerate(_train_len(W)):
+        n_cp = min(MAX_CHANGEPOINTS, max(n // 4, 0))
+        cps[i, :n_cp] = np.quantile(t[: max(int(n * 0.8), 2)], np.linspace(0, 1, n_cp + 2)[1:-1])
+
+    def design(tt):                                                       # orígenes × años × (2 + cps)
+        hinge = np.maximum(tt[..., None] - cps[:, None, :], 0.0)
+        return np.concatenate([np.ones_like(tt)[..., None], tt[..., None], hinge], axis=-1)
+
+    X = design(np.broadcast_to(t, W.shape))
+    P = np.diag([0.0, 0.0] + [RIDGE] * MAX_CHANGEPOINTS)
+    XtX = np.einsum('oj,ojk,ojl->okl', W, X, X)
+    Ainv = np.linalg.inv(XtX + P)
+    beta = np.einsum('okl,oj,ojl,j->ok', Ainv, W, X, logy)
+    resid = (logy[None, :] - np.einsum('ojk,ok->oj', X, beta)) * W
+    df = np.einsum('okl,olk->o', Ainv, XtX)
+    sigma2 = (resid ** 2).sum(axis=1) / np.maximum(_train_len(W) - df, 1)
+    Xf = design(_future_t(t, W, horizon))
+    lev = np.einsum('ohk,okl,ohl->oh', Xf, Ainv, Xf)
+    return np.einsum('ohk,ok->oh', Xf, beta), np.sqrt(sigma2[:, None] * (1 + lev))
+
+
+def _arimax(t, logy, exog, W, horizon):
+    d = np.diff(logy)
+    Z = _arimax_exog(exog)                                                # (n-1) × 3, alineada con d
+    X = np.column_stack([np.ones(len(d) - 1), d[:-1], Z[1:]])
+    # La fila r (d[r] ~ d[r-1]) usa hasta logy[r+1]: entra si r + 2 <= o
+    n = _train_len(W)
+    Wr = (np.arange(1, len(d))[None, :] + 2 <= n[:, None]).astype(np.float64)
+    beta = np.einsum('okj,oj->ok', np.linalg.pinv(Wr[:, :, None] * X), Wr * d[1:])
+    resid = (d[1:][None, :] - beta @ X.T) * Wr
+    k = X.shape[1]
+    sigma2 = (resid ** 2).sum(axis=1) / np.maximum(Wr.sum(axis=1) - k, 1)
+    # Exógenas observadas en los años pronosticados (ex post, como en fit_series)
+    Zf = np.vstack([Z, np.full((horizon, Z.shape[1]), np.nan)])
+    level, d_prev = logy[n - 1], logy[n - 1] - logy[n - 2]
+    out = np.empty((len(n), horizon))
+    psi, var = np.zeros(len(n)), np.zeros((len(n), horizon))
+    phi = beta[:, 1]
+    for h in range(horizon):
+        d_prev = beta[:, 0] + phi * d_prev + np.einsum('ok,ok->o', Zf[n - 1 + h], beta[:, 2:])
+        level = out[:, h] = level + d_prev
+        # Var. del nivel a h pasos de un AR(1) en diferencias: σ² Σ_j (Σ_{i≤h-j} φ^i)²
+        psi = psi * phi + 1
+        var[:, h] = (var[:, h - 1] if h else 0) + psi ** 2
+    return out, np.sqrt(sigma2[:, None] * var)
+
+
+_BATCHED = {'loglineal': _loglineal, 'arimax': _arimax, 'prophet': _prophet}
+
+
+def _by_origin(family, t, logy, exog, W, horizon):
+    """Familias sin versión por lotes: ``fit``/``predict`` de models, origen por origen."""
+    fit, predict = _FAMILY_FNS[family]
+    pred = np.full((len(W), horizon), np.nan)
+    sd = np.full((len(W), horizon), np.nan)
+    for i, n in enumerate(_train_len(W)):
+        state, resid, _ = fit(t[:n], logy[:n], exog[:, :n])
+        tf = t[n - 1] + np.arange(1, horizon + 1)
+        ef = exog[:, n:n + horizon]
+        if ef.shape[1] < horizon:
+            ef = np.hstack([ef, np.full((len(exog), horizon - ef.shape[1]), np.nan)])
+        pred[i] = predict(state, t[:n], logy[:n], exog[:, :n], tf, ef)
+        sd[i] = np.std(resid) * np.sqrt(np.arange(1, horizon + 1))
+    return pred, sd
+
+
+# ─── BACKTEST ───────────────────────────────────────────────────
+
+def rolling_origin(family, years, values, exog, horizon=HORIZON, min_train=MIN_TRAIN, level=LEVEL):
+    """Folds de una serie: {'origins', 'pred', 'lo', 'hi', 'actual'} (orígenes × horizonte, None sin dato)."""
+    years = np.asarray(years)
+    t = years.astype(np.float64) - years[0]
+    logy = np.log(np.asarray(values, dtype=np.float64))
+    exog = np.asarray(exog, dtype=np.float64)
+    origins = np.arange(min_train, len(t))                 # años de entrenamiento de cada fold
+    if not len(origins):
+        return {'origins': [], 'pred': [], 'lo': [], 'hi': [], 'actual': []}
+    W = (np.arange(len(t))[None, :] < origins[:, None]).astype(np.float64)
+    batched = _BATCHED.get(family)
+    if batched is not None:
+        pred, sd = batched(t, logy, exog, W, horizon)
+    else:
+        pred, sd = _by_origin(family, t, logy, exog, W, horizon)
+    z = NormalDist().inv_cdf(0.5 + level / 200)
+    idx = origins[:, None] + np.arange(horizon)
+    actual = np.where(idx < len(t), np.exp(logy[np.minimum(idx, len(t) - 1)]), np.nan)
+
+    def rows(a):
+        return [[None if not np.isfinite(v) else float(v) for v in r] for r in a]
+
+    return {'origins': years[origins - 1].tolist(), 'pred': rows(np.exp(pred)),
+            'lo': rows(np.exp(pred - z * sd)), 'hi': rows(np.exp(pred + z * sd)), 'actual': rows(actual)}
+
+
+def scores(folds, horizon=HORIZON):
+    """{'h', 'n', 'mape', 'rmse', 'coverage'} por horizonte (None donde no hay folds)."""
+    def arr(name):
+        return np.array(folds[name] or np.empty((0, horizon)), dtype=np.float64).reshape(-1, horizon)
+
+    pred, lo, hi, y = arr('pred'), arr('lo'), arr('hi'), arr('actual')
+    ok = np.isfinite(y) & np.isfinite(pred)
+    n = ok.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        err = np.where(ok, pred - y, 0.0)
+        mape = np.abs(err / np.where(ok, y, 1)).sum(axis=0) / n * 100
+        rmse = np.sqrt((err ** 2).sum(axis=0) / n)
+        cov = np.where(ok, (lo <= y) & (y <= hi), False).sum(axis=0) / n * 100
+    out = {'h': list(range(1, horizon + 1)), 'n': n.tolist()}
+    for name, v in (('mape', mape), ('rmse', rmse), ('coverage', cov)):
+        out[name] = [round(float(x), 2) if c else None for x, c in zip(v, n)]
+    return out
+
+
+class Backtester:
+    """Backtest de un bundle; folds por (familia, categoría) en memoria y en ``cache_dir/backtest``."""
+
+    def __init__(self, store, cache_dir=DEFAULT_CACHE_DIR, horizon=HORIZON, min_train=MIN_TRAIN, level=LEVEL):
+        self.store = store
+        self.dir = None if cache_dir is None else os.path.join(cache_dir, 'backtest')
+        self.horizon, self.min_train, self.level = horizon, min_train, level
+        self._folds = {}
+        self._lock = threading.Lock()
+
+    def _key(self, family, category, period):
+        col = CATEGORIES[category]
+        raw = (f'{family}|{category}|{period[0]}-{period[1]}|{self.store.digest(col, *EXOG)}|'
+               f'{self.horizon}|{self.min_train}|{self.level}')
+        return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+    def _load(self, key):
+        if self.dir is None:
+            return None
+        try:
+            with open(os.path.join(self.dir, f'{key}.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _persist(self, key, folds):
+        if self.dir is None:
+            return
+        os.makedirs(self.dir, exist_ok=True)
+        path = os.path.join(self.dir, f'{key}.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(folds, f)
+        os.replace(path + '.tmp', path)
+
+    def folds(self, family, category):
+        """Folds de ``rolling_origin`` para la categoría en su período real."""
+        a, b = self.store.tables['periods'][category]
+        key = self._key(family, category, (a, b))
+        folds = self._folds.get(key)
+        if folds is None:
+            folds = self._load(key)
+            if folds is None:
+                years = np.asarray(self.store.years)
+                mask = (years >= a) & (years <= b)
+                folds = rolling_origin(family, years[mask], np.asarray(self.store[CATEGORIES[category]])[mask],
+                                       self.store.matrix(EXOG)[:, mask], self.horizon, self.min_train, self.level)
+                self._persist(key, folds)
+            with self._lock:
+                self._folds[key] = folds
+        return folds
+
+    def scores(self, family, category):
+        return scores(self.folds(family, category), self.horizon)
+
+    def summary(self, families=FAMILIES, categories=CATEGORIES):
+        """{categoría: {familia: {'mape', 'rmse', 'coverage', 'n'}}} sobre todos los folds y horizontes."""
+        out = {}
+        for category in categories:
+            out[category] = {}
+            for family in families:
+                f = self.folds(family, category)
+                # Todos los (origen, horizonte) como un único horizonte
+                pooled = {k: [[v] for row in f[k] for v in row] for k in ('pred', 'lo', 'hi', 'actual')}
+                s = scores(pooled, 1) if pooled['pred'] else None
+                out[category][family] = {k: s[k][0] if s else None for k in ('mape', 'rmse', 'coverage', 'n')}
+        return out
+
+
+_BACKTESTERS = VersionRegistry(Backtester)
+
+
+def backtest_for(store):
+    """Backtester compartido por las sesiones para la versión del bundle."""
+    return _BACKTESTERS.get(store)
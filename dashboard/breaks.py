@@ -0,0 +1,141 @@
+"""
+Detección de rupturas estructurales (PELT) sobre las series de ``D['hist']``.
+
+Cada serie positiva se modela en ``log(y)`` como una tendencia lineal por
+tramos dentro de su período real: una ruptura es un año donde empieza un tramo
+nuevo, con otro nivel, otra pendiente o ambos (el salto de 1998, la caída de
+2020). El costo de un tramo es la suma de cuadrados residual de su recta, que
+sale de sumas acumuladas en O(1), y la poda de PELT deja el recorrido en O(n)
+esperado, así que se puede correr por medio y por región en cada
+actualización de datos.
+
+La penalización por tramo es ``PENALTY · σ² · log n`` (tipo BIC), con σ el
+desvío del ruido de ``log(y)`` estimado por MAD de las segundas diferencias,
+que una tendencia lineal anula. Con ``PENALTY = 2`` el TOTAL nacional
+conserva 1998, 2003 y 2020. Los resultados se cachean por hash de la serie en
+una LRU de ``CACHE_SIZE`` series.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from dashboard.datastore import VersionRegistry
+from dashboard.forecast import CATEGORIES
+
+MIN_SIZE = 2
+PENALTY = 2.0
+# Series con rupturas en caché (todas las versiones): alcanza para un bundle regional
+CACHE_SIZE = 4096
+
+
+def _cumsums(x):
+    t = np.arange(len(x), dtype=np.float64)
+    return [np.concatenate([[0.0], np.cumsum(a)]) for a in (t, t * t, x, t * x, x * x)]
+
+
+def _segment_cost(sums, s, e):
+    """Suma de cuadrados residual de la recta de mínimos cuadrados en ``x[s:e]`` (``s`` puede ser un vector)."""
+    St, Stt, Sx, Stx, Sxx = (c[e] - c[s] for c in sums)
+    m = e - s
+    vt = Stt - St * St / m
+    ctx = Stx - St * Sx / m
+    # Un tramo de un solo punto (vt = 0) no tiene pendiente: su costo es la varianza, 0
+    slope2 = np.divide(ctx * ctx, vt, out=np.zeros_like(vt, dtype=np.float64), where=vt > 0)
+    return np.maximum(Sxx - Sx * Sx / m - slope2, 0.0)
+
+
+def pelt(x, penalty, min_size=MIN_SIZE):
+    """Índices de inicio de cada tramo nuevo (cambios en la recta de ``x`` contra su índice)."""
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if n < 2 * min_size:
+        return []
+    sums = _cumsums(x)
+    F = np.full(n + 1, np.inf)
+    F[0] = -penalty
+    prev = np.zeros(n + 1, dtype=np.int64)
+    R = np.array([0])
+    for t in range(min_size, n + 1):
+        ok = t - R >= min_size
+        cand = R[ok]
+        seg = _segment_cost(sums, cand, t)
+        vals = F[cand] + seg + penalty
+        k = np.argmin(vals)
+        F[t], prev[t] = vals[k], cand[k]
+        # Poda: un inicio que ya no puede mejorar F[t] no vuelve a ser óptimo
+        R = np.concatenate([R[~ok], cand[F[cand] + seg <= F[t]], [t]])
+    cps, t = [], n
+    while t > 0:
+        t = prev[t]
+        if t > 0:
+            cps.append(int(t))
+    return cps[::-1]
+
+
+def noise_scale(x):
+    """σ del ruido de ``x`` alrededor de una tendencia lineal (MAD de las segundas diferencias)."""
+    d = np.diff(x, 2)
+    return np.median(np.abs(d - np.median(d))) / 0.6745 / np.sqrt(6)
+
+
+def detect(years, values, penalty=PENALTY, min_size=MIN_SIZE):
+    """Rupturas de una serie positiva: [{'year', 'delta'}] ordenadas por |delta|.
+
+    ``delta`` es el salto de nivel en ``year``, en %: el valor del tramo nuevo
+    frente a la tendencia del anterior prolongada a ese año.
+    """
+    years = np.asarray(years)
+    values = np.asarray(values, dtype=np.float64)
+    keep = values > 0
+    logy, yrs = np.log(values[keep]), years[keep]
+    if len(logy) < max(2 * min_size, 4):
+        return []
+    sigma = noise_scale(logy)
+    pen = penalty * max(sigma, 1e-6) ** 2 * np.log(len(logy))
+    cps = pelt(logy, pen, min_size)
+    bounds = [0] + cps + [len(logy)]
+    t = np.arange(len(logy), dtype=np.float64)
+    lines = [np.polyfit(t[a:b], logy[a:b], 1) if b - a > 1 else (0.0, logy[a])
+             for a, b in zip(bounds[:-1], bounds[1:])]
+    out = [{'year': int(yrs[c]),
+            'delta': round(float(np.expm1(np.polyval(lines[i + 1], c) - np.polyval(lines[i], c))) * 100, 2)}
+           for i, c in enumerate(cps)]
+    return sorted(out, key=lambda b: -abs(b['delta']))
+
+
+# Compartida entre versiones del bundle: una serie que no cambió no se recalcula.
+# Las que ya no lee nadie (versiones viejas) salen por LRU.
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+class BreakDetector:
+    """Rupturas por serie del bundle, cacheadas por hash de la serie."""
+
+    def __init__(self, store):
+        self.store = store
+        self._starts = {CATEGORIES[c]: p[0] for c, p in store.tables.get('periods', {}).items()}
+
+    def breaks(self, name):
+        key = (self.store.digest(name), self._starts.get(name))
+        with _CACHE_LOCK:
+            res = _CACHE.get(key)
+            if res is not None:
+                _CACHE.move_to_end(key)
+        if res is None:
+            years = np.asarray(self.store.years)
+            mask = years >= self._starts.get(name, years[0])
+            res = detect(years[mask], np.asarray(self.store[name])[mask])
+            with _CACHE_LOCK:
+                _CACHE[key] = res
+                while len(_CACHE) > CACHE_SIZE:
+                    _CACHE.popitem(last=False)
+        return res
+
+
+_DETECTORS = VersionRegistry(BreakDetector)
+
+
+def breaks_for(store):
+    return _DETECTORS.get(store)
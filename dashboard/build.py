@@ -0,0 +1,293 @@
+"""
+Pipeline que construye el bundle de datos del dashboard.
+
+    python -m dashboard.build fuentes/ecar.xlsx fuentes/iab.xlsx --out data
+
+1. Ingesta: cada hoja de las planillas (ECAR, IBOPE, IAB...) tiene una fila
+   de encabezado con ``Año`` y una columna por serie (``TV Nacional``,
+   ``Prensa``, ``IPC``...). Se parte del bundle existente en ``--out``, así
+   que basta con una planilla que traiga sólo el año nuevo.
+2. Limpieza: huecos internos interpolados, bordes rellenados con el dato más
+   cercano y ``tv`` = nacional + local (``total`` = suma de medios sólo si
+   ninguna fuente lo trae). La tabla ``observed`` guarda el rango de años con
+   dato de cada serie, para que un relleno no pase por observación al
+   reconstruir.
+3. Agregados: período real de cada categoría, regresión Digital vs Internet
+   y CAGR.
+4. Ajustes: las familias de ``dashboard.models`` por serie (``model_series``). Cada ajuste
+   guarda el hash de sus entradas; si no cambió, se reutiliza el anterior.
+
+Las columnas del bundle se nombran por hash, así que una serie sin cambios
+tampoco se reescribe. ``dashboard.ingest`` usa las mismas etapas para sumar
+las entregas mensuales de un directorio a un bundle en servicio.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from dashboard.datastore import DEFAULT_DATA_DIR, INDEX, DataStore, prune_bundle, write_bundle
+from dashboard.derived import MEDIA
+from dashboard.forecast import CATEGORIES
+from dashboard.hierarchy import NATIONAL
+from dashboard.models import EXOG, FAMILIES, fit_series, input_key, model_series
+
+MONTH = 'month'
+ALIASES = {
+    'mes': MONTH, 'month': MONTH,
+    'año': INDEX, 'ano': INDEX, 'year': INDEX, 'years': INDEX,
+    'tv nacional': 'tv_nac', 'tv local': 'tv_local', 'tv': 'tv',
+    'prensa': 'prensa', 'radio': 'radio', 'digital': 'digital',
+    'revistas': 'revistas', 'exterior': 'exterior', 'total': 'total',
+    'ipc': 'ipc', 'trm': 'trm', 'internet': 'internet',
+    'penetración internet': 'internet', 'penetracion internet': 'internet',
+}
+SERIES = MEDIA + ('tv', 'total') + EXOG
+HEADER_ROWS = 10
+
+
+# ─── INGESTA ────────────────────────────────────────────────────
+
+def _column_name(label):
+    if label is None:
+        return None
+    key = str(label).strip().lower()
+    if key in ALIASES:
+        return ALIASES[key]
+    key = key.replace(' ', '_')
+    return key if key in SERIES else None
+
+
+def records(rows):
+    """(año, mes o None, {serie: valor}) de cada fila bajo el encabezado de una tabla.
+
+    El encabezado puede venir después de un título o notas; una tabla sin
+    columna ``Año`` no produce filas.
+    """
+    rows = iter(rows)
+    for _, row in zip(range(HEADER_ROWS), rows):
+        names = [_column_name(c) for c in row]
+        if INDEX in names:
+            break
+    else:
+        return
+    year_col = names.index(INDEX)
+    month_col = names.index(MONTH) if MONTH in names else None
+    for row in rows:
+        if year_col >= len(row) or row[year_col] in (None, ''):
+            continue
+        month = row[month_col] if month_col is not None and month_col < len(row) else None
+        values = {name: float(value) for name, value in zip(names, row)
+                  if name not in (None, INDEX, MONTH) and value not in (None, '')}
+        yield int(row[year_col]), (int(month) if month not in (None, '') else None), values
+
+
+def read_workbook(path):
+    """{serie: {año: valor}} con todas las hojas de una planilla."""
+    from openpyxl import load_workbook
+
+    obs = {}
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            for year, month, values in records(ws.iter_rows(values_only=True)):
+                if month is not None:
+                    raise ValueError(f'{path}: filas mensuales en la hoja {ws.title!r}; '
+                                     'se cargan con python -m dashboard.ingest')
+                for name, value in values.items():
+                    obs.setdefault(name, {})[year] = value
+    finally:
+        wb.close()
+    return obs
+
+
+def merge(*sources):
+    """Combina observaciones; las fuentes posteriores pisan a las anteriores."""
+    out = {}
+    for src in sources:
+        for name, values in src.items():
+            out.setdefault(name, {}).update(values)
+    return out
+
+
+# ─── LIMPIEZA ───────────────────────────────────────────────────
+
+def _fill(years, observed):
+    """Serie sobre ``years``: interpolación interna y bordes con el dato más cercano."""
+    known = np.array(sorted(observed), dtype=np.int64)
+    vals = np.array([observed[y] for y in known], dtype=np.float64)
+    return np.interp(years, known, vals)
+
+
+def clean(obs):
+    """(años, {serie: valores}, {serie: [primer, último] año observado})."""
+    missing = [n for n in MEDIA + EXOG if not obs.get(n)]
+    if missing:
+        raise ValueError(f"Faltan series en las fuentes: {', '.join(missing)}")
+    first = min(min(v) for v in obs.values())
+    last = max(max(v) for v in obs.values())
+    years = np.arange(first, last + 1, dtype=np.int32)
+    columns = {n: _fill(years, obs[n]) for n in MEDIA + EXOG}
+    if any((columns[n] < 0).any() for n in MEDIA):
+        raise ValueError('Hay inversiones negativas en las fuentes')
+    columns['tv'] = columns['tv_nac'] + columns['tv_local']
+    observed = {n: [min(obs[n]), max(obs[n])] for n in MEDIA + EXOG}
+    if obs.get('total'):
+        columns['total'] = _fill(years, obs['total'])
+        observed['total'] = [min(obs['total']), max(obs['total'])]
+    else:
+        columns['total'] = np.sum([columns[n] for n in MEDIA], axis=0)
+        observed['total'] = [int(years[0]), int(years[-1])]
+    return years, columns, observed
+
+
+# ─── AGREGADOS ──────────────────────────────────────────────────
+
+def real_start(values):
+    """Primer índice con dato real: tras los ceros iniciales o al final del relleno constante."""
+    v = np.asarray(values)
+    if v[0] == 0:
+        return int(np.argmax(v > 0))
+    changed = np.flatnonzero(v != v[0])
+    return int(changed[0] - 1) if len(changed) else 0
+
+
+def periods(years, columns, observed):
+    out = {}
+    for category, col in CATEGORIES.items():
+        first, last = observed[col]
+        lo = max(real_start(columns[col]), int(np.searchsorted(years, first)))
+        out[category] = [int(years[lo]), int(last)]
+    return out
+
+
+def regression(years, columns, period):
+    from scipy import stats
+
+    mask = (years >= period[0]) & (years <= period[1])
+    x, y = columns['internet'][mask], columns['digital'][mask]
+    lr = stats.linregress(x, y)
+    x_line = np.linspace(x.min(), x.max(), 50)
+    return {'x_scatter': x.tolist(), 'y_scatter': y.tolist(), 'yr_scatter': years[mask].tolist(),
+            'x_line': x_line.tolist(), 'y_line': (lr.slope * x_line + lr.intercept).tolist(),
+            'r2': round(lr.rvalue ** 2, 4), 'slope': round(lr.slope, 2),
+            'intercept': round(lr.intercept, 2), 'p_value': float(lr.pvalue)}
+
+
+def _cagr(v0, v1, n):
+    return round(((v1 / v0) ** (1 / n) - 1) * 100, 2) if v0 > 0 and v1 > 0 and n > 0 else None
+
+
+# ─── AJUSTES ────────────────────────────────────────────────────
+
+def fit_models(years, columns, series, previous=None, log=print):
+    """Tabla ``metrics``: CAGR y métricas por familia de cada serie de ``model_series``,
+    reutilizando ajustes sin cambios."""
+    previous = previous or {}
+    exog_all = np.vstack([columns[n] for n in EXOG])
+    out, fitted, reused = {}, 0, 0
+    for label, col, (a, b) in series:
+        mask = (years >= a) & (years <= b)
+        values, exog = columns[col][mask], exog_all[:, mask]
+        old = previous.get(label, {}).get('models', {})
+        models = {}
+        for family in FAMILIES:
+            key = input_key(family, label, (a, b), values, exog)
+            if old.get(family, {}).get('input') == key:
+                models[family] = old[family]
+                reused += 1
+                continue
+            try:
+                res = fit_series(family, years[mask], values, exog)
+            except (ValueError, np.linalg.LinAlgError) as exc:
+                log(f'  {label} / {FAMILIES[family]}: sin ajuste ({exc})')
+                continue
+            models[family] = {**res, 'input': key}
+            fitted += 1
+        base = models.get('loglineal', {})
+        out[label] = {'aic': base.get('aic'), 'bic': base.get('bic'), 'rmse': base.get('rmse'),
+                         'cagr': _cagr(values[0], values[-1], b - a), 'models': models}
+    return out, fitted, reused
+
+
+# ─── CLI ────────────────────────────────────────────────────────
+
+def base_observations(store):
+    """{serie: {año: valor}} observados en un bundle existente."""
+    obs = {}
+    yrs = [int(y) for y in store.years]
+    seen = store.tables.get('observed', {})
+    # Sólo lo observado de las series de origen: tv y los rellenos se recalculan
+    for n in store.names:
+        if n == 'tv':
+            continue
+        first, last = seen.get(n, (yrs[0], yrs[-1]))
+        obs[n] = {y: float(v) for y, v in zip(yrs, store[n]) if first <= y <= last}
+    return obs
+
+
+def build(sources, out=DEFAULT_DATA_DIR, full=False, prune=True, log=print):
+    """Construye el bundle en ``out`` y devuelve su versión."""
+    out = Path(out)
+    base, obs = None, {}
+    if not full and (out / 'meta.json').exists():
+        base = DataStore.open(out)
+        obs = base_observations(base)
+    for path in sources:
+        log(f'Leyendo {path}')
+        obs = merge(obs, read_workbook(path))
+    if not obs:
+        raise ValueError('No hay datos: indicá planillas fuente o un bundle existente en --out')
+    return assemble(out, obs, base, prune, log)
+
+
+def assemble(out, obs, base=None, prune=True, log=print):
+    """Limpieza, agregados y ajustes de ``obs``; escribe el bundle en ``out`` y devuelve su versión.
+
+    ``base`` es el bundle anterior (``DataStore``): de ahí se reutilizan los ajustes sin cambios.
+    """
+    years, columns, observed = clean(obs)
+    changed = [n for n in columns if base is None or n not in base
+               or len(base[n]) != len(years) or not np.array_equal(base[n], columns[n])]
+    log(f"Series: {len(changed)} con cambios ({', '.join(changed) or '-'}), "
+        f'{len(columns) - len(changed)} sin cambios')
+
+    per = periods(years, columns, observed)
+    previous = base.tables.get('metrics') if base is not None else None
+    hierarchy = {n: list(p) for n, p in NATIONAL.items()}
+    series = model_series(years, columns, per, observed, hierarchy)
+    metrics, fitted, reused = fit_models(years, columns, series, previous, log)
+    log(f'Modelos: {fitted} ajustados, {reused} reutilizados')
+
+    # La regresión (scipy) sólo se rehace si cambiaron sus series o su período
+    reg = None
+    if base is not None and not {'internet', 'digital'} & set(changed) and np.array_equal(base.years, years) \
+            and base.tables.get('periods', {}).get('Digital') == per['Digital']:
+        reg = base.tables.get('regression')
+    tables = {'regression': reg or regression(years, columns, per['Digital']),
+              'metrics': metrics, 'periods': per, 'observed': observed, 'hierarchy': hierarchy}
+    version = write_bundle(out, years, columns, tables)
+    if prune:
+        prune_bundle(out)
+    log(f'Bundle {version} en {out} ({years[0]}–{years[-1]})')
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dashboard.build', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('sources', nargs='*', type=Path, help='planillas .xlsx (ECAR, IBOPE, IAB...)')
+    parser.add_argument('--out', type=Path, default=DEFAULT_DATA_DIR, help='directorio del bundle')
+    parser.add_argument('--full', action='store_true', help='ignora el bundle existente y recalcula todo')
+    parser.add_argument('--keep', action='store_true', help='no borra las columnas de versiones anteriores')
+    args = parser.parse_args(argv)
+    try:
+        build(args.sources, args.out, full=args.full, prune=not args.keep)
+    except (ValueError, OSError) as exc:
+        print(f'error: {exc}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Backends de caché para compartir resultados entre procesos.
+
+Se elige con ``DASHBOARD_CACHE_URL``:
+
+  memory://                  (por defecto) LRU en memoria, sólo este proceso
+  sqlite:///ruta/cache.db    archivo local: lo comparten todas las réplicas del
+                             nodo (WAL, lecturas concurrentes)
+  redis://host:6379/0        Redis; requiere el paquete ``redis``
+
+Cada entrada es ``bytes`` bajo (espacio, versión de datos, clave). Cuando un
+proceso escribe con una versión nueva, las versiones anteriores de ese espacio
+se descartan (en Redis expiran por TTL); una réplica que escribe con una versión
+más vieja no borra las nuevas. Así, reescribir el bundle invalida
+pronósticos y figuras sin intervención. El bundle no pasa por acá: sus
+columnas se abren con mmap y el sistema operativo ya comparte esas páginas.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+DEFAULT_URL = os.environ.get('DASHBOARD_CACHE_URL', 'memory://')
+MAX_BYTES = int(float(os.environ.get('DASHBOARD_CACHE_MB', 256)) * 2**20)
+REDIS_TTL = 24 * 3600
+# Resolución de ``atime`` en SQLite: un acierto reescribe la fila como mucho una vez por minuto
+ATIME_STEP = 60
+# Versiones más recientes de cada espacio que aceptan escrituras en SQLite
+VERSIONS_KEPT = 16
+
+
+class MemoryBackend:
+    """LRU en memoria con tope en bytes y en número de entradas."""
+
+    shared = False
+
+    def __init__(self, max_bytes=MAX_BYTES, max_items=None):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, ns, version, key):
+        with self._lock:
+            value = self._entries.get((ns, version, key))
+            if value is not None:
+                self._entries.move_to_end((ns, version, key))
+            return value
+
+    def set(self, ns, version, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((ns, version, key), None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[(ns, version, key)] = value
+            self.bytes += len(value)
+            while self.bytes > self.max_bytes or (self.max_items and len(self._entries) > self.max_items):
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+class SQLiteBackend:
+    """Tabla ``entries`` en un archivo SQLite compartido por los procesos del nodo.
+
+    LRU por tamaño: cada lectura refresca ``atime`` (como mucho una vez por
+    ``ATIME_STEP`` segundos, para no escribir en cada acierto) y al pasar el
+    tope se descartan las menos usadas hasta volver a la mitad. El total en
+    bytes lo mantienen triggers en la fila ``bytes`` de ``meta``, así que una
+    escritura no recorre la tabla.
+
+    La tabla ``versions`` numera las versiones de cada espacio en el orden en
+    que aparecen (una fila por versión, que no se borra: así se reconoce una
+    versión vieja). Un proceso sólo descarta las entradas anteriores a la suya,
+    de modo que una réplica que todavía no recargó el bundle no borra lo de las
+    que ya lo hicieron, y las escrituras de una versión con ``VERSIONS_KEPT`` o
+    más versiones posteriores se descartan.
+    """
+
+    shared = True
+
+    def __init__(self, path, max_bytes=MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._versions = {}
+        with self._conn() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS entries (ns TEXT, version TEXT, key TEXT, '
+                       'value BLOB, size INTEGER, atime REAL, PRIMARY KEY (ns, version, key))')
+            db.execute('CREATE TABLE IF NOT EXISTS versions (ns TEXT, version TEXT, seq INTEGER, '
+                       'PRIMARY KEY (ns, version))')
+            db.execute('BEGIN IMMEDIATE')
+            db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)')
+            db.execute("INSERT OR IGNORE INTO meta SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries")
+            db.execute("CREATE TRIGGER IF NOT EXISTS entries_ins AFTER INSERT ON entries BEGIN "
+                       "UPDATE meta SET value=value+NEW.size WHERE name='bytes'; END")
+            db.execute("CREATE TRIGGER IF NOT EXISTS entries_del AFTER DELETE ON entries BEGIN "
+                       "UPDATE meta SET value=value-OLD.size WHERE name='bytes'; END")
+            db.execute("CREATE TRIGGER IF NOT EXISTS entries_upd AFTER UPDATE OF size ON entries BEGIN "
+                       "UPDATE meta SET value=value+NEW.size-OLD.size WHERE name='bytes'; END")
+            db.execute('COMMIT')
+
+    def _conn(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def get(self, ns, version, key):
+        db = self._conn()
+        row = db.execute('SELECT value, atime FROM entries WHERE ns=? AND version=? AND key=?',
+                         (ns, version, key)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > ATIME_STEP:
+            db.execute('UPDATE entries SET atime=? WHERE ns=? AND version=? AND key=?', (now, ns, version, key))
+        return row[0]
+
+    def _register(self, db, ns, version):
+        """Anota ``version`` (si es nueva) y descarta las entradas de versiones anteriores de ``ns``.
+
+        Devuelve False, sin borrar nada, si ``version`` ya tiene ``VERSIONS_KEPT``
+        versiones posteriores: es una réplica muy atrasada y no se escribe.
+        """
+        db.execute('INSERT OR IGNORE INTO versions SELECT ?, ?, COALESCE(MAX(seq), 0) + 1 FROM versions',
+                   (ns, version))
+        seq = db.execute('SELECT seq FROM versions WHERE ns=? AND version=?', (ns, version)).fetchone()[0]
+        newer = db.execute('SELECT COUNT(*) FROM versions WHERE ns=? AND seq>?', (ns, seq)).fetchone()[0]
+        if newer >= VERSIONS_KEPT:
+            return False
+        db.execute('DELETE FROM entries WHERE ns=? AND version IN '
+                   '(SELECT version FROM versions WHERE ns=? AND seq<?)', (ns, ns, seq))
+        return True
+
+    def set(self, ns, version, key, value):
+        if len(value) > self.max_bytes:
+            return
+        db = self._conn()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if self._versions.get(ns, (None,))[0] != version:
+                self._versions[ns] = (version, self._register(db, ns, version))
+            if not self._versions[ns][1]:
+                db.execute('COMMIT')
+                return
+            db.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (ns, version, key) DO UPDATE '
+                       'SET value=excluded.value, size=excluded.size, atime=excluded.atime',
+                       (ns, version, key, sqlite3.Binary(value), len(value), time.time()))
+            total = db.execute("SELECT value FROM meta WHERE name='bytes'").fetchone()[0]
+            if total > self.max_bytes:
+                # Se descartan las menos usadas hasta volver a la mitad del tope
+                db.execute('DELETE FROM entries WHERE rowid IN (SELECT rowid FROM (SELECT rowid, SUM(size) '
+                           'OVER (ORDER BY atime DESC, rowid DESC) AS kept FROM entries) WHERE kept>?)',
+                           (self.max_bytes // 2,))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        db = self._conn()
+        db.execute('DELETE FROM entries')
+        db.execute('DELETE FROM versions')
+        self._versions.clear()
+
+
+class RedisBackend:
+    """Redis (``pip install redis``); las versiones viejas expiran por TTL."""
+
+    shared = True
+
+    def __init__(self, url, ttl=REDIS_TTL, prefix='dashboard'):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError(f'DASHBOARD_CACHE_URL={url} requiere el paquete redis (pip install redis)') from None
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, ns, version, key):
+        return f'{self.prefix}:{ns}:{version}:{key}'
+
+    def get(self, ns, version, key):
+        return self.client.get(self._key(ns, version, key))
+
+    def set(self, ns, version, key, value):
+        self.client.set(self._key(ns, version, key), value, ex=self.ttl)
+
+    def clear(self):
+        for k in self.client.scan_iter(f'{self.prefix}:*'):
+            self.client.delete(k)
+
+
+def backend_from_url(url):
+    parts = urlsplit(url)
+    if parts.scheme == 'memory':
+        return MemoryBackend()
+    if parts.scheme == 'sqlite':
+        # sqlite:///ruta/absoluta o sqlite://ruta/relativa
+        return SQLiteBackend(parts.netloc + parts.path if parts.netloc else parts.path)
+    if parts.scheme in ('redis', 'rediss', 'unix'):
+        return RedisBackend(url)
+    raise ValueError(f'DASHBOARD_CACHE_URL no soportada: {url}')
+
+
+_BACKEND = None
+_LOCK = threading.Lock()
+
+
+def cache_backend():
+    """Backend configurado en ``DASHBOARD_CACHE_URL``, uno por proceso."""
+    global _BACKEND
+    with _LOCK:
+        if _BACKEND is None:
+            _BACKEND = backend_from_url(DEFAULT_URL)
+        return _BACKEND
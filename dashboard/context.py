@@ -0,0 +1,46 @@
+"""
+``D`` del dashboard: las series del bundle más los cálculos en vivo.
+
+* ``D['forecast']``       pronóstico log-lineal + IC bootstrap, cacheado
+* ``D['derived']``        participaciones, YoY, CAGR y rankings matriciales
+* ``D['correlation']``    matrices y correlaciones móviles por rango de años
+* ``D['break_detector']`` rupturas PELT de cualquier serie (``D['breaks']``: total)
+* ``D['anomalies']``      años anómalos (STL robusto + MAD móvil) de todas las series
+* ``D['scenario']``       simulador de escenarios macro (IPC, TRM, Internet)
+* ``D['optimizer']``      frontera eficiente de mezclas de medios (Monte Carlo)
+* ``D['backtest']``       backtest rolling-origin de las familias de modelos
+
+Se arma una vez por versión de datos (se conservan las ``VERSIONS_KEPT`` más
+recientes) y lo comparten las sesiones de la app y ``dashboard.warm``, que lo
+precalienta antes de aceptar tráfico.
+"""
+from types import MappingProxyType
+
+from dashboard.anomaly import anomalies_for
+from dashboard.backtest import backtest_for
+from dashboard.breaks import breaks_for
+from dashboard.correlation import correlation_for
+from dashboard.datastore import VersionRegistry
+from dashboard.derived import derived_for
+from dashboard.forecast import ForecastView, engine_for
+from dashboard.optimizer import optimizer_for
+from dashboard.scenario import scenario_for
+
+
+def _view(store):
+    derived, corr, breaks = derived_for(store), correlation_for(store), breaks_for(store)
+    forecast = ForecastView(engine_for(store))
+    return store.view(
+        forecast=forecast, derived=derived,
+        cagr=MappingProxyType(derived.cagr_real),
+        correlation=corr, corr_labels=corr.labels, corr=corr.matrix().tolist(),
+        break_detector=breaks, breaks=breaks.breaks('total'), scenario=scenario_for(store),
+        optimizer=optimizer_for(store, forecast), backtest=backtest_for(store),
+        anomalies=anomalies_for(store))
+
+
+_VIEWS = VersionRegistry(_view)
+
+
+def data_view(store):
+    return _VIEWS.get(store)
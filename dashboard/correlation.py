@@ -0,0 +1,176 @@
+"""
+Motor de correlaciones para la pestaña Correlaciones.
+
+Cada serie sólo cuenta desde el inicio de su período real (Prensa 2003,
+Digital 2008...), así que las correlaciones son por pares sobre el tramo
+común. Con la máscara de validez W, todos los pares salen de unos pocos
+productos matriciales (W·Wᵀ, (X∘W)·Wᵀ, ...) sobre datos centrados, sin
+bucles por par. Las ventanas móviles usan sumas acumuladas: cada ventana es
+una diferencia de dos cortes, O(series × años) para cualquier ancho.
+
+Spearman es Pearson sobre rangos calculados en el tramo común de cada par.
+Para no ordenar par por par, las series se agrupan por patrón de validez
+(unos pocos: uno por año de inicio) y se ordena una vez por pareja de patrones.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from dashboard.datastore import VersionRegistry
+from dashboard.forecast import CATEGORIES
+
+LABELS = {
+    'TV': 'tv', 'Prensa': 'prensa', 'Radio': 'radio', 'Digital': 'digital',
+    'Revistas': 'revistas', 'Exterior': 'exterior', 'Total': 'total',
+    'IPC': 'ipc', 'TRM': 'trm', 'Internet': 'internet',
+}
+METHODS = {'pearson': 'Pearson', 'spearman': 'Spearman'}
+MIN_OBS = 3
+CACHE_SIZE = 256
+
+
+def _center(X, W):
+    """Resta la media de los valores válidos de cada fila y anula el resto."""
+    n = W.sum(axis=-1, keepdims=True)
+    mean = np.where(W, X, 0.0).sum(axis=-1, keepdims=True) / np.maximum(n, 1)
+    return np.where(W, X - mean, 0.0)
+
+
+def _ranks(X, **kw):
+    # scipy.stats tarda ~1 s en importarse: sólo lo paga quien pide Spearman
+    from scipy.stats import rankdata
+    return rankdata(X, axis=-1, **kw)
+
+
+def _corr_rows(A, B):
+    """Pearson entre cada fila de A y cada fila de B (sin NaN)."""
+    A = A - A.mean(axis=1, keepdims=True)
+    B = B - B.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = A / np.sqrt((A * A).sum(axis=1, keepdims=True))
+        B = B / np.sqrt((B * B).sum(axis=1, keepdims=True))
+    return A @ B.T
+
+
+def _pairwise_spearman(X):
+    valid = ~np.isnan(X)
+    patterns, inv = np.unique(valid, axis=0, return_inverse=True)
+    inv = inv.ravel()
+    r = np.full((len(X), len(X)), np.nan)
+    for a in range(len(patterns)):
+        for b in range(a, len(patterns)):
+            common = patterns[a] & patterns[b]
+            if common.sum() < MIN_OBS:
+                continue
+            ia, ib = np.flatnonzero(inv == a), np.flatnonzero(inv == b)
+            block = _corr_rows(_ranks(X[ia][:, common]), _ranks(X[ib][:, common]))
+            r[np.ix_(ia, ib)] = block
+            r[np.ix_(ib, ia)] = block.T
+    np.fill_diagonal(r, np.where(valid.sum(axis=1) >= MIN_OBS, 1.0, np.nan))
+    return np.clip(r, -1, 1)
+
+
+def _pairwise_pearson(X):
+    """Pearson por pares sobre una matriz con NaN (series × periodos)."""
+    valid = ~np.isnan(X)
+    W = valid.astype(np.float64)
+    Xc = _center(X, valid)
+    n = W @ W.T
+    sx = Xc @ W.T                    # Σx_i sobre los años válidos también para j
+    sxx = (Xc * Xc) @ W.T
+    sxy = Xc @ Xc.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var = sxx - sx * sx / n
+        r = cov / np.sqrt(var * var.T)
+    r[n < MIN_OBS] = np.nan
+    np.fill_diagonal(r, np.where(np.diag(n) >= MIN_OBS, 1.0, np.nan))
+    return np.clip(r, -1, 1)
+
+
+class CorrelationEngine:
+    def __init__(self, store, labels=LABELS):
+        self.store = store
+        self.labels = list(labels)
+        self.columns = list(labels.values())
+        self.years = np.asarray(store.years)
+        self.values = np.asarray(store.matrix(list(labels.values())), dtype=np.float64).copy()
+        # Antes del período real de cada serie el dato es relleno, no observación
+        starts = {col: store.tables['periods'][cat][0] for cat, col in CATEGORIES.items()
+                  if cat in store.tables.get('periods', {})}
+        for i, col in enumerate(labels.values()):
+            self.values[i, self.years < starts.get(col, self.years[0])] = np.nan
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        res = compute()
+        with self._lock:
+            self._cache[key] = res
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return res
+
+    def _window(self, start, end):
+        lo = np.searchsorted(self.years, start if start is not None else self.years[0])
+        hi = np.searchsorted(self.years, end if end is not None else self.years[-1], side='right')
+        return self.values[:, lo:hi], self.years[lo:hi]
+
+    def matrix(self, start=None, end=None, method='pearson'):
+        """Matriz (k × k) de correlaciones en el rango de años [start, end]."""
+        def compute():
+            X, _ = self._window(start, end)
+            return _pairwise_spearman(X) if method == 'spearman' else _pairwise_pearson(X)
+        return self._cached(('matrix', start, end, method), compute)
+
+    def rolling(self, target, window, method='pearson', start=None, end=None):
+        """Correlación móvil de ``target`` contra todas las series, con las ventanas dentro de [start, end].
+
+        Devuelve (años de cierre de ventana, matriz k × ventanas).
+        """
+        def compute():
+            j = self.labels.index(target)
+            X, years = self._window(start, end)
+            if X.shape[1] < window:
+                return years[:0], np.empty((len(X), 0))
+            if method == 'spearman':
+                return self._rolling_spearman(X, years, j, window)
+            return self._rolling_pearson(X, years, j, window)
+        return self._cached(('rolling', target, window, method, start, end), compute)
+
+    def _rolling_pearson(self, X, years, j, w):
+        W = (~np.isnan(X)) & ~np.isnan(X[j])
+        Xc = _center(X, ~np.isnan(X)) * W
+        Y = np.broadcast_to(Xc[j], Xc.shape) * W
+        terms = np.stack([W.astype(np.float64), Xc, Y, Xc * Xc, Y * Y, Xc * Y])
+        cs = np.concatenate([np.zeros(terms.shape[:2] + (1,)), np.cumsum(terms, axis=2)], axis=2)
+        n, sx, sy, sxx, syy, sxy = cs[..., w:] - cs[..., :-w]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = (sxy - sx * sy / n) / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+        r[n < MIN_OBS] = np.nan
+        return years[w - 1:], np.clip(r, -1, 1)
+
+    def _rolling_spearman(self, X, years, j, w):
+        win = np.lib.stride_tricks.sliding_window_view(X, w, axis=1)  # k × m × w
+        valid = ~np.isnan(win) & ~np.isnan(win[j])
+        # Rangos de la serie y del objetivo sobre el tramo común de cada par
+        Rx = np.where(valid, _ranks(np.where(valid, win, np.nan), nan_policy='omit'), 0.0)
+        Ry = np.where(valid, _ranks(np.where(valid, win[j], np.nan), nan_policy='omit'), 0.0)
+        n = valid.sum(axis=2)
+        Rx, Ry = _center(Rx, valid), _center(Ry, valid)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = (Rx * Ry).sum(2) / np.sqrt((Rx * Rx).sum(2) * (Ry * Ry).sum(2))
+        r[n < MIN_OBS] = np.nan
+        return years[w - 1:], np.clip(r, -1, 1)
+
+
+_ENGINES = VersionRegistry(CorrelationEngine)
+
+
+def correlation_for(store):
+    return _ENGINES.get(store)
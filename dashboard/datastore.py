@@ -0,0 +1,300 @@
+"""
+Almacén columnar de las series del dashboard.
+
+Un bundle es un directorio con un ``meta.json`` y un archivo ``.npy`` por
+serie (más ``years`` como índice entero). Cada archivo se nombra por el hash
+de su contenido: reescribir el bundle sólo agrega las series que cambiaron y
+nunca trunca un archivo que otro proceso tenga mapeado; ``meta.json`` se
+reemplaza de forma atómica al final. Las columnas se abren con
+``mmap_mode='r'`` la primera vez que se leen: el sistema operativo pagina
+sólo lo que se lee, así que un bundle mensual o por anunciante no infla la
+memoria del proceso, y abrirlo no mapea (ni ocupa un descriptor de archivo
+por) las miles de series que la app nunca toca. Los recorridos de todo el
+bundle (``matrix`` con más de ``MAP_MAX`` series) leen sin mapear, así que
+tampoco dejan un descriptor por columna.
+
+``DataStore.view()`` expone la misma forma de diccionario que tenía ``D``
+(``D['hist'][col]``, ``D['forecast']``...) como vista de sólo lectura.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import ChainMap, OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from types import MappingProxyType
+
+import numpy as np
+
+FORMAT = 1
+INDEX = 'years'
+DEFAULT_DATA_DIR = Path(os.environ.get(
+    'DASHBOARD_DATA_DIR', Path(__file__).resolve().parent.parent / 'data'))
+# Cada mmap ocupa un descriptor de archivo: una matriz de más series que esto
+# se lee a memoria sin dejar mapeadas sus columnas
+MAP_MAX = 256
+# Archivos de columnas de las últimas versiones escritas, para ``prune_bundle``
+HISTORY = 'history.json'
+
+
+def _digest(arr):
+    h = hashlib.sha1(str(arr.dtype).encode())
+    h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+
+def _freeze(obj):
+    # Los dicts anidados pasan a MappingProxyType; las listas se dejan tal cual
+    # porque el código de pestañas las concatena (``[x] + fc['fc']``).
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    return obj
+
+
+def _save_column(root, name, arr):
+    """Guarda ``arr`` como ``columns/<name>.<hash>.npy`` si aún no existe."""
+    digest = _digest(arr)
+    fname = f'{name}.{digest[:12]}.npy'
+    path = root / 'columns' / fname
+    if not path.exists():
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            np.save(f, arr)
+        os.replace(tmp, path)
+    return {'dtype': str(arr.dtype), 'digest': digest, 'file': fname}
+
+
+def write_bundle(root, years, columns, tables=None):
+    """Escribe un bundle en ``root`` y devuelve su versión (hash de contenido)."""
+    root = Path(root)
+    (root / 'columns').mkdir(parents=True, exist_ok=True)
+    years = np.asarray(years, dtype=np.int32)
+    series = {}
+    for name, values in columns.items():
+        arr = np.asarray(values, dtype=np.float64)
+        if arr.shape[-1] != len(years):
+            raise ValueError(f"La serie '{name}' tiene {arr.shape[-1]} periodos, se esperaban {len(years)}")
+        series[name] = _save_column(root, name, arr)
+    index = _save_column(root, INDEX, years)
+    tables = tables or {}
+
+    h = hashlib.sha1(_digest(years).encode())
+    for name in sorted(series):
+        h.update(f"{name}:{series[name]['digest']}".encode())
+    h.update(json.dumps(tables, sort_keys=True).encode())
+    meta = {'format': FORMAT, 'version': h.hexdigest()[:16], 'index': INDEX,
+            'index_file': index['file'], 'series': series, 'tables': tables}
+    tmp = root / 'meta.json.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, root / 'meta.json')
+    _record_history(root, meta)
+    return meta['version']
+
+
+def _files(meta):
+    return [meta.get('index_file', f"{meta['index']}.npy")] + \
+        [s.get('file', f'{n}.npy') for n, s in meta['series'].items()]
+
+
+def _read_history(root):
+    try:
+        with open(Path(root) / HISTORY, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _record_history(root, meta):
+    history = [h for h in _read_history(root) if h['version'] != meta['version']]
+    history = (history + [{'version': meta['version'], 'files': _files(meta)}])[-VERSIONS_KEPT:]
+    tmp = root / f'{HISTORY}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(history, f, separators=(',', ':'))
+    os.replace(tmp, root / HISTORY)
+
+
+def prune_bundle(root, keep=1):
+    """Borra los archivos de columnas que no referencia ninguna de las últimas ``keep`` versiones.
+
+    Las versiones salen de ``history.json``; la de ``meta.json`` se conserva siempre.
+    """
+    root = Path(root)
+    with open(root / 'meta.json', encoding='utf-8') as f:
+        meta = json.load(f)
+    used = set(_files(meta))
+    for h in _read_history(root)[-keep:]:
+        used.update(h['files'])
+    removed = [p for p in (root / 'columns').iterdir() if p.name not in used]
+    for p in removed:
+        p.unlink()
+    return [p.name for p in removed]
+
+
+class _Columns(Mapping):
+    """Columnas del bundle por nombre; cada ``.npy`` se mapea en la primera lectura."""
+
+    def __init__(self, root, series):
+        self.root = Path(root)
+        self.series = series
+        self._open = {}
+
+    def _path(self, name):
+        # Los bundles sin ``file`` usan el nombre de la serie a secas
+        return self.root / 'columns' / self.series[name].get('file', f'{name}.npy')
+
+    def __getitem__(self, name):
+        arr = self._open.get(name)
+        if arr is None:
+            arr = self._open[name] = np.load(self._path(name), mmap_mode='r')
+        return arr
+
+    def read(self, name):
+        """Valores de ``name``: su mmap si ya está abierto, si no una lectura que no lo deja mapeado."""
+        arr = self._open.get(name)
+        return np.load(self._path(name)) if arr is None else arr
+
+    def __iter__(self):
+        return iter(self.series)
+
+    def __len__(self):
+        return len(self.series)
+
+    def __contains__(self, name):
+        return name in self.series
+
+
+class DataStore:
+    """Series tipadas (una por columna) indexadas por año entero."""
+
+    def __init__(self, root, meta, years, columns):
+        self.root = Path(root)
+        self.meta = meta
+        self.years = years
+        self._columns = columns
+        self._pos = {int(y): i for i, y in enumerate(years)}
+        self._view = None
+
+    @classmethod
+    def open(cls, root=DEFAULT_DATA_DIR):
+        root = Path(root)
+        with open(root / 'meta.json', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT:
+            raise ValueError(f"Formato de bundle no soportado: {meta.get('format')}")
+        years = np.load(root / 'columns' / meta.get('index_file', f"{meta['index']}.npy"), mmap_mode='r')
+        return cls(root, meta, years, _Columns(root, meta['series']))
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    @property
+    def names(self):
+        return tuple(self._columns)
+
+    @property
+    def tables(self):
+        return self.meta['tables']
+
+    def column(self, name):
+        return self._columns[name]
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def matrix(self, names):
+        """Apila varias series en una matriz (series × periodos).
+
+        Con más de ``MAP_MAX`` series (recorridos de todo el bundle) las columnas
+        se leen sin quedar mapeadas: miles de mmap agotarían los descriptores.
+        """
+        names = list(names)
+        get = self._columns.__getitem__ if len(names) <= MAP_MAX else self._columns.read
+        return np.vstack([get(n) for n in names])
+
+    def digest(self, *names):
+        """Versión restringida a un subconjunto de series o tablas (todo si no se indican)."""
+        if not names:
+            return self.version
+        h = hashlib.sha1()
+        for n in names:
+            if n in self.meta['series']:
+                h.update(self.meta['series'][n]['digest'].encode())
+            elif n == INDEX:
+                h.update(self.meta['index_file'].encode())
+            else:
+                h.update(json.dumps(self.tables.get(n), sort_keys=True).encode())
+        return h.hexdigest()[:16]
+
+    def year_pos(self, year):
+        return self._pos[int(year)]
+
+    def view(self, **overrides):
+        """Vista de sólo lectura con la forma histórica de ``D``.
+
+        ``overrides`` reemplaza claves por mapeos calculados (p. ej. el
+        pronóstico en vivo en ``forecast``).
+        """
+        if self._view is None:
+            hist = ChainMap({INDEX: self.years}, self._columns)
+            self._view = {'hist': MappingProxyType(hist),
+                          **{k: _freeze(v) for k, v in self.tables.items()}}
+        return MappingProxyType({**self._view, **overrides})
+
+
+_LIVE = {}
+_LIVE_LOCK = threading.Lock()
+
+
+def live_store(root=DEFAULT_DATA_DIR):
+    """``DataStore`` vigente de ``root``: se reabre cuando cambia ``meta.json`` (p. ej. tras una ingesta)."""
+    root = Path(root)
+    mtime = os.stat(root / 'meta.json').st_mtime_ns
+    current = _LIVE.get(root)
+    if current is None or current[0] != mtime:
+        with _LIVE_LOCK:
+            current = _LIVE.get(root)
+            if current is None or current[0] != mtime:
+                current = _LIVE[root] = (mtime, DataStore.open(root))
+    return current[1]
+
+
+# Versiones que guarda cada registro: tras una ingesta, las sesiones abiertas
+# pasan a la nueva en segundos y las viejas (con sus mmap) se liberan
+VERSIONS_KEPT = int(os.environ.get('DASHBOARD_VERSIONS_KEPT', 4))
+
+
+class VersionRegistry:
+    """Un objeto por versión de datos (``factory(store, *args)``), compartido por las sesiones.
+
+    Conserva sólo las ``size`` versiones usadas más recientemente.
+    """
+
+    def __init__(self, factory, size=VERSIONS_KEPT):
+        self._factory = factory
+        self._size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, store, *args):
+        with self._lock:
+            item = self._items.get(store.version)
+            if item is None:
+                item = self._items[store.version] = self._factory(store, *args)
+                while len(self._items) > self._size:
+                    self._items.popitem(last=False)
+            else:
+                self._items.move_to_end(store.version)
+            return item
+
+
+def prune_runs(runs, size=VERSIONS_KEPT):
+    """Quita de ``runs`` ({versión: corrida}) las terminadas más viejas hasta dejar ``size``."""
+    done = [v for v, run in runs.items() if not run.running]
+    for version in done[:max(len(runs) - size, 0)]:
+        del runs[version]
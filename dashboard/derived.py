@@ -0,0 +1,99 @@
+"""
+Métricas derivadas de las series: participaciones, crecimiento YoY, CAGR,
+rankings y penetración digital.
+
+Todo se calcula como operaciones sobre la matriz (series × periodos) una
+sola vez por versión del bundle; las pestañas y los KPIs leen de aquí en vez
+de recorrer medios y años con comprensiones de listas.
+"""
+import numpy as np
+
+from dashboard.datastore import VersionRegistry
+from dashboard.forecast import CATEGORIES
+
+MEDIA = ('tv_nac', 'tv_local', 'prensa', 'radio', 'digital', 'revistas', 'exterior')
+TOTAL = 'total'
+
+
+class Derived:
+    """Métricas de los medios y el total de un bundle.
+
+    ``values`` y ``yoy`` tienen una fila por medio más el total al final;
+    ``shares`` y ``rank``, sólo los medios. Las consultas por año levantan
+    ``ValueError`` si el año no está en el bundle.
+    """
+
+    def __init__(self, store, names=MEDIA, total=TOTAL):
+        self.store = store
+        self.years = np.asarray(store.years)
+        self.names = tuple(names)
+        self._row = {n: i for i, n in enumerate(self.names + (total,))}
+        # Fila final = total, para que YoY/CAGR lo traten como una serie más
+        self.values = np.vstack([store.matrix(self.names), np.asarray(store[total])[None, :]])
+        tot = self.values[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.shares = np.where(tot > 0, self.values[:-1] / tot * 100, 0.0)
+            prev = self.values[:, :-1]
+            self.yoy = np.full(self.values.shape, np.nan)
+            self.yoy[:, 1:] = np.where(prev > 0, (self.values[:, 1:] - prev) / prev * 100, np.nan)
+        # rank[i, t] = posición (0 = mayor inversión) del medio i en el año t
+        order = np.argsort(-self.values[:-1], axis=0, kind='stable')
+        self.rank = np.empty_like(order)
+        np.put_along_axis(self.rank, order, np.arange(len(self.names))[:, None], axis=0)
+        self.cagr_real = self.cagr_table(store.tables['periods']) if 'periods' in store.tables else {}
+
+    def row(self, name):
+        return self._row[name]
+
+    def series(self, name):
+        return self.values[self._row[name]]
+
+    def share(self, name):
+        return self.shares[self._row[name]]
+
+    def growth(self, name):
+        return self.yoy[self._row[name]]
+
+    def first_positive(self, name):
+        return int(np.argmax(self.series(name) > 0))
+
+    def year_pos(self, years):
+        """Posición de cada año de ``years`` en ``self.years``."""
+        years = np.asarray(years)
+        i = np.minimum(np.searchsorted(self.years, years), len(self.years) - 1)
+        missing = self.years[i] != years
+        if missing.any():
+            names = ', '.join(f'{y:g}' for y in np.unique(years[missing]).tolist())
+            raise ValueError(f'año fuera del bundle ({self.years[0]}–{self.years[-1]}): {names}')
+        return i
+
+    def cagr(self, names, start, end):
+        """CAGR % entre ``start`` y ``end`` (escalares o un año por serie)."""
+        rows = [self._row[n] for n in names]
+        start = np.broadcast_to(np.asarray(start), (len(rows),))
+        end = np.broadcast_to(np.asarray(end), (len(rows),))
+        i0, i1 = self.year_pos(start), self.year_pos(end)
+        v0, v1 = self.values[rows, i0], self.values[rows, i1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = (np.power(v1 / v0, 1.0 / (end - start)) - 1) * 100
+        return np.where((v0 > 0) & (v1 > 0) & (end > start), out, np.nan)
+
+    def cagr_table(self, periods, decimals=2):
+        """{categoría: CAGR %} sobre el período real de cada categoría."""
+        cats = list(periods)
+        start, end = np.array([periods[c] for c in cats]).T
+        vals = self.cagr([CATEGORIES[c] for c in cats], start, end)
+        return {c: round(float(v), decimals) for c, v in zip(cats, vals)}
+
+    def ranking(self, year):
+        """[(serie, valor)] de mayor a menor inversión en ``year``."""
+        t = int(self.year_pos(year))
+        order = np.argsort(self.rank[:, t])
+        return [(self.names[i], float(self.values[i, t])) for i in order]
+
+
+_DERIVED = VersionRegistry(Derived)
+
+
+def derived_for(store):
+    return _DERIVED.get(store)
@@ -0,0 +1,89 @@
+"""
+Reducción de puntos en el servidor para series largas (diarias, semanales).
+
+Con el bundle anual (31 puntos) no cambia nada. Con series largas, cada traza
+se recorta al rango visible y se reduce a ``MAX_POINTS`` antes de serializar:
+
+  lttb    Largest-Triangle-Three-Buckets: conserva la forma de la curva
+  minmax  mínimo y máximo de cada tramo: conserva picos y valles
+
+Por encima de ``GL_POINTS`` puntos enviados la traza pasa a ``Scattergl``
+(WebGL) y se quitan los marcadores, así que el peso del JSON y el tiempo de
+dibujo en el navegador quedan acotados sea cual sea el largo de la serie.
+"""
+import numpy as np
+import plotly.graph_objects as go
+
+MAX_POINTS = 2_000
+GL_POINTS = 1_000
+MARKER_POINTS = 200
+
+
+def _numeric(x):
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb(x, y, n_out):
+    """Índices de los ``n_out`` puntos que elige LTTB (incluye primero y último)."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _numeric(x), np.asarray(y, dtype=np.float64)
+    # n_out - 2 tramos entre el primer y el último punto; promedios de cada tramo de una vez
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[-1])
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Área del triángulo (punto elegido, candidato, promedio del tramo siguiente)
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[i + 1] - y[a]))
+        a = out[i + 1] = lo + int(np.argmax(area))
+    return out
+
+
+def minmax(x, y, n_out):
+    """Índices del mínimo y el máximo de cada uno de ``n_out // 2`` tramos, en orden."""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    bucket = np.arange(n) * (n_out // 2) // n
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.r_[True, np.diff(bucket[order]) > 0])
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate([order[starts], order[ends], [0, n - 1]]))
+
+
+METHODS = {'lttb': lttb, 'minmax': minmax}
+
+
+def visible(x, x_range):
+    """Tramo ``[i, j)`` de ``x`` (ordenado) dentro de ``x_range``, con un punto de margen a cada lado."""
+    x = np.asarray(x)
+    if x_range is None:
+        return 0, len(x)
+    lo, hi = np.asarray(x_range, dtype=x.dtype)
+    i = max(int(np.searchsorted(x, lo, side='left')) - 1, 0)
+    j = min(int(np.searchsorted(x, hi, side='right')) + 1, len(x))
+    return i, j
+
+
+def line_trace(x, y, x_range=None, max_points=MAX_POINTS, method='lttb', **kwargs):
+    """``go.Scatter`` (o ``go.Scattergl`` si es larga) recortada y reducida en el servidor."""
+    i, j = visible(x, x_range)
+    x, y = np.asarray(x)[i:j], np.asarray(y)[i:j]
+    if len(x) > max_points:
+        idx = METHODS[method](x, y, max_points)
+        x, y = x[idx], y[idx]
+    if len(x) > MARKER_POINTS and 'markers' in kwargs.get('mode', ''):
+        kwargs['mode'] = 'lines'
+    trace = go.Scattergl if len(x) > GL_POINTS else go.Scatter
+    xs = np.datetime_as_string(x).tolist() if x.dtype.kind == 'M' else x.tolist()
+    return trace(x=xs, y=y.tolist(), **kwargs)
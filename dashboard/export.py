@@ -0,0 +1,390 @@
+"""
+Exportación del informe mensual: gráficos en PNG, tablas en XLSX y un PDF.
+
+    python -m dashboard.export --formats pdf,xlsx,png --out informes/
+
+Toma los gráficos de las pestañas Tendencias a Modelos con los valores
+iniciales de los widgets (los mismos que precalienta ``dashboard.warm``). Cada
+figura sale de la caché de figuras como JSON y se rasteriza con kaleido en un
+pool de procesos; el PNG se guarda en ``.cache/renders`` con el hash del JSON,
+así que un gráfico que no cambió entre exportaciones no se vuelve a dibujar
+(los que ninguna exportación reutilizó en ``RENDER_MAX_AGE`` se borran).
+Las tablas de proyección y de métricas de modelos van a un XLSX (openpyxl) y
+las imágenes se unen en un PDF página por página (Pillow).
+
+En la app la exportación corre en un hilo (``ExportJob``): la sesión sigue
+respondiendo, ve el progreso y descarga los archivos al terminar.
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from dashboard.datastore import DEFAULT_DATA_DIR, prune_runs
+from dashboard.forecast import CATEGORIES
+from dashboard.models import DEFAULT_CACHE_DIR, FAMILIES
+
+FORMATS = {'pdf': 'PDF', 'xlsx': 'Excel (XLSX)', 'png': 'Imágenes (PNG)'}
+# Pestaña → (gráfico, título) en el orden del informe
+REPORT = {
+    'Tendencias': (
+        ('total_trend', 'Inversión Publicitaria Total — Colombia'),
+        ('media_stack', 'Composición por Medio · Área Apilada'),
+        ('media_share', 'Participación de Mercado Anual %'),
+        ('total_yoy', 'Crecimiento Anual YoY %'),
+        ('macro_context', 'Contexto Macroeconómico'),
+    ),
+    'Pronóstico': (
+        ('forecast_category', 'Histórico + Pronóstico TOTAL · IC 95%'),
+        ('cagr_bars', 'CAGR por Categoría · Período Real'),
+        ('forecast_comparison', 'Proyección Comparativa'),
+    ),
+    'Por Medios': (
+        ('media_lines', 'Series Históricas por Medio'),
+        ('share_pie', 'Participación por Medio'),
+        ('media_ranking', 'Ranking de Inversión'),
+    ),
+    'Digital': (
+        ('digital_vs_internet', 'Digital vs Penetración Internet'),
+        ('digital_growth', 'Crecimiento Digital Histórico'),
+        ('digital_share', 'Participación Digital del Total (%)'),
+        ('internet_vs_digital', 'Penetración Internet vs Participación Digital'),
+    ),
+    'Correlaciones': (
+        ('corr_heatmap', 'Matriz de Correlaciones Pearson'),
+        ('trm_scatter', 'TRM vs Inversión Total'),
+        ('ipc_scatter', 'IPC vs Inversión Total'),
+        ('corr_ranking', 'Correlaciones vs Total · Ranking'),
+        ('rolling_corr', 'Correlación Móvil vs Total'),
+    ),
+    'Modelos': (
+        ('model_aic', 'AIC por Categoría y Modelo'),
+        ('model_rmse', 'RMSE Backtest (escala log)'),
+        ('forecast_ci', 'Proyección + IC 95%'),
+        ('backtest_horizon', 'Backtest rolling-origin · MAPE TOTAL por horizonte'),
+    ),
+}
+WIDTH, HEIGHT, SCALE = 1400, 700, 2
+# A4 apaisado a 150 dpi
+PAGE, DPI, MARGIN = (1754, 1240), 150, 80
+RENDER_DIR = DEFAULT_CACHE_DIR / 'renders'
+EXPORT_DIR = DEFAULT_CACHE_DIR / 'exports'
+# Un PNG que ninguna exportación reutilizó en este tiempo se borra
+RENDER_MAX_AGE = 30 * 24 * 3600
+
+
+def images_available():
+    return importlib.util.find_spec('kaleido') is not None
+
+
+def _require_images():
+    if not images_available():
+        raise ImportError('Exportar PDF o PNG requiere kaleido (pip install -r requirements-export.txt)')
+
+
+def render_key(spec, width=WIDTH, height=HEIGHT, scale=SCALE):
+    h = hashlib.sha1(spec)
+    h.update(f'|{width}x{height}@{scale}'.encode())
+    return h.hexdigest()[:20]
+
+
+def report_charts(D, comparison):
+    """[(pestaña, título, gráfico, parámetros)] del informe."""
+    from dashboard.warm import default_charts
+
+    params = dict(default_charts(D, comparison, FAMILIES))
+    return [(tab, title, cid, params[cid]) for tab, charts in REPORT.items() for cid, title in charts]
+
+
+def _render(task):
+    """PNG de una figura (en el proceso trabajador); escribe ``path`` de forma atómica."""
+    spec, path, width, height, scale = task
+    import plotly.graph_objects as go
+
+    png = go.Figure(json.loads(spec), _validate=False).to_image(format='png', width=width, height=height,
+                                                                 scale=scale)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_bytes(png)
+    os.replace(tmp, path)
+    return path
+
+
+def prune_renders(keep=(), max_age=RENDER_MAX_AGE, render_dir=None):
+    """Borra de ``render_dir`` los PNG sin uso hace más de ``max_age`` segundos (salvo ``keep``)."""
+    render_dir = RENDER_DIR if render_dir is None else Path(render_dir)
+    cutoff, keep, removed = time.time() - max_age, set(keep), []
+    for path in render_dir.glob('*.png'):
+        try:
+            if path not in keep and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed.append(path.name)
+        except FileNotFoundError:       # otra exportación lo borró primero
+            pass
+    return removed
+
+
+# ─── TABLAS ─────────────────────────────────────────────────────
+
+def write_tables(D, comparison, path):
+    """XLSX con la proyección por categoría (central e IC), las métricas de cada modelo y su backtest."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Proyección'
+    cats = list(CATEGORIES)
+    ws.append(['Año'] + [f'{c} {k}' for c in cats for k in ('central', 'IC inf', 'IC sup')])
+    fc = {c: D['forecast'][c] for c in cats}
+    for i, yr in enumerate(fc['TOTAL']['fc_yrs']):
+        ws.append([yr] + [v for c in cats for v in (fc[c]['fc'][i], fc[c]['lo'][i], fc[c]['hi'][i])])
+    for row in ws.iter_rows(min_row=2, min_col=2):
+        for cell in row:
+            cell.number_format = '#,##0'
+
+    wm = wb.create_sheet('Métricas')
+    wm.append(['Categoría', 'Período', 'Familia', 'AIC', 'BIC', 'RMSE', 'CAGR %'])
+    for c in cats:
+        a, b = D['periods'][c]
+        for family, label in FAMILIES.items():
+            m = comparison[family].get(c) or {}
+            wm.append([c, f'{a}–{b}', label, m.get('aic'), m.get('bic'), m.get('rmse'), D['cagr'].get(c)])
+
+    wt = wb.create_sheet('Backtest')
+    wt.append(['Categoría', 'Familia', 'Horizonte', 'Pronósticos', 'MAPE %', 'RMSE', 'Cobertura IC %'])
+    for c in cats:
+        for family, label in FAMILIES.items():
+            s = D['backtest'].scores(family, c)
+            for i, h in enumerate(s['h']):
+                wt.append([c, label, h, s['n'][i], s['mape'][i], s['rmse'][i], s['coverage'][i]])
+
+    for sheet in (ws, wm, wt):
+        sheet.freeze_panes = 'B2'
+        for cell in sheet[1]:
+            cell.font = Font(bold=True)
+        for col in sheet.columns:
+            sheet.column_dimensions[col[0].column_letter].width = max(10, len(str(col[0].value)) + 2)
+    tmp = path.with_suffix('.tmp')
+    wb.save(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+# ─── PDF ────────────────────────────────────────────────────────
+
+def stitch_pdf(pages, path, title, subtitle=''):
+    """PDF con una portada y una página por ``(encabezado, png)``; se agrega de a una página."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    big, small = ImageFont.load_default(size=44), ImageFont.load_default(size=26)
+    tmp = path.with_suffix('.tmp')
+
+    def blank(heading, font):
+        page = Image.new('RGB', PAGE, 'white')
+        ImageDraw.Draw(page).text((MARGIN, MARGIN), heading, fill='#0b1627', font=font)
+        return page
+
+    cover = blank(title, big)
+    ImageDraw.Draw(cover).text((MARGIN, MARGIN + 70), subtitle, fill='#4e6480', font=small)
+    cover.save(tmp, 'PDF', resolution=DPI)
+    top = MARGIN + 60
+    for heading, png in pages:
+        page = blank(heading, small)
+        with Image.open(png) as im:
+            im = im.convert('RGB')
+            im.thumbnail((PAGE[0] - 2 * MARGIN, PAGE[1] - top - MARGIN))
+            page.paste(im, ((PAGE[0] - im.width) // 2, top))
+        page.save(tmp, 'PDF', resolution=DPI, append=True)
+    os.replace(tmp, path)
+    return path
+
+
+# ─── TRABAJO EN SEGUNDO PLANO ───────────────────────────────────
+
+class ExportJob:
+    """Exportación en un hilo: rasteriza en un pool de procesos, escribe tablas y PDF (cancelable)."""
+
+    def __init__(self, store, D, comparison, formats, out_dir, max_workers=None):
+        self.store = store
+        self.D = D
+        self.comparison = comparison
+        self.formats = [f for f in FORMATS if f in formats]
+        self.out_dir = Path(out_dir)
+        self.charts = report_charts(D, comparison)
+        images = bool({'pdf', 'png'} & set(self.formats))
+        self.total = (len(self.charts) if images else 0) + len(self.formats)
+        self.done = 0
+        self.reused = 0
+        self.files = {}
+        self.error = None
+        self._max_workers = max_workers or os.cpu_count()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._work, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return not self.running
+
+    def _renders(self):
+        """[(encabezado, png)] del informe; dibuja sólo los que no están en ``RENDER_DIR``."""
+        from dashboard import figures
+        from dashboard.figcache import figure_cache
+
+        cache = figure_cache()
+        RENDER_DIR.mkdir(parents=True, exist_ok=True)
+        pages, tasks = [], {}
+        for tab, title, cid, params in self.charts:
+            spec = cache.spec(cid, figures.chart_version(self.store, cid), getattr(figures, cid), self.D, **params)
+            path = RENDER_DIR / f'{render_key(spec)}.png'
+            pages.append((f'{tab} · {title}', cid, path))
+            if path.exists():
+                os.utime(path)
+                self.reused += 1
+                self.done += 1
+            else:
+                tasks[path] = (spec, path, WIDTH, HEIGHT, SCALE)
+        if tasks:
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(self._max_workers, len(tasks)), mp_context=ctx) as pool:
+                pending = {pool.submit(_render, t) for t in tasks.values()}
+                while pending and not self._cancel.is_set():
+                    finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        fut.result()
+                        self.done += 1
+                if self._cancel.is_set():
+                    pool.shutdown(wait=False, cancel_futures=True)
+        prune_renders(keep=[path for *_, path in pages])
+        return pages
+
+    def _work(self):
+        try:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            if 'xlsx' in self.formats:
+                self.files['xlsx'] = write_tables(self.D, self.comparison, self.out_dir / 'tablas.xlsx')
+                self.done += 1
+            if not {'pdf', 'png'} & set(self.formats):
+                return
+            _require_images()
+            pages = self._renders()
+            if self._cancel.is_set():
+                return
+            if 'png' in self.formats:
+                path = self.out_dir / 'graficos.zip'
+                with zipfile.ZipFile(path.with_suffix('.tmp'), 'w') as zf:
+                    for i, (_, cid, png) in enumerate(pages, 1):
+                        zf.write(png, f'{i:02d}_{cid}.png')
+                os.replace(path.with_suffix('.tmp'), path)
+                self.files['png'] = path
+                self.done += 1
+            if 'pdf' in self.formats:
+                yrs = self.D['hist']['years']
+                subtitle = (f'{int(yrs[0])}–{int(yrs[-1])} · datos {self.store.version} · '
+                            f"{time.strftime('%Y-%m-%d %H:%M')}")
+                self.files['pdf'] = stitch_pdf([(h, png) for h, _, png in pages], self.out_dir / 'informe.pdf',
+                                               'Inversión Publicitaria en Colombia', subtitle)
+                self.done += 1
+        except Exception as exc:  # se muestra en la UI en vez de perder el hilo
+            self.error = exc
+
+
+class ExportService:
+    """Una exportación activa (y la última terminada) por versión reciente del bundle."""
+
+    def __init__(self, out_dir=EXPORT_DIR):
+        self.dir = Path(out_dir)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def last(self, store):
+        return self._jobs.get(store.version)
+
+    def active(self, store):
+        job = self._jobs.get(store.version)
+        return job if job is not None and job.running else None
+
+    def start(self, store, D, comparison, formats, max_workers=None):
+        """Lanza la exportación (o devuelve la que está en curso para el bundle)."""
+        with self._lock:
+            job = self.active(store)
+            if job is None:
+                out = self.dir / f"{store.version}-{time.strftime('%Y%m%d-%H%M%S')}"
+                self._jobs.pop(store.version, None)
+                job = self._jobs[store.version] = ExportJob(store, D, comparison, formats, out,
+                                                            max_workers).start()
+                prune_runs(self._jobs)
+            return job
+
+
+_SERVICE = None
+
+
+def export_service():
+    global _SERVICE
+    if _SERVICE is None:
+        _SERVICE = ExportService()
+    return _SERVICE
+
+
+def main(argv=None):
+    from dashboard.context import data_view
+    from dashboard.datastore import DataStore
+    from dashboard.models import model_service
+
+    parser = argparse.ArgumentParser(prog='python -m dashboard.export', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--formats', default='pdf,xlsx,png', help=f"separados por coma: {', '.join(FORMATS)}")
+    parser.add_argument('--out', type=Path, help='directorio de salida (por defecto .cache/exports/<versión>-<fecha>)')
+    parser.add_argument('--data', type=Path, default=DEFAULT_DATA_DIR, help='directorio del bundle')
+    args = parser.parse_args(argv)
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"formatos desconocidos: {', '.join(sorted(unknown))}")
+
+    store = DataStore.open(args.data)
+    D = data_view(store)
+    comparison = model_service().comparison(store)
+    if args.out is None:
+        job = export_service().start(store, D, comparison, formats)
+    else:
+        job = ExportJob(store, D, comparison, formats, args.out).start()
+    while not job.wait(1.0):
+        print(f'  {job.done}/{job.total}', end='\r', flush=True)
+    if job.error is not None:
+        print(f'error: {job.error}', file=sys.stderr)
+        return 1
+    print(f'{job.reused} gráficos reutilizados de {RENDER_DIR}')
+    for fmt, path in job.files.items():
+        print(f'  {FORMATS[fmt]:<16} {path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Caché de figuras compartida por todas las sesiones del proceso.
+
+Guarda el JSON de cada figura construida bajo la clave
+(id de gráfico, versión de datos, valores de widget). Un acierto sólo
+deserializa el JSON, sin repetir la construcción ni la validación de Plotly.
+Expulsión LRU con tope en bytes y en número de entradas.
+
+Si ``DASHBOARD_CACHE_URL`` apunta a un backend compartido (SQLite, Redis), un
+fallo local se busca ahí antes de construir: la figura que armó una réplica
+del nodo la reutilizan las demás. Cada gráfico tiene su propio espacio en el
+backend, porque su versión es la de sus dependencias
+(``figures.chart_version``) y el backend descarta las versiones anteriores de
+cada espacio.
+
+Lo que se guarda (y se manda al navegador) es el JSON compactado por
+``dashboard.payload``: plantilla reducida, números redondeados a la precisión
+de pantalla y arreglos tipados en base64.
+"""
+import json
+import os
+
+import plotly.graph_objects as go
+
+from dashboard.cache import MemoryBackend, cache_backend
+from dashboard.payload import compact_json
+from dashboard.telemetry import telemetry
+
+MAX_BYTES = int(float(os.environ.get('DASHBOARD_FIGCACHE_MB', 64)) * 2**20)
+MAX_ITEMS = 512
+NAMESPACE = 'figure'
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class FigureCache:
+    def __init__(self, max_bytes=MAX_BYTES, max_items=MAX_ITEMS, shared=None):
+        self.local = MemoryBackend(max_bytes, max_items)
+        self.shared = shared if shared is not None and shared.shared else None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.local)
+
+    @property
+    def bytes(self):
+        return self.local.bytes
+
+    def get(self, key):
+        chart_id, version, params = key
+        spec, tier = self.local.get(chart_id, version, params), 'local'
+        if spec is None and self.shared is not None:
+            spec, tier = self.shared.get(f'{NAMESPACE}:{chart_id}', version, params), 'shared'
+            if spec is not None:
+                self.local.set(chart_id, version, params, spec)
+        if spec is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            tier = 'miss'
+        telemetry().count('cache_requests', cache='figure', result=tier, chart=chart_id)
+        return spec
+
+    def put(self, key, spec):
+        chart_id, version, params = key
+        self.local.set(chart_id, version, params, spec)
+        if self.shared is not None:
+            self.shared.set(f'{NAMESPACE}:{chart_id}', version, params, spec)
+
+    def clear(self):
+        self.local.clear()
+
+    def spec(self, chart_id, version, build, data, **params):
+        """JSON (bytes) de ``build(data, **params)``, construyéndolo sólo si falta.
+
+        ``version`` identifica los datos de entrada (hash del bundle o de las
+        series usadas); ``params`` son los valores de widget que la afectan.
+        """
+        tel = telemetry()
+        key = (chart_id, version, _params_key(params))
+        spec = self.get(key)
+        if spec is None:
+            with tel.section('figure_build', chart=chart_id):
+                raw = build(data, **params).to_json().encode()
+            with tel.section('figure_compact', chart=chart_id):
+                spec = compact_json(raw)
+            tel.observe('figure_raw_bytes', len(raw), chart=chart_id)
+            self.put(key, spec)
+        tel.observe('figure_payload_bytes', len(spec), chart=chart_id)
+        return spec
+
+    def figure(self, chart_id, version, build, data, **params):
+        """La figura de ``spec``, lista para ``st.plotly_chart``."""
+        spec = self.spec(chart_id, version, build, data, **params)
+        # El JSON ya salió de una figura validada: no hace falta revalidarlo
+        with telemetry().section('figure_load', chart=chart_id):
+            return go.Figure(json.loads(spec), _validate=False)
+
+
+_CACHE = None
+
+
+def figure_cache():
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = FigureCache(shared=cache_backend())
+    return _CACHE
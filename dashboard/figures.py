@@ -0,0 +1,635 @@
+"""
+Constructores de las figuras Plotly del dashboard.
+
+Cada función recibe ``D`` (la vista de datos) más los valores de widget que
+la afectan y devuelve un ``go.Figure``. No dependen de Streamlit, así que se
+pueden cachear, exportar o medir fuera de la app.
+"""
+import numpy as np
+import plotly.graph_objects as go
+
+from dashboard.anomaly import RATES
+from dashboard.downsample import line_trace
+
+# ─── PALETA ─────────────────────────────────────────────────────
+COLORS = {
+    'TV Nacional':'#3b82f6','TV Local':'#60a5fa','Prensa':'#f97316',
+    'Radio':'#fbbf24','Digital':'#ef4444','Revistas':'#a78bfa',
+    'Exterior':'#22d3ee','TOTAL':'#10b981',
+    'tv_nac':'#3b82f6','tv_local':'#60a5fa','prensa':'#f97316',
+    'radio':'#fbbf24','digital':'#ef4444','revistas':'#a78bfa',
+    'exterior':'#22d3ee','total':'#10b981','tv':'#93c5fd',
+    'ipc':'#fb923c','trm':'#818cf8','internet':'#34d399'
+}
+KK = ['TV Nacional','TV Local','Prensa','Radio','Digital','Revistas','Exterior']
+KC = ['tv_nac','tv_local','prensa','radio','digital','revistas','exterior']
+FAM_COLORS = {'loglineal':'#3b82f6','arimax':'#f97316','prophet':'#ef4444'}
+
+# Layout base para Plotly
+def base_layout(height=340, **kwargs):
+    layout = dict(
+        paper_bgcolor='#101d30', plot_bgcolor='#0b1627',
+        font=dict(family='DM Sans, sans-serif', color='#d8e8f5', size=11),
+        margin=dict(t=28, b=52, l=65, r=18),
+        xaxis=dict(gridcolor='#152035', zerolinecolor='#152035', linecolor='#1c2e47'),
+        yaxis=dict(gridcolor='#152035', zerolinecolor='#152035', linecolor='#1c2e47'),
+        legend=dict(bgcolor='rgba(0,0,0,0)', bordercolor='#1c2e47', borderwidth=1, font=dict(size=9.5)),
+        hoverlabel=dict(bgcolor='#0c1825', bordercolor='#1c2e47', font=dict(size=11)),
+        height=height
+    )
+    layout.update(kwargs)
+    return layout
+
+def fmt(v):
+    if v >= 1e6: return f"{v/1e6:.2f}M"
+    if v >= 1e3: return f"{v/1e3:.0f}K"
+    return f"{v:.0f}"
+
+def hex_rgba(h, a):
+    r,g,b = int(h[1:3],16), int(h[3:5],16), int(h[5:7],16)
+    return f"rgba({r},{g},{b},{a})"
+
+def year_pos(D, year):
+    return int(np.searchsorted(D['hist']['years'], year))
+
+def anomaly_markers(D, name, color, label, x_range=None, scale=1, **kwargs):
+    """Círculos sobre los años anómalos de ``name`` (``D['anomalies']``), o None si no hay."""
+    anoms = D['anomalies'].anomalies(name)
+    if x_range is not None:
+        anoms = [a for a in anoms if x_range[0] <= a['year'] <= x_range[1]]
+    if not anoms:
+        return None
+    unit = ' pp' if name in RATES else '%'
+    return go.Scatter(x=[a['year'] for a in anoms], y=[a['value'] * scale for a in anoms],
+        mode='markers', showlegend=False,
+        marker=dict(symbol='circle-open', size=13, line=dict(color=color, width=1.8)),
+        customdata=[a['deviation'] for a in anoms],
+        hovertemplate='Anomalía %{x}: %{customdata:+.1f}'+unit+' vs tendencia<extra>'+label+'</extra>', **kwargs)
+
+def provisional_trace(D, name, point, color, label, **kwargs):
+    """Año en curso de ``name`` anualizado con los meses pendientes de la ingesta, unido al último dato."""
+    x = D['hist']['years']
+    if point['year'] <= x[-1]:
+        return None
+    return go.Scatter(x=[x[-1], point['year']], y=[D['hist'][name][-1], point['value']],
+        mode='lines+markers', showlegend=False, line=dict(color=color, width=1.6, dash='dot'),
+        marker=dict(symbol='circle-open', size=[0, 9], line=dict(color=color, width=1.8)),
+        customdata=[point['months']] * 2,
+        hovertemplate='%{x} provisional: %{y:,.0f} (%{customdata}/12 meses, anualizado)<extra>'+label+'</extra>',
+        **kwargs)
+
+# ─── DEPENDENCIAS ───────────────────────────────────────────────
+# Series y tablas del bundle que lee cada gráfico (directamente o vía los
+# motores de D). La versión de su entrada en la caché de figuras es el hash de
+# sólo esas: una ingesta que revisa IPC no invalida las figuras de medios.
+_MEDIA = tuple(KC) + ('total', 'periods')
+_FORECAST = _MEDIA + ('tv', 'hierarchy')
+_MACRO = ('ipc', 'trm', 'internet')
+_CORR = ('tv', 'prensa', 'radio', 'digital', 'revistas', 'exterior', 'total') + _MACRO + ('periods',)
+DEPS = {
+    'total_trend': ('total', 'periods'), 'media_stack': tuple(KC), 'media_share': _MEDIA,
+    'total_yoy': ('total', 'periods'), 'macro_context': _MACRO,
+    'forecast_category': _FORECAST, 'cagr_bars': _MEDIA, 'forecast_comparison': _FORECAST,
+    'media_lines': _MEDIA, 'share_pie': _MEDIA, 'media_ranking': _MEDIA,
+    'digital_vs_internet': ('regression',), 'digital_growth': ('digital', 'total', 'periods'),
+    'digital_share': ('digital', 'total', 'periods'), 'internet_vs_digital': ('internet', 'digital', 'total', 'periods'),
+    'corr_heatmap': _CORR, 'trm_scatter': ('trm', 'total'), 'ipc_scatter': ('ipc', 'total'),
+    'corr_ranking': _CORR, 'rolling_corr': _CORR,
+    'model_aic': ('periods',), 'model_rmse': ('periods',), 'forecast_ci': _FORECAST,
+    'backtest_horizon': _MEDIA + _MACRO,
+    'scenario_drivers': _FORECAST + _MACRO, 'scenario_total': _FORECAST + _MACRO,
+    'scenario_categories': _FORECAST + _MACRO,
+    'budget_frontier': _FORECAST, 'budget_allocation': _FORECAST,
+}
+
+def chart_version(store, chart_id):
+    """Versión de los datos que usa ``chart_id`` (la del bundle si no está en DEPS)."""
+    deps = DEPS.get(chart_id)
+    return store.digest('years', *deps) if deps else store.version
+
+# ══════════════════════════════════════════════════════════════
+# TAB 1 – TENDENCIAS
+# ══════════════════════════════════════════════════════════════
+def total_trend(D, chart_type, provisional=None):
+    x, y = D['hist']['years'], D['hist']['total']
+    if chart_type == "Barras":
+        fig = go.Figure(go.Bar(x=x, y=y,
+            marker_color=[f"rgba(249,115,22,{0.35+0.65*i/len(x):.2f})" for i in range(len(x))],
+            hovertemplate="<b>%{x}</b><br>%{y:,.0f}<extra></extra>"))
+    else:
+        fill = 'tozeroy' if chart_type == "Área" else 'none'
+        fig = go.Figure(go.Scatter(x=x, y=y, mode='lines+markers', fill=fill,
+            line=dict(color='#f97316', width=2.8),
+            fillcolor='rgba(249,115,22,0.07)',
+            marker=dict(size=4, color='#f97316'),
+            hovertemplate="<b>%{x}</b><br>%{y:,.0f}<extra></extra>"))
+
+    for brk in D['breaks'][:2]:
+        yr_idx = year_pos(D, brk['year'])
+        fig.add_annotation(x=brk['year'], y=D['hist']['total'][yr_idx],
+            text=f"Ruptura {brk['year']} (nivel {brk['delta']:+.0f}%)", showarrow=True, arrowhead=2,
+            arrowcolor='rgba(239,68,68,.45)', font=dict(size=8, color='#f87171'),
+            bgcolor='rgba(239,68,68,.07)', bordercolor='rgba(239,68,68,.22)', borderpad=3)
+
+    # Años fuera de tendencia (las rupturas ya anotadas no se repiten)
+    shown = {brk['year'] for brk in D['breaks'][:2]}
+    anoms = [a for a in D['anomalies'].anomalies('total') if a['year'] not in shown]
+    for a in sorted(anoms, key=lambda a: -abs(a['z']))[:2]:
+        fig.add_annotation(x=a['year'], y=a['value'],
+            text=f"Anomalía {a['year']} ({a['deviation']:+.0f}%)", showarrow=True, arrowhead=2,
+            ay=40 if a['deviation'] < 0 else -40,
+            arrowcolor='rgba(251,191,36,.45)', font=dict(size=8, color='#fbbf24'),
+            bgcolor='rgba(251,191,36,.07)', bordercolor='rgba(251,191,36,.22)', borderpad=3)
+
+    if provisional and 'total' in provisional:
+        trace = provisional_trace(D, 'total', provisional['total'], '#f97316', 'Total')
+        if trace is not None:
+            fig.add_trace(trace)
+
+    fig.update_layout(**base_layout(340, yaxis_title='COP Miles', yaxis_tickformat=',', xaxis_title='Año'))
+    return fig
+
+def media_stack(D):
+    x = D['hist']['years']
+    fig2 = go.Figure()
+    for i, (name, col_key) in enumerate(zip(KK, KC)):
+        fig2.add_trace(go.Scatter(x=x, y=D['hist'][col_key], name=name,
+            stackgroup='one', fill='tonexty' if i > 0 else 'tozeroy',
+            fillcolor=f"rgba({','.join(str(int(COLORS[name][j*2+1:(j+1)*2+1],16)) for j in range(3))},0.72)",
+            line=dict(color=COLORS[name], width=0.6),
+            hovertemplate='%{x}: %{y:,.0f}<extra>'+name+'</extra>'))
+    fig2.update_layout(**base_layout(320, yaxis_title='COP Miles', xaxis_title='Año'))
+    return fig2
+
+def media_share(D):
+    x, d = D['hist']['years'], D['derived']
+    fig3 = go.Figure()
+    for i, (name, col_key) in enumerate(zip(KK, KC)):
+        fig3.add_trace(go.Bar(x=x, y=d.share(col_key), name=name,
+            marker_color=COLORS[name], hovertemplate='%{x}: %{y:.1f}%<extra>'+name+'</extra>'))
+    fig3.update_layout(**base_layout(320, barmode='stack', yaxis=dict(title='%', range=[0,100]), xaxis_title='Año'))
+    return fig3
+
+def total_yoy(D):
+    yrs = D['hist']['years'][1:]
+    vals = D['derived'].growth('total')[1:]
+    colors_yoy = ['#10b981' if v >= 0 else '#ef4444' for v in vals]
+    fig4 = go.Figure(go.Bar(x=yrs, y=vals, marker_color=colors_yoy,
+        hovertemplate='%{x}: %{y:.1f}%<extra></extra>'))
+    for brk in D['breaks'][:3]:
+        fig4.add_vline(x=brk['year'], line_dash="dot", line_color="rgba(239,68,68,.2)", line_width=1.2)
+    fig4.update_layout(**base_layout(320, yaxis_title='Crecimiento %', xaxis_title='Año'))
+    return fig4
+
+def macro_context(D):
+    x = D['hist']['years']
+    from plotly.subplots import make_subplots
+    fig5 = make_subplots(specs=[[{"secondary_y": True}]])
+    fig5.add_trace(go.Scatter(x=x, y=[v*100 for v in D['hist']['ipc']], name='IPC %',
+        line=dict(color='#fb923c', width=2), marker=dict(size=3),
+        hovertemplate='%{x}: %{y:.1f}%<extra>IPC</extra>'), secondary_y=False)
+    fig5.add_trace(go.Scatter(x=x, y=D['hist']['trm'], name='TRM COP/USD',
+        line=dict(color='#818cf8', width=2), marker=dict(size=3),
+        hovertemplate='%{x}: %{y:,.0f}<extra>TRM</extra>'), secondary_y=True)
+    fig5.add_trace(go.Scatter(x=x, y=[v*100 for v in D['hist']['internet']], name='Internet %',
+        line=dict(color='#34d399', width=2, dash='dot'), marker=dict(size=3),
+        hovertemplate='%{x}: %{y:.1f}%<extra>Internet</extra>'), secondary_y=False)
+    for name, label, scale, secondary in (('ipc', 'IPC', 100, False), ('trm', 'TRM', 1, True),
+                                          ('internet', 'Internet', 100, False)):
+        marks = anomaly_markers(D, name, COLORS[name], label, scale=scale)
+        if marks is not None:
+            fig5.add_trace(marks, secondary_y=secondary)
+    fig5.update_layout(**base_layout(320))
+    fig5.update_yaxes(title_text="IPC % / Internet %", secondary_y=False, gridcolor='#152035')
+    fig5.update_yaxes(title_text="TRM", secondary_y=True, showgrid=False)
+    return fig5
+
+# ══════════════════════════════════════════════════════════════
+# TAB 2 – PRONÓSTICO
+# ══════════════════════════════════════════════════════════════
+def forecast_category(D, category):
+    fc = D['forecast'][category]
+    col = COLORS.get(category, '#f97316')
+    lastHX, lastHY = fc['hist_x'][-1], fc['hist_y'][-1]
+
+    fig_fc = go.Figure()
+    fig_fc.add_trace(go.Scatter(x=fc['fc_yrs'], y=fc['hi'], mode='lines',
+        line=dict(color=col, width=0), showlegend=False, hoverinfo='skip'))
+    fig_fc.add_trace(go.Scatter(x=fc['fc_yrs'], y=fc['lo'], mode='lines', name='IC 95%',
+        fill='tonexty', fillcolor=hex_rgba(col, .13), line=dict(color=col, width=0),
+        hovertemplate='IC 95%: %{y:,.0f}<extra></extra>'))
+    fig_fc.add_trace(go.Scatter(x=fc['hist_x'], y=fc['hist_y'], mode='lines+markers', name='Histórico',
+        line=dict(color=col, width=2.8), marker=dict(size=3.5),
+        hovertemplate='%{x}: %{y:,.0f}<extra>Histórico</extra>'))
+    fig_fc.add_trace(go.Scatter(x=[lastHX, fc['fc_yrs'][0]], y=[lastHY, fc['fc'][0]],
+        mode='lines', line=dict(color=col, width=1.5, dash='dot'), showlegend=False))
+    fig_fc.add_trace(go.Scatter(x=fc['fc_yrs'], y=fc['fc'], mode='lines+markers', name='Pronóstico',
+        line=dict(color=col, width=2.2, dash='dash'),
+        marker=dict(size=9, symbol='diamond', color=col),
+        hovertemplate='%{x}: %{y:,.0f}<extra>Pronóstico</extra>'))
+    if 'base' in fc:
+        fig_fc.add_trace(go.Scatter(x=fc['fc_yrs'], y=fc['base'], mode='lines', name='Base sin reconciliar',
+            line=dict(color='#4e6480', width=1.4, dash='dot'),
+            hovertemplate='%{x}: %{y:,.0f}<extra>Base</extra>'))
+    fig_fc.add_vline(x=lastHX + .5, line_dash="dot", line_color="rgba(237,244,255,.12)", line_width=1)
+    fig_fc.update_layout(**base_layout(380, yaxis_title='COP Miles', yaxis_tickformat=',', xaxis_title='Año'))
+    return fig_fc
+
+def cagr_bars(D):
+    cats_cagr = list(D['cagr'].keys())
+    vals_cagr = list(D['cagr'].values())
+    bar_colors = ['#ef4444' if v>10 else '#f97316' if v>4 else '#10b981' if v>=0 else '#64748b' for v in vals_cagr]
+    fig_c = go.Figure(go.Bar(x=cats_cagr, y=vals_cagr, marker_color=bar_colors,
+        text=[f"+{v:.2f}%" if v>=0 else f"{v:.2f}%" for v in vals_cagr],
+        textposition='outside', hovertemplate='%{x}: %{y:.2f}%<extra>CAGR</extra>'))
+    fig_c.update_layout(**base_layout(320, yaxis_title='CAGR % anual',
+        xaxis=dict(tickangle=-30), margin=dict(t=24,b=85,l=55,r=18)))
+    fig_c.add_hline(y=0, line_color='#253549', line_width=1.5)
+    return fig_c
+
+def forecast_comparison(D):
+    fig_fa = go.Figure()
+    for k in KK + ['TOTAL']:
+        fcd = D['forecast'][k]
+        fig_fa.add_trace(go.Scatter(x=fcd['hist_x'], y=fcd['hist_y'], name=k,
+            line=dict(color=COLORS[k], width=1.8), legendgroup=k,
+            hovertemplate='%{x}: %{y:,.0f}<extra>'+k+'</extra>'))
+        fig_fa.add_trace(go.Scatter(
+            x=[fcd['hist_x'][-1]] + fcd['fc_yrs'],
+            y=[fcd['hist_y'][-1]] + fcd['fc'], name=k+' pron.',
+            line=dict(color=COLORS[k], width=1.8, dash='dash'),
+            showlegend=False, legendgroup=k,
+            hovertemplate='%{x}: %{y:,.0f}<extra>'+k+' Pron.</extra>'))
+    fig_fa.add_vline(x=D['forecast']['TOTAL']['hist_x'][-1] + .5, line_dash="dot", line_color="rgba(237,244,255,.1)")
+    fig_fa.update_layout(**base_layout(320, yaxis_title='COP Miles', xaxis_title='Año',
+        legend=dict(font=dict(size=8.5))))
+    return fig_fa
+
+# ══════════════════════════════════════════════════════════════
+# TAB 3 – POR MEDIOS
+# ══════════════════════════════════════════════════════════════
+def media_lines(D, media, x_range=None, provisional=None):
+    # Series largas: recortadas a x_range y reducidas en el servidor (dashboard.downsample)
+    fig_m = go.Figure()
+    for k in media:
+        col_key = KC[KK.index(k)]
+        fig_m.add_trace(line_trace(D['hist']['years'], D['hist'][col_key], x_range,
+            name=k, mode='lines+markers', line=dict(color=COLORS[k], width=2.2), legendgroup=k,
+            marker=dict(size=3.5), hovertemplate='%{x}: %{y:,.0f}<extra>'+k+'</extra>'))
+        brks = D['break_detector'].breaks(col_key)
+        if x_range is not None:
+            brks = [b for b in brks if x_range[0] <= b['year'] <= x_range[1]]
+        if brks:
+            idx = [year_pos(D, b['year']) for b in brks]
+            fig_m.add_trace(go.Scatter(x=[b['year'] for b in brks], y=D['hist'][col_key][idx],
+                mode='markers', showlegend=False, legendgroup=k,
+                marker=dict(symbol='x-thin', size=11, line=dict(color=COLORS[k], width=2)),
+                customdata=[b['delta'] for b in brks],
+                hovertemplate='Ruptura %{x}: salto de nivel %{customdata:+.1f}%<extra>'+k+'</extra>'))
+        marks = anomaly_markers(D, col_key, COLORS[k], k, x_range, legendgroup=k)
+        if marks is not None:
+            fig_m.add_trace(marks)
+        if provisional and col_key in provisional and (x_range is None or x_range[1] == D['hist']['years'][-1]):
+            trace = provisional_trace(D, col_key, provisional[col_key], COLORS[k], k, legendgroup=k)
+            if trace is not None:
+                fig_m.add_trace(trace)
+    fig_m.update_layout(**base_layout(340, yaxis_title='COP Miles', yaxis_tickformat=',', xaxis_title='Año'))
+    return fig_m
+
+def share_pie(D, year):
+    d = D['derived']
+    vals_pie = np.clip(d.values[[d.row(c) for c in KC], year_pos(D, year)], 0, None)
+    fig_p = go.Figure(go.Pie(labels=KK, values=vals_pie, hole=0.42,
+        marker=dict(colors=[COLORS[k] for k in KK], line=dict(color='#0b1627', width=1.5)),
+        textinfo='label+percent', textfont=dict(size=9),
+        hovertemplate='%{label}: %{value:,.0f}<extra></extra>'))
+    fig_p.update_layout(**base_layout(320, showlegend=False, title=f"Año {year}",
+        margin=dict(t=40, b=20, l=10, r=10)))
+    return fig_p
+
+def media_ranking(D, year):
+    data25 = [(KK[KC.index(c)], v) for c, v in D['derived'].ranking(year)]
+    fig_b = go.Figure(go.Bar(
+        x=[d[1] for d in data25], y=[d[0] for d in data25], orientation='h',
+        marker_color=[COLORS[d[0]] for d in data25],
+        text=[fmt(d[1]) for d in data25], textposition='outside',
+        hovertemplate='%{y}: %{x:,.0f}<extra></extra>'))
+    fig_b.update_layout(**base_layout(320, xaxis_title='COP Miles', xaxis_tickformat=',',
+        margin=dict(t=20, b=50, l=92, r=82)))
+    return fig_b
+
+# ══════════════════════════════════════════════════════════════
+# TAB 4 – DIGITAL
+# ══════════════════════════════════════════════════════════════
+def _digital_start(D):
+    return D['derived'].first_positive('digital')
+
+def _digital_share(D):
+    return D['derived'].share('digital')
+
+def digital_vs_internet(D):
+    xs, ys, yrs_sc = D['regression']['x_scatter'], D['regression']['y_scatter'], D['regression']['yr_scatter']
+    nc = [(y-yrs_sc[0])/(yrs_sc[-1]-yrs_sc[0]) for y in yrs_sc]
+    fig_sc = go.Figure()
+    fig_sc.add_trace(go.Scatter(x=xs, y=ys, mode='markers+text', text=[str(y) for y in yrs_sc],
+        textposition='top center', textfont=dict(size=7.5, color='rgba(216,232,245,.5)'),
+        marker=dict(size=10, color=nc, colorscale=[[0,'#f97316'],[.5,'#ef4444'],[1,'#a78bfa']],
+            showscale=True, colorbar=dict(title=dict(text='Año'), len=.65, thickness=10,
+                tickmode='array', tickvals=[0,.5,1], ticktext=[str(yrs_sc[0]),'~2016',str(yrs_sc[-1])]),
+            line=dict(color='rgba(255,255,255,.1)',width=1)),
+        name='Observado', hovertemplate='<b>%{text}</b><br>Internet: %{x:.1%}<br>Digital: %{y:,.0f}<extra></extra>'))
+    fig_sc.add_trace(go.Scatter(x=D['regression']['x_line'], y=D['regression']['y_line'],
+        mode='lines', name=f"R²={D['regression']['r2']}",
+        line=dict(color='#3b82f6', width=2.2, dash='dash')))
+    fig_sc.update_layout(**base_layout(320, xaxis=dict(title='Penetración Internet', tickformat='.0%'),
+        yaxis=dict(title='Inversión Digital (COP Miles)', tickformat=',')))
+    return fig_sc
+
+def digital_growth(D, x_range=None):
+    di = _digital_start(D)
+    fig_dh = go.Figure(line_trace(D['hist']['years'][di:], D['hist']['digital'][di:], x_range,
+        method='minmax', fill='tozeroy', fillcolor='rgba(239,68,68,.09)',
+        line=dict(color='#ef4444', width=2.8), marker=dict(size=4),
+        hovertemplate='%{x}: %{y:,.0f}<extra>Digital</extra>'))
+    fig_dh.update_layout(**base_layout(320, yaxis_title='COP Miles', yaxis_tickformat=',', xaxis_title='Año'))
+    return fig_dh
+
+def digital_share(D):
+    di, pct_dig = _digital_start(D), _digital_share(D)
+    pct_colors = ['#ef4444' if v>50 else '#f97316' if v>30 else '#fbbf24' if v>15 else '#3b82f6' for v in pct_dig[di:]]
+    fig_dp = go.Figure(go.Bar(
+        x=D['hist']['years'][di:], y=pct_dig[di:], marker_color=pct_colors,
+        text=[f"{v:.1f}%" for v in pct_dig[di:]], textposition='outside',
+        hovertemplate='%{x}: %{y:.1f}%<extra></extra>'))
+    fig_dp.update_layout(**base_layout(320, yaxis_title='% del Total', xaxis_title='Año'))
+    return fig_dp
+
+def internet_vs_digital(D):
+    pct_dig = _digital_share(D)
+    from plotly.subplots import make_subplots
+    fig_di = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_di.add_trace(go.Scatter(x=D['hist']['years'], y=[v*100 for v in D['hist']['internet']],
+        name='Internet %', line=dict(color='#34d399', width=2.2), marker=dict(size=3.5),
+        hovertemplate='%{x}: %{y:.1f}%<extra>Internet</extra>'), secondary_y=False)
+    fig_di.add_trace(go.Scatter(x=D['hist']['years'], y=pct_dig,
+        name='Digital/Total %', line=dict(color='#ef4444', width=2.2), marker=dict(size=3.5),
+        hovertemplate='%{x}: %{y:.1f}%<extra>Digital</extra>'), secondary_y=True)
+    fig_di.update_layout(**base_layout(320))
+    fig_di.update_yaxes(title_text="Internet %", secondary_y=False, gridcolor='#152035')
+    fig_di.update_yaxes(title_text="Digital/Total %", secondary_y=True, showgrid=False)
+    return fig_di
+
+# ══════════════════════════════════════════════════════════════
+# TAB 5 – CORRELACIONES
+# ══════════════════════════════════════════════════════════════
+def corr_heatmap(D, start=None, end=None, method='pearson'):
+    lbls = D['corr_labels']
+    z = D['correlation'].matrix(start, end, method)
+    z_rev = z[::-1]
+    lbls_rev = list(reversed(lbls))
+    fig_h = go.Figure(go.Heatmap(
+        z=z_rev, x=lbls, y=lbls_rev,
+        text=[["" if np.isnan(v) else f"{v:.2f}" for v in row] for row in z_rev],
+        texttemplate='%{text}', textfont=dict(size=11),
+        colorscale=[[0,'#b91c1c'],[.2,'#ea580c'],[.38,'#1e3a5f'],[.5,'#0b1627'],[.62,'#1e3a5f'],[.8,'#1d4ed8'],[1,'#06b6d4']],
+        zmid=0, zmin=-1, zmax=1, showscale=True, xgap=3, ygap=3,
+        colorbar=dict(title=dict(text='r', font=dict(size=9.5)), len=.88, thickness=16,
+            tickvals=[-1,-.5,0,.5,1], ticktext=['−1','−.5','0','.5','+1'], tickfont=dict(size=8.5)),
+        hovertemplate='<b>%{y} ↔ %{x}</b><br>r = %{z:.3f}<extra></extra>'))
+    fig_h.update_layout(**base_layout(460, margin=dict(t=22,b=105,l=95,r=28),
+        xaxis=dict(tickangle=-40, tickfont=dict(size=10.5)),
+        yaxis=dict(tickfont=dict(size=10.5))))
+    return fig_h
+
+def trm_scatter(D):
+    fig_trm = go.Figure(go.Scatter(x=D['hist']['trm'], y=D['hist']['total'],
+        mode='markers', text=[str(y) for y in D['hist']['years']],
+        marker=dict(size=9, color=D['hist']['years'], colorscale='Plasma', showscale=True,
+            colorbar=dict(title=dict(text='Año'),len=.6,thickness=10),
+            line=dict(color='rgba(255,255,255,.1)',width=1)),
+        hovertemplate='<b>%{text}</b><br>TRM: %{x:,.0f}<br>Total: %{y:,.0f}<extra></extra>'))
+    fig_trm.update_layout(**base_layout(280, xaxis_title='TRM (COP/USD)', xaxis_tickformat=',', yaxis_title='Total'))
+    return fig_trm
+
+def ipc_scatter(D):
+    fig_ipc = go.Figure(go.Scatter(x=[v*100 for v in D['hist']['ipc']], y=D['hist']['total'],
+        mode='markers', text=[str(y) for y in D['hist']['years']],
+        marker=dict(size=9, color=D['hist']['years'], colorscale='Viridis', showscale=True,
+            colorbar=dict(title=dict(text='Año'),len=.6,thickness=10),
+            line=dict(color='rgba(255,255,255,.1)',width=1)),
+        hovertemplate='<b>%{text}</b><br>IPC: %{x:.1f}%<br>Total: %{y:,.0f}<extra></extra>'))
+    fig_ipc.update_layout(**base_layout(280, xaxis_title='IPC (%)', yaxis_title='Total'))
+    return fig_ipc
+
+def corr_ranking(D, start=None, end=None, method='pearson'):
+    lbls = D['corr_labels']
+    z = D['correlation'].matrix(start, end, method)
+    tot_idx = lbls.index('Total')
+    corr_rank = [(l, z[tot_idx][i]) for i,l in enumerate(lbls) if l!='Total' and not np.isnan(z[tot_idx][i])]
+    corr_rank.sort(key=lambda x: abs(x[1]), reverse=True)
+    fig_cb = go.Figure(go.Bar(
+        x=[c[1] for c in corr_rank], y=[c[0] for c in corr_rank], orientation='h',
+        marker_color=['#3b82f6' if c[1]>0 else '#ef4444' for c in corr_rank],
+        text=[f"{c[1]:.2f}" for c in corr_rank], textposition='outside',
+        hovertemplate='%{y}: r=%{x:.3f}<extra></extra>'))
+    fig_cb.add_vline(x=0, line_color='#253549', line_width=1.5)
+    fig_cb.update_layout(**base_layout(280, xaxis=dict(title='r', range=[-1.1,1.1]),
+        margin=dict(t=20,b=50,l=82,r=60)))
+    return fig_cb
+
+def rolling_corr(D, target, window, method='pearson', start=None, end=None):
+    eng = D['correlation']
+    yrs, r = eng.rolling(target, window, method, start, end)
+    fig_rc = go.Figure()
+    for i, l in enumerate(D['corr_labels']):
+        if l == target:
+            continue
+        fig_rc.add_trace(go.Scatter(x=yrs, y=r[i], name=l, mode='lines',
+            line=dict(color=COLORS.get(eng.columns[i], '#93c5fd'), width=1.8),
+            hovertemplate='%{x}: r=%{y:.2f}<extra>'+l+'</extra>'))
+    fig_rc.add_hline(y=0, line_color='#253549', line_width=1.2)
+    fig_rc.update_layout(**base_layout(320, yaxis=dict(title=f'r móvil ({window} años)', range=[-1.05,1.05]),
+        xaxis_title='Año de cierre de la ventana', legend=dict(font=dict(size=8.5))))
+    return fig_rc
+
+# ══════════════════════════════════════════════════════════════
+# TAB 6 – MODELOS
+# ══════════════════════════════════════════════════════════════
+def model_aic(D, comparison, families):
+    cats_m = list(D['forecast'])
+    fig_aic = go.Figure()
+    for f, label in families.items():
+        aics_m = [(comparison[f][k] or {}).get('aic') for k in cats_m]
+        fig_aic.add_trace(go.Bar(x=cats_m, y=aics_m, name=label, marker_color=FAM_COLORS[f],
+            hovertemplate='%{x}: AIC=%{y:.1f}<extra>'+label+'</extra>'))
+    fig_aic.update_layout(**base_layout(280, yaxis_title='AIC', barmode='group',
+        xaxis=dict(tickangle=-35), margin=dict(t=24,b=85,l=50,r=18)))
+    return fig_aic
+
+def model_rmse(D, comparison, families):
+    cats_m = list(D['forecast'])
+    fig_rmse = go.Figure()
+    for f, label in families.items():
+        rmses_m = [(comparison[f][k] or {}).get('rmse') for k in cats_m]
+        fig_rmse.add_trace(go.Bar(x=cats_m, y=rmses_m, name=label, marker_color=FAM_COLORS[f],
+            hovertemplate='%{x}: RMSE=%{y:,.0f}<extra>'+label+'</extra>'))
+    fig_rmse.update_layout(**base_layout(280, yaxis=dict(title='RMSE (log)', type='log'), barmode='group',
+        xaxis=dict(tickangle=-35), margin=dict(t=24,b=85,l=50,r=18)))
+    return fig_rmse
+
+def forecast_ci(D, step=5):
+    ci_data = [(k, fc['fc'][step], fc['lo'][step], fc['hi'][step]) for k, fc in D['forecast'].items()]
+    fig_ci = go.Figure(go.Bar(
+        x=[c[0] for c in ci_data], y=[c[1] for c in ci_data],
+        error_y=dict(type='data', symmetric=False,
+            array=[c[3]-c[1] for c in ci_data],
+            arrayminus=[c[1]-c[2] for c in ci_data],
+            color='rgba(237,244,255,.3)', thickness=2.5, width=7),
+        marker_color=[COLORS.get(c[0],'#4e6480') for c in ci_data],
+        text=[fmt(c[1]) for c in ci_data], textposition='outside',
+        hovertemplate='%{x}: %{y:,.0f}<extra>'+str(D['forecast']['TOTAL']['fc_yrs'][step])+'</extra>'))
+    fig_ci.update_layout(**base_layout(280, yaxis=dict(title=f"COP Miles {D['forecast']['TOTAL']['fc_yrs'][step]} (log)", type='log'),
+        xaxis=dict(tickangle=-35), margin=dict(t=24,b=85,l=50,r=18)))
+    return fig_ci
+
+def backtest_horizon(D, category, metric, families):
+    # Métrica de cada familia por horizonte, sobre todos los orígenes del backtest
+    from dashboard.backtest import METRICS
+    bt = D['backtest']
+    fig = go.Figure()
+    for f, label in families.items():
+        s = bt.scores(f, category)
+        fig.add_trace(go.Scatter(x=s['h'], y=s[metric], name=label, mode='lines+markers',
+            line=dict(color=FAM_COLORS[f], width=2.2), marker=dict(size=7), customdata=s['n'],
+            hovertemplate='h=%{x}: %{y:,.2f} · %{customdata} folds<extra>' + label + '</extra>'))
+    if metric == 'coverage':
+        fig.add_hline(y=bt.level, line_dash='dot', line_color='rgba(237,244,255,.3)', line_width=1.2)
+        yaxis = dict(title=METRICS[metric], range=[0, 105])
+    else:
+        yaxis = dict(title=METRICS[metric] + ' (log)', type='log')
+    fig.update_layout(**base_layout(300, yaxis=yaxis,
+        xaxis=dict(title='Horizonte (años)', dtick=1), legend=dict(orientation='h', y=1.1, x=0)))
+    return fig
+
+# ══════════════════════════════════════════════════════════════
+# TAB 7 – ESCENARIOS
+# ══════════════════════════════════════════════════════════════
+def _scenario(D, ipc, trm, internet, vol):
+    # Widgets en % (IPC, Internet) y COP/USD (TRM); el modelo usa fracciones
+    return D['scenario'].simulate((ipc / 100, trm, internet / 100), vol)
+
+def _trend_scenario(D):
+    d = D['scenario'].defaults
+    return D['scenario'].simulate((d['ipc'], d['trm'], d['internet']))
+
+def scenario_total(D, ipc, trm, internet, vol, category='TOTAL'):
+    sc = _scenario(D, ipc, trm, internet, vol)[0][category]
+    base = D['forecast'][category]
+    col = COLORS.get(category, '#10b981')
+    x_last, y_last = base['hist_x'][-1], base['hist_y'][-1]
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=sc['fc_yrs'], y=sc['hi'], mode='lines',
+        line=dict(color=col, width=0), showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=sc['fc_yrs'], y=sc['lo'], mode='lines', name='IC 95% escenario',
+        fill='tonexty', fillcolor=hex_rgba(col, .15), line=dict(color=col, width=0),
+        hovertemplate='IC 95%: %{y:,.0f}<extra></extra>'))
+    fig.add_trace(go.Scatter(x=base['hist_x'], y=base['hist_y'], mode='lines', name='Histórico',
+        line=dict(color=col, width=2.6), hovertemplate='%{x}: %{y:,.0f}<extra>Histórico</extra>'))
+    fig.add_trace(go.Scatter(x=[x_last] + base['fc_yrs'], y=[y_last] + base['fc'], mode='lines',
+        name='Log-lineal', line=dict(color='#4e6480', width=1.8, dash='dash'),
+        hovertemplate='%{x}: %{y:,.0f}<extra>Log-lineal</extra>'))
+    fig.add_trace(go.Scatter(x=[x_last] + sc['fc_yrs'], y=[y_last] + sc['fc'], mode='lines+markers',
+        name='Escenario', line=dict(color=col, width=2.4), marker=dict(size=8, symbol='diamond'),
+        hovertemplate='%{x}: %{y:,.0f}<extra>Escenario</extra>'))
+    fig.add_vline(x=x_last + .5, line_dash="dot", line_color="rgba(237,244,255,.12)", line_width=1)
+    fig.update_layout(**base_layout(380, yaxis_title='COP Miles', yaxis_tickformat=',', xaxis_title='Año'))
+    return fig
+
+def scenario_categories(D, ipc, trm, internet, vol):
+    sc, trend = _scenario(D, ipc, trm, internet, vol)[0], _trend_scenario(D)[0]
+    cats = list(sc)
+    delta = [(sc[c]['fc'][-1] / trend[c]['fc'][-1] - 1) * 100 for c in cats]
+    yr = sc[cats[0]]['fc_yrs'][-1]
+    fig = go.Figure(go.Bar(x=cats, y=delta,
+        marker_color=['#10b981' if v >= 0 else '#ef4444' for v in delta],
+        customdata=[[fmt(sc[c]['fc'][-1]), fmt(sc[c]['lo'][-1]), fmt(sc[c]['hi'][-1])] for c in cats],
+        text=[f"{v:+.1f}%" for v in delta], textposition='outside',
+        hovertemplate='%{x}: %{y:+.1f}%<br>' + str(yr) + ': %{customdata[0]} [%{customdata[1]}–%{customdata[2]}]<extra></extra>'))
+    fig.add_hline(y=0, line_color='rgba(237,244,255,.2)', line_width=1)
+    fig.update_layout(**base_layout(320, yaxis_title=f'Δ {yr} vs tendencial %',
+        xaxis=dict(tickangle=-35), margin=dict(t=24, b=85, l=55, r=18)))
+    return fig
+
+def scenario_drivers(D, ipc, trm, internet, vol):
+    drivers = _scenario(D, ipc, trm, internet, vol)[1]
+    x, fc_yrs = D['hist']['years'], D['scenario'].fc_yrs
+    names = {'ipc': ('IPC %', 100), 'trm': ('TRM COP/USD', 1), 'internet': ('Internet %', 100)}
+    # Tres paneles con dominios fijos: make_subplots triplica el tiempo de armado
+    domains = [(0, .28), (.36, .64), (.72, 1)]
+    axes, titles = {}, []
+    fig = go.Figure()
+    for i, (n, (label, k)) in enumerate(names.items()):
+        ax = '' if i == 0 else str(i + 1)
+        ref = dict(xaxis='x' + ax, yaxis='y' + ax, showlegend=False)
+        col, band = COLORS[n], drivers[n]
+        hist = [v * k for v in D['hist'][n]]
+        fig.add_trace(go.Scatter(x=fc_yrs, y=[v * k for v in band['hi']], mode='lines',
+            line=dict(width=0, color=col), hoverinfo='skip', **ref))
+        fig.add_trace(go.Scatter(x=fc_yrs, y=[v * k for v in band['lo']], mode='lines', fill='tonexty',
+            fillcolor=hex_rgba(col, .15), line=dict(width=0, color=col), hoverinfo='skip', **ref))
+        fig.add_trace(go.Scatter(x=x, y=hist, mode='lines', line=dict(color=col, width=2),
+            hovertemplate='%{x}: %{y:,.1f}<extra>' + label + '</extra>', **ref))
+        fig.add_trace(go.Scatter(x=[x[-1]] + fc_yrs, y=[hist[-1]] + [v * k for v in band['fc']], mode='lines',
+            line=dict(color=col, width=2, dash='dash'),
+            hovertemplate='%{x}: %{y:,.1f}<extra>' + label + '</extra>', **ref))
+        axes['xaxis' + ax] = dict(domain=domains[i], anchor='y' + ax, gridcolor='#152035', linecolor='#1c2e47')
+        axes['yaxis' + ax] = dict(anchor='x' + ax, gridcolor='#152035', zerolinecolor='#152035', linecolor='#1c2e47')
+        titles.append(dict(text=label, x=sum(domains[i]) / 2, y=1.08, xref='paper', yref='paper',
+                           xanchor='center', showarrow=False, font=dict(size=11)))
+    fig.update_layout(**base_layout(260, margin=dict(t=36, b=40, l=50, r=18), annotations=titles, **axes))
+    return fig
+
+# ══════════════════════════════════════════════════════════════
+# TAB 8 – PRESUPUESTO
+# ══════════════════════════════════════════════════════════════
+def _budget_run(D, media, min_share, max_share, n_draws):
+    # Widgets en %; el optimizador usa fracciones
+    return D['optimizer'].run(media, min_share / 100, max_share / 100, n_draws)
+
+def _mix_label(media, w):
+    return '<br>'.join(f"{m}: {v * 100:.0f}%" for m, v in zip(media, w) if v >= .005)
+
+def budget_frontier(D, media, min_share, max_share, n_draws):
+    r = _budget_run(D, media, min_share, max_share, n_draws)
+    risk, ret = r['std'] * 100, (r['mean'] - 1) * 100
+    front = r['frontier']
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=risk, y=ret, mode='markers', name='Mezclas evaluadas',
+        marker=dict(size=4, color='rgba(148,163,184,.28)'), hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=risk[front], y=ret[front], mode='lines+markers', name='Frontera eficiente',
+        line=dict(color='#10b981', width=2.4), marker=dict(size=5, color='#10b981'),
+        customdata=[_mix_label(media, r['weights'][i]) for i in front],
+        hovertemplate='Riesgo %{x:.0f}% · Retorno %{y:+.0f}%<br>%{customdata}<extra></extra>'))
+    if r['market'] is not None:
+        i = r['market']
+        fig.add_trace(go.Scatter(x=[risk[i]], y=[ret[i]], mode='markers', name='Mezcla de mercado',
+            marker=dict(size=12, symbol='diamond', color='#f97316', line=dict(color='#0b1627', width=1)),
+            customdata=[_mix_label(media, r['weights'][i])],
+            hovertemplate='Riesgo %{x:.0f}% · Retorno %{y:+.0f}%<br>%{customdata}<extra>Mercado</extra>'))
+    fig.update_layout(**base_layout(400, xaxis_title='Riesgo (desv. estándar del crecimiento, %)',
+        yaxis_title=f"Crecimiento esperado a {r['fc_year']} %", legend=dict(orientation='h', y=1.08, x=0)))
+    return fig
+
+def budget_allocation(D, media, min_share, max_share, n_draws):
+    r = _budget_run(D, media, min_share, max_share, n_draws)
+    front = r['frontier']
+    x = r['std'][front] * 100
+    fig = go.Figure()
+    for j, m in enumerate(media):
+        fig.add_trace(go.Scatter(x=x, y=r['weights'][front, j] * 100, mode='lines', name=m,
+            stackgroup='mix', line=dict(color=COLORS[m], width=.6), fillcolor=hex_rgba(COLORS[m], .75),
+            hovertemplate='%{y:.0f}%<extra>' + m + '</extra>'))
+    fig.update_layout(**base_layout(400, xaxis_title='Riesgo de la mezcla en la frontera (%)',
+        yaxis=dict(title='Participación del presupuesto %', range=[0, 100], gridcolor='#152035'),
+        hovermode='x unified'))
+    return fig
@@ -0,0 +1,291 @@
+"""
+Pronóstico log-lineal por categoría con IC bootstrap.
+
+Para cada categoría se ajusta ``log(y) = a + b·t`` sobre su período real y el
+intervalo se obtiene con bootstrap de residuos: todas las réplicas se generan
+como una matriz (n_boot × n) y se resuelven en un único producto con la
+pseudo-inversa del diseño, sin bucles de Python por réplica.
+
+``D['forecast']`` es coherente: los pronósticos de todas las categorías se
+reconcilian sobre la jerarquía del bundle (``dashboard.hierarchy``, MinT por
+defecto) para que los medios sumen el TOTAL, y el IC bootstrap de cada una se
+escala con su ajuste. ``ForecastEngine.forecast`` sigue dando el pronóstico
+base de una categoría.
+
+Los resultados se cachean por (categoría, período, horizonte, n_boot) dentro de
+un motor ligado a la versión del bundle y, si ``DASHBOARD_CACHE_URL`` apunta a
+un backend compartido, también ahí: el bootstrap que corrió una réplica no lo
+repiten las demás.
+
+Cuando el bundle se reescribe con datos nuevos (``dashboard.ingest``), el motor
+de la versión nueva parte del anterior del mismo directorio: si el histórico de
+una categoría sólo creció, su ajuste se extiende con actualizaciones de rango
+uno (``LogLinearFit.extend``) y, si no cambió, reutiliza ajuste y pronóstico.
+"""
+import copy
+import json
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+
+from dashboard.cache import cache_backend
+from dashboard.datastore import INDEX, VersionRegistry
+from dashboard.hierarchy import coherent_forecast, hierarchy_for
+
+CATEGORIES = {
+    'TV Nacional': 'tv_nac', 'TV Local': 'tv_local', 'Prensa': 'prensa',
+    'Radio': 'radio', 'Digital': 'digital', 'Revistas': 'revistas',
+    'Exterior': 'exterior', 'TOTAL': 'total',
+}
+# Columnas de la "Tabla de Proyección" (pestaña Pronóstico y API)
+TABLE_CATEGORIES = ('TOTAL', 'TV Nacional', 'Prensa', 'Radio', 'Digital', 'Exterior')
+HORIZON = 6
+N_BOOT = 10_000
+LEVEL = 95
+SEED = 2025
+# Reconciliación de ``D['forecast']`` (None: pronósticos base sin reconciliar)
+RECONCILE = 'mint'
+
+
+class LogLinearFit:
+    """Ajuste OLS de ``log(y)`` sobre una tendencia lineal."""
+
+    def __init__(self, years, values):
+        self.years = np.asarray(years, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        if (self.values <= 0).any():
+            raise ValueError('La regresión log-lineal requiere valores positivos en todo el período')
+        self.origin = int(self.years[0])
+        self.X = self.design(self.years)
+        self.pinv = np.linalg.pinv(self.X)
+        # P = (XᵀX)⁻¹, lo que actualiza ``extend`` observación a observación
+        self.P = self.pinv @ self.pinv.T
+        self.logy = np.log(self.values)
+        self.beta = self.pinv @ self.logy
+        self.resid = self.logy - self.X @ self.beta
+
+    def extend(self, years, values):
+        """Ajuste con las observaciones nuevas agregadas al final, sin rehacer la regresión.
+
+        Mínimos cuadrados recursivos: cada fila ``x`` actualiza ``P`` y ``beta``
+        con Sherman–Morrison (rango uno). Devuelve un ajuste nuevo; este no cambia.
+        """
+        years = np.asarray(years, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if (values <= 0).any():
+            raise ValueError('La regresión log-lineal requiere valores positivos en todo el período')
+        fit = copy.copy(self)
+        X, logy = self.design(years), np.log(values)
+        P, beta = self.P.copy(), self.beta.copy()
+        for x, y in zip(X, logy):
+            Px = P @ x
+            k = Px / (1 + x @ Px)
+            beta += k * (y - x @ beta)
+            P -= np.outer(k, Px)
+        fit.years = np.concatenate([self.years, years])
+        fit.values = np.concatenate([self.values, values])
+        fit.X = np.vstack([self.X, X])
+        fit.logy = np.concatenate([self.logy, logy])
+        fit.P, fit.beta = P, beta
+        fit.pinv = P @ fit.X.T
+        fit.resid = fit.logy - fit.X @ beta
+        return fit
+
+    def design(self, years):
+        t = np.asarray(years, dtype=np.float64) - self.origin
+        return np.column_stack([np.ones_like(t), t])
+
+    @property
+    def growth(self):
+        return float(np.expm1(self.beta[1]))
+
+    def predict(self, years):
+        return np.exp(self.design(years) @ self.beta)
+
+    def bootstrap(self, years, n_boot=N_BOOT, level=LEVEL, seed=SEED):
+        """Devuelve (lo, hi) del intervalo de predicción para ``years``."""
+        rng = np.random.default_rng(seed)
+        n, h = len(self.logy), len(years)
+        resid = self.resid - self.resid.mean()
+        # Réplicas del histórico: (n_boot × n) → coeficientes (n_boot × 2) de una vez
+        draws = rng.integers(0, n, size=(n_boot, n + h))
+        y_star = (self.X @ self.beta) + resid[draws[:, :n]]
+        beta_star = y_star @ self.pinv.T
+        # Trayectorias futuras: tendencia re-estimada + ruido de residuos
+        paths = beta_star @ self.design(years).T + resid[draws[:, n:]]
+        tail = (100 - level) / 2
+        lo, hi = np.percentile(paths, [tail, 100 - tail], axis=0)
+        return np.exp(lo), np.exp(hi)
+
+
+class ForecastEngine:
+    """Pronósticos de un bundle concreto, con caché por parámetros."""
+
+    def __init__(self, store, seed=SEED, shared=None, previous=None):
+        self.store = store
+        self.seed = seed
+        # Motor de la versión anterior del mismo bundle: de ahí se extienden los ajustes
+        self.previous = previous
+        shared = cache_backend() if shared is None else shared
+        self.shared = shared if shared.shared else None
+        self._fits = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def period(self, category):
+        return tuple(self.store.tables['periods'][category])
+
+    def fit(self, category, period=None):
+        period = tuple(period) if period else self.period(category)
+        key = (category, period)
+        fit = self._fits.get(key)
+        if fit is None:
+            years = np.asarray(self.store.years)
+            mask = (years >= period[0]) & (years <= period[1])
+            years, values = years[mask], np.asarray(self.store[CATEGORIES[category]][mask])
+            fit = self._extended(category, years, values) or LogLinearFit(years, values)
+            with self._lock:
+                self._fits[key] = fit
+        return fit
+
+    def _extended(self, category, years, values):
+        """El ajuste del motor anterior, extendido si el histórico sólo sumó años al final."""
+        prev = self.previous
+        old = prev._fits.get((category, prev.period(category))) if prev is not None else None
+        n = 0 if old is None else len(old.years)
+        if not n or n > len(years) or not (np.array_equal(old.years, years[:n])
+                                           and np.array_equal(old.values, values[:n])):
+            return None
+        return old if n == len(years) else old.extend(years[n:], values[n:])
+
+    def forecast(self, category, period=None, horizon=HORIZON, n_boot=N_BOOT):
+        """Histórico + pronóstico con la forma de ``D['forecast'][cat]``."""
+        period = tuple(period) if period else self.period(category)
+        key = (category, period, horizon, n_boot)
+        res = self._results.get(key)
+        if res is not None:
+            return res
+        skey = f'{category}|{period[0]}-{period[1]}|{horizon}|{n_boot}|{self.seed}'
+        if self.shared is not None:
+            raw = self.shared.get('forecast', self.store.version, skey)
+            if raw is not None:
+                res = json.loads(raw)
+                with self._lock:
+                    self._results[key] = res
+                return res
+        fit = self.fit(category, period)
+        prev = self.previous
+        if prev is not None and prev._fits.get((category, period)) is fit:
+            # Histórico sin cambios desde la versión anterior: mismo pronóstico
+            res = prev._results.get(key)
+            if res is not None:
+                with self._lock:
+                    self._results[key] = res
+                return res
+        fc_yrs = np.arange(period[1] + 1, period[1] + 1 + horizon)
+        lo, hi = fit.bootstrap(fc_yrs, n_boot=n_boot, seed=self.seed)
+        res = {
+            'hist_x': fit.years.tolist(), 'hist_y': fit.values.tolist(),
+            'fc': fit.predict(fc_yrs).tolist(), 'lo': lo.tolist(), 'hi': hi.tolist(),
+            'fc_yrs': fc_yrs.tolist(),
+        }
+        with self._lock:
+            self._results[key] = res
+        if self.shared is not None:
+            self.shared.set('forecast', self.store.version, skey, json.dumps(res).encode())
+        return res
+
+    def reconciled(self, horizon=HORIZON, method=RECONCILE):
+        """{'fc_yrs', 'base', 'fc'}: pronóstico base y coherente de cada categoría de la jerarquía."""
+        key = ('reconciled', horizon, method)
+        res = self._results.get(key)
+        if res is not None:
+            return res
+        h = hierarchy_for(self.store)
+        rows = {c: h.row(col) for c, col in CATEGORIES.items() if col in h}
+        inputs = (INDEX, 'hierarchy', 'periods', *h.leaves, *h.observed.values())
+        digest = self.store.digest(*inputs)
+        prev = self.previous
+        if prev is not None and key in prev._results and prev.store.digest(*inputs) == digest:
+            # Ninguna serie de la jerarquía cambió desde la versión anterior
+            res = prev._results[key]
+            with self._lock:
+                self._results[key] = res
+            return res
+        starts = {CATEGORIES[c]: a for c, (a, b) in self.store.tables['periods'].items()}
+        # Los nodos de las categorías usan sus ajustes del motor (extendidos desde la versión anterior)
+        t0, last, fits = self.store.years[0], self.store.years[-1], {}
+        for c in rows:
+            if self.period(c)[1] == last:
+                fit = self.fit(c)
+                fits[CATEGORIES[c]] = (fit.beta[0] + fit.beta[1] * (t0 - fit.origin), fit.beta[1],
+                                       fit.resid @ fit.resid / max(len(fit.resid) - 2, 1))
+        out = coherent_forecast(self.store, h, horizon, method, starts, fits)
+        res = {'fc_yrs': out['fc_yrs'].tolist(),
+               'base': {c: out['base'][r].tolist() for c, r in rows.items()},
+               'fc': {c: out['fc'][r].tolist() for c, r in rows.items()}}
+        with self._lock:
+            self._results[key] = res
+        return res
+
+    def coherent(self, category, horizon=HORIZON, method=RECONCILE):
+        """``forecast`` con el pronóstico reconciliado y el IC escalado por el mismo ajuste."""
+        key = ('coherent', category, horizon, method)
+        res = self._results.get(key)
+        if res is not None:
+            return res
+        res = base = self.forecast(category, horizon=horizon)
+        rec = self.reconciled(horizon, method)
+        if category in rec['fc'] and rec['fc_yrs'] == base['fc_yrs']:
+            ratio = np.array(rec['fc'][category]) / np.array(base['fc'])
+            res = {**base, 'fc': rec['fc'][category], 'base': base['fc'], 'method': method,
+                   'lo': (np.array(base['lo']) * ratio).tolist(), 'hi': (np.array(base['hi']) * ratio).tolist()}
+        with self._lock:
+            self._results[key] = res
+        return res
+
+
+class ForecastView(Mapping):
+    """``D['forecast']`` respaldado por el motor: cada acceso usa la caché."""
+
+    def __init__(self, engine, method=RECONCILE):
+        self._engine = engine
+        self.method = method
+
+    def __getitem__(self, category):
+        if category not in CATEGORIES:
+            raise KeyError(category)
+        if self.method is None:
+            return self._engine.forecast(category)
+        return self._engine.coherent(category, method=self.method)
+
+    def __iter__(self):
+        return iter(CATEGORIES)
+
+    def __len__(self):
+        return len(CATEGORIES)
+
+
+_LATEST = {}
+
+
+def _new_engine(store):
+    # Corre bajo el lock del registro, que también protege ``_LATEST``
+    previous = _LATEST.get(store.root)
+    if previous is not None:
+        previous.previous = None        # sólo un eslabón: no retiene versiones viejas
+    engine = _LATEST[store.root] = ForecastEngine(store, previous=previous)
+    return engine
+
+
+_ENGINES = VersionRegistry(_new_engine)
+
+
+def engine_for(store):
+    """Motor compartido por todas las sesiones para la versión del bundle.
+
+    Una versión nueva de un directorio ya abierto parte del último motor de ese
+    directorio (ver ``ForecastEngine.previous``).
+    """
+    return _ENGINES.get(store)
@@ -0,0 +1,244 @@
+"""
+Modelo jerárquico de las series y pronósticos coherentes.
+
+Cada hoja del bundle (una columna) tiene una ruta país → región → medio →
+subcanal. Los nodos agregados no se guardan: salen de la matriz de suma
+``S`` (nodos × hojas, ``scipy.sparse``), ``Y_nodos = S @ Y_hojas``. Un agregado
+con un solo hijo es la misma serie que el hijo y se fusiona con él (en el
+bundle nacional, Colombia/Nacional es TOTAL y Prensa/Prensa es Prensa).
+
+La jerarquía sale de la tabla ``hierarchy`` del bundle ({columna: ruta}); sin
+ella se usa la nacional (``NATIONAL``). Las rutas completas son hojas; una
+columna con ruta más corta es el dato observado de ese agregado (``total``,
+``tv``) y se usa para su pronóstico base en lugar de la suma de las hojas. Un
+bundle regional o por vertical sólo necesita listar sus columnas con su ruta.
+
+Los pronósticos base de todos los nodos son log-lineales ajustados en bloque
+(sumas por fila sobre una máscara nodos × años, sin bucles por serie) y se
+reconcilian para que cada agregado sea la suma de sus hojas:
+
+  bu          bottom-up: se suman las hojas
+  ols         MinT con W = I (puede dar negativos si las base discrepan mucho)
+  wls_struct  MinT con W = número de hojas de cada nodo
+  mint        MinT diagonal: W = varianza del error de cada nodo en niveles,
+              σ²(log) · ŷ² por horizonte (el error log-lineal es relativo)
+
+``ỹ = S (Sᵀ W⁻¹ S)⁻¹ Sᵀ W⁻¹ ŷ``. Las filas de ``S`` son las hojas (identidad)
+más las de agregados ``C``, así que ``Sᵀ W⁻¹ S = Λ⁻¹ + Cᵀ Ω⁻¹ C`` y, por
+Woodbury, sólo se factoriza ``Ω + C Λ Cᵀ`` (agregados × agregados, dispersa):
+el costo crece con los agregados, no con las hojas. Con pocas hojas
+(``DENSE_MAX``, como el bundle nacional) ``S`` es una matriz NumPy densa y el
+arranque no paga la importación de ``scipy.sparse``.
+"""
+import numpy as np
+
+from dashboard.datastore import VersionRegistry
+
+LEVELS = ('país', 'región', 'medio', 'subcanal')
+NATIONAL = {
+    'total': ('Colombia',),
+    'tv': ('Colombia', 'Nacional', 'TV'),
+    'tv_nac': ('Colombia', 'Nacional', 'TV', 'TV Nacional'),
+    'tv_local': ('Colombia', 'Nacional', 'TV', 'TV Local'),
+    'prensa': ('Colombia', 'Nacional', 'Prensa', 'Prensa'),
+    'radio': ('Colombia', 'Nacional', 'Radio', 'Radio'),
+    'digital': ('Colombia', 'Nacional', 'Digital', 'Digital'),
+    'revistas': ('Colombia', 'Nacional', 'Revistas', 'Revistas'),
+    'exterior': ('Colombia', 'Nacional', 'Exterior', 'Exterior'),
+}
+METHODS = ('bu', 'ols', 'wls_struct', 'mint')
+MIN_VAR = 1e-12
+DENSE_MAX = 256
+
+
+class Hierarchy:
+    """Nodos, matriz de suma y reconciliación para un conjunto de hojas con ruta."""
+
+    def __init__(self, paths, levels=LEVELS):
+        depth = max(len(p) for p in paths.values())
+        self.leaves = [n for n, p in paths.items() if len(p) == depth]
+        self.levels = tuple(levels)[:depth]
+        P = np.array([tuple(paths[n]) for n in self.leaves], dtype=str)      # hojas × niveles
+        n_leaves, depth = P.shape
+        if len(np.unique(P, axis=0)) != n_leaves:
+            raise ValueError('Hay hojas con la misma ruta')
+
+        # Códigos de cada prefijo por nivel: nodos del nivel d = prefijos distintos
+        codes, prefixes = [], []
+        for d in range(depth):
+            uniq, inv = np.unique(P[:, :d + 1], axis=0, return_inverse=True)
+            codes.append(inv.ravel())
+            prefixes.append(uniq)
+
+        # Filas: primero los agregados por nivel, después las hojas en el orden de ``paths``.
+        # Un agregado con un único hijo es la misma serie que el hijo y usa su fila.
+        rows_at = [None] * depth
+        rows_at[-1] = np.empty(n_leaves, dtype=np.int64)
+        keep, child = [None] * depth, [None] * depth
+        for d in range(depth - 1):
+            pairs = np.unique(np.column_stack([codes[d], codes[d + 1]]), axis=0)
+            keep[d] = np.bincount(pairs[:, 0], minlength=len(prefixes[d])) > 1
+            child[d] = np.zeros(len(prefixes[d]), dtype=np.int64)
+            child[d][pairs[:, 0]] = pairs[:, 1]
+        self.n_agg = int(sum(k.sum() for k in keep[:-1]))
+        nodes, depths, start = [], [], 0
+        for d in range(depth - 1):
+            rows_at[d] = np.full(len(prefixes[d]), -1, dtype=np.int64)
+            rows_at[d][keep[d]] = start + np.arange(keep[d].sum())
+            start += int(keep[d].sum())
+            nodes += list(map(tuple, prefixes[d][keep[d]].tolist()))
+            depths += [d] * int(keep[d].sum())
+        rows_at[-1][codes[-1]] = self.n_agg + np.arange(n_leaves)
+        for d in range(depth - 2, -1, -1):
+            fused = ~keep[d]
+            rows_at[d][fused] = rows_at[d + 1][child[d][fused]]
+        self.nodes = nodes + list(map(tuple, P.tolist()))
+        self.depth = np.array(depths + [depth - 1] * n_leaves)
+        self.leaf_rows = np.arange(self.n_agg, len(self.nodes))
+
+        # S: cada hoja suma en su propia fila y en la de cada agregado conservado que la contiene
+        r = [self.leaf_rows] + [rows_at[d][codes[d]][keep[d][codes[d]]] for d in range(depth - 1)]
+        c = [np.arange(n_leaves)] + [np.flatnonzero(keep[d][codes[d]]) for d in range(depth - 1)]
+        r, c = np.concatenate(r), np.concatenate(c)
+        self.sparse = n_leaves > DENSE_MAX
+        if self.sparse:
+            from scipy import sparse
+
+            self.S = sparse.csr_matrix((np.ones(len(r)), (r, c)), shape=(len(self.nodes), n_leaves))
+        else:
+            self.S = np.zeros((len(self.nodes), n_leaves))
+            self.S[r, c] = 1.0
+        self.size = np.asarray(self.S.sum(axis=1)).ravel()
+
+        self._index = {}
+        for d in range(depth):
+            self._index.update(zip(map(tuple, prefixes[d].tolist()), rows_at[d].tolist()))
+        self._index.update(zip(self.leaves, self.leaf_rows.tolist()))
+        # Columnas de agregados observados: {fila: columna}
+        self.observed = {self.row(tuple(p)): n for n, p in paths.items() if len(p) < depth}
+        self._index.update({n: r for r, n in self.observed.items()})
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def row(self, key):
+        """Fila de un nodo por ruta (tupla, puede ser un prefijo) o por nombre de columna hoja."""
+        try:
+            return int(self._index[key])
+        except KeyError:
+            raise KeyError(f'Nodo desconocido en la jerarquía: {key}') from None
+
+    def aggregate(self, leaves):
+        """Series de todos los nodos (nodos × T) a partir de las hojas (hojas × T)."""
+        return np.asarray(self.S @ np.asarray(leaves, dtype=np.float64))
+
+    def weights(self, method, var=None):
+        if method == 'ols':
+            return np.ones(len(self))
+        if method == 'wls_struct':
+            return self.size.astype(np.float64)
+        if method == 'mint':
+            if var is None:
+                raise ValueError('mint requiere la varianza residual de cada nodo')
+            return np.maximum(np.asarray(var, dtype=np.float64), MIN_VAR)
+        raise ValueError(f"Método de reconciliación desconocido: {method} (usar {', '.join(METHODS)})")
+
+    def reconcile(self, base, method='mint', var=None):
+        """Pronósticos coherentes (nodos × H) a partir de los base de cada nodo (nodos × H).
+
+        ``var`` (mint) es la varianza de cada nodo: (nodos,) o (nodos × H) si
+        cambia por horizonte; en ese caso se resuelve un sistema por columna.
+        """
+        base = np.asarray(base, dtype=np.float64)
+        if method == 'bu' or self.n_agg == 0:
+            return self.aggregate(base[self.leaf_rows])
+        w = self.weights(method, var)
+        if w.ndim == 2:
+            return np.column_stack([self._mint(base[:, [h]], w[:, h]) for h in range(base.shape[1])])
+        return self._mint(base, w)
+
+    def _mint(self, base, w):
+        lam, omega = w[self.leaf_rows], w[:self.n_agg]
+        C = self.S[:self.n_agg]
+        # r = Sᵀ W⁻¹ ŷ;  x = (Λ⁻¹ + Cᵀ Ω⁻¹ C)⁻¹ r = Λr − ΛCᵀ (Ω + CΛCᵀ)⁻¹ CΛr
+        r = base[self.leaf_rows] / lam[:, None] + C.T @ (base[:self.n_agg] / omega[:, None])
+        lr = lam[:, None] * r
+        if self.sparse:
+            from scipy.sparse import diags
+            from scipy.sparse.linalg import splu
+
+            solve = splu((diags(omega) + C @ diags(lam) @ C.T).tocsc()).solve
+        else:
+            K = np.diag(omega) + (C * lam) @ C.T
+            solve = lambda b: np.linalg.solve(K, b)
+        x = lr - lam[:, None] * (C.T @ solve(np.asarray(C @ lr)))
+        return self.aggregate(x)
+
+
+def fit_loglinear(years, Y, mask):
+    """Ajuste ``log y = a + b·t`` de cada fila de ``Y`` sobre sus años en ``mask``.
+
+    Devuelve (a, b, varianza residual de log y) por fila, con sumas
+    vectorizadas: una fila = una serie, sin bucles de Python.
+    """
+    Y = np.asarray(Y, dtype=np.float64)
+    M = np.asarray(mask, dtype=bool) & (Y > 0)
+    t = np.asarray(years, dtype=np.float64) - years[0]
+    logy = np.log(np.where(M, Y, 1.0))
+    n = M.sum(axis=1)
+    st, stt = M @ t, M @ t ** 2
+    sy, sty = (M * logy).sum(axis=1), (M * logy) @ t
+    with np.errstate(invalid='ignore', divide='ignore'):
+        b = (n * sty - st * sy) / (n * stt - st ** 2)
+        b = np.where(np.isfinite(b), b, 0.0)
+        a = (sy - b * st) / np.maximum(n, 1)
+    resid = np.where(M, logy - a[:, None] - b[:, None] * t, 0.0)
+    var = (resid ** 2).sum(axis=1) / np.maximum(n - 2, 1)
+    return a, b, var
+
+
+def coherent_forecast(store, hierarchy, horizon, method='mint', starts=None, fits=None):
+    """Pronóstico base y reconciliado de todos los nodos para los años siguientes al bundle.
+
+    ``starts`` fija el primer año de ajuste de algunas columnas ({columna: año},
+    p. ej. los períodos reales); el resto se ajusta desde su primer dato positivo.
+    ``fits`` trae ajustes ya hechos ({columna: (a, b, σ²)}, ``a`` en el primer año
+    del bundle): esos nodos no se reajustan.
+    Devuelve {'years', 'fc_yrs', 'base', 'fc'} (nodos × H) y 'var' (σ² de log y por nodo).
+    """
+    years = np.asarray(store.years)
+    Y = hierarchy.aggregate(store.matrix(hierarchy.leaves))
+    for row, name in hierarchy.observed.items():
+        Y[row] = store[name]
+    first = np.argmax(Y > 0, axis=1)
+    for name, year in (starts or {}).items():
+        first[hierarchy.row(name)] = np.searchsorted(years, year)
+    mask = np.arange(len(years)) >= first[:, None]
+    a, b, var = np.empty(len(Y)), np.empty(len(Y)), np.empty(len(Y))
+    done = np.zeros(len(Y), dtype=bool)
+    for name, fit in (fits or {}).items():
+        r = hierarchy.row(name)
+        a[r], b[r], var[r] = fit
+        done[r] = True
+    rest = ~done
+    a[rest], b[rest], var[rest] = fit_loglinear(years, Y[rest], mask[rest])
+    fc_yrs = np.arange(years[-1] + 1, years[-1] + 1 + horizon)
+    base = np.exp(a[:, None] + b[:, None] * (fc_yrs - years[0]))
+    return {'years': years, 'fc_yrs': fc_yrs, 'base': base, 'var': var,
+            'fc': hierarchy.reconcile(base, method, var[:, None] * base ** 2)}
+
+
+def hierarchy_from_store(store):
+    """Jerarquía de la tabla ``hierarchy`` del bundle o, si no está, la nacional."""
+    paths = store.tables.get('hierarchy') or NATIONAL
+    return Hierarchy({name: tuple(p) for name, p in paths.items()})
+
+
+_HIERARCHIES = VersionRegistry(hierarchy_from_store)
+
+
+def hierarchy_for(store):
+    return _HIERARCHIES.get(store)
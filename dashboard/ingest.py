@@ -0,0 +1,340 @@
+"""
+Ingesta continua: suma al bundle las entregas que caen en un directorio.
+
+    python -m dashboard.ingest entregas/                  # procesa lo que haya y sale
+    python -m dashboard.ingest entregas/ --watch          # sigue mirando cada --interval s
+    DASHBOARD_INGEST_DIR=entregas streamlit run app.py    # dentro del proceso de la app
+    python -m dashboard.warm --ingest entregas --port 8501
+
+Cada archivo (``.csv``, ``.xlsx`` o ``.jsonl``; este último hace de cola local,
+un objeto JSON por línea) trae filas con ``Año``, opcionalmente ``Mes``, y una
+columna por serie con los mismos nombres que las planillas de
+``dashboard.build``. Las filas anuales agregan o corrigen años. Las mensuales
+se acumulan en ``pending.json`` junto al bundle hasta que cada serie informada
+en un año tiene sus 12 meses; entonces el año entra al bundle (suma para la
+inversión, promedio para la TRM y el dato de diciembre para IPC e Internet, que
+ya vienen anualizados). Un año que trae todos los medios pero no ``Total``
+toma su suma como total.
+
+Un año nuevo sólo entra al bundle cuando lo traen todos los medios, IPC, TRM e
+Internet: si no, el eje de años se alargaría y las series que faltan se
+rellenarían copiando el año anterior (el total dejaría de ser la suma de los
+medios y los horizontes del pronóstico no coincidirían). Mientras tanto sus
+datos anuales esperan en ``pending.json`` con clave ``AAAA``. Para no leer un
+archivo a medio copiar, conviene escribirlo con otro nombre (``.tmp``) y
+renombrarlo al terminar.
+
+Los meses pendientes se muestran como puntos provisionales (``provisional``:
+el año en curso anualizado) en las series de Tendencias y Por Medios.
+
+Si las observaciones cambian, el bundle se reescribe con las etapas de
+``dashboard.build``: sólo se reajustan los modelos cuyas entradas cambiaron
+(las exógenas sólo cuentan para ARIMAX) y la regresión Digital vs Internet se
+reutiliza si sus series no cambiaron. Se conservan las columnas de las últimas
+``VERSIONS_KEPT`` versiones, que otras sesiones pueden seguir leyendo, y se
+borran las más viejas. La app y la API abren la versión nueva en la siguiente
+lectura de ``live_store``; el pronóstico extiende los ajustes log-lineales con
+actualizaciones de rango uno en lugar de reajustar (``ForecastEngine.previous``),
+también para los nodos del pronóstico reconciliado, y sólo se invalidan las
+figuras cuyas series cambiaron (``figures.chart_version``). Los archivos procesados pasan a
+``procesados/`` y los rechazados a ``errores/``, con el motivo en un ``.txt``.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from dashboard.build import assemble, base_observations, merge, records
+from dashboard.datastore import DEFAULT_DATA_DIR, VERSIONS_KEPT, live_store, prune_bundle
+from dashboard.derived import MEDIA
+from dashboard.models import EXOG
+from dashboard.telemetry import telemetry
+
+PENDING = 'pending.json'
+SUFFIXES = ('.csv', '.xlsx', '.jsonl')
+DONE_DIR = 'procesados'
+FAILED_DIR = 'errores'
+INTERVAL = float(os.environ.get('DASHBOARD_INGEST_INTERVAL', 5))
+# Cómo se resumen los 12 meses de cada serie (las que no figuran se suman)
+MONTHLY = {'trm': 'mean', 'ipc': 'last', 'internet': 'last'}
+
+
+# ─── LECTURA ────────────────────────────────────────────────────
+
+def _tables(path):
+    """Tablas (listas de filas) de un archivo de entrega."""
+    suffix = path.suffix.lower()
+    if suffix == '.xlsx':
+        from openpyxl import load_workbook
+
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            return [list(ws.iter_rows(values_only=True)) for ws in wb.worksheets]
+        finally:
+            wb.close()
+    text = path.read_text(encoding='utf-8-sig')
+    if suffix == '.jsonl':
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+        header = list(dict.fromkeys(k for item in items for k in item))
+        return [[header] + [[item.get(k) for k in header] for item in items]]
+    try:
+        dialect = csv.Sniffer().sniff(text[:2048], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    return [list(csv.reader(text.splitlines(), dialect))]
+
+
+def read_drop(path):
+    """(anuales {serie: {año: valor}}, mensuales {serie: {'AAAA-MM': valor}}) de un archivo."""
+    path = Path(path)
+    annual, monthly = {}, {}
+    for table in _tables(path):
+        for year, month, values in records(table):
+            if month is None:
+                for name, value in values.items():
+                    annual.setdefault(name, {})[year] = value
+            elif 1 <= month <= 12:
+                for name, value in values.items():
+                    monthly.setdefault(name, {})[f'{year}-{month:02d}'] = value
+            else:
+                raise ValueError(f'{path.name}: mes {month} fuera de rango')
+    if not annual and not monthly:
+        raise ValueError(f'{path.name}: no hay filas con Año y series conocidas')
+    return annual, monthly
+
+
+def close_years(pending):
+    """(anuales, pendientes): pasa a anual cada año en que todas sus series tienen 12 meses."""
+    names_by_year = {}
+    for name, months in pending.items():
+        for key in months:
+            names_by_year.setdefault(int(key[:4]), set()).add(name)
+    annual, rest = {}, {n: dict(m) for n, m in pending.items()}
+    for year, names in sorted(names_by_year.items()):
+        keys = [f'{year}-{m:02d}' for m in range(1, 13)]
+        if not all(k in rest[n] for n in names for k in keys):
+            continue
+        for name in names:
+            annual.setdefault(name, {})[year] = _summary(name, [rest[name].pop(k) for k in keys])
+    return annual, {n: m for n, m in rest.items() if m}
+
+
+def _summary(name, vals):
+    # Valor anual de los meses de una serie; con menos de 12, la suma se anualiza
+    how = MONTHLY.get(name, 'sum')
+    if how == 'last':
+        return vals[-1]
+    if how == 'mean':
+        return sum(vals) / len(vals)
+    return sum(vals) if len(vals) == 12 else sum(vals) * 12 / len(vals)
+
+
+def provisional(monthly):
+    """Último año con meses pendientes de cada serie, anualizado: {serie: {'year', 'months', 'value'}}.
+
+    ``total`` sale de la suma de los medios si no viene y todos cubren los mismos meses.
+    """
+    out = {}
+    for name, months in monthly.items():
+        year = max(int(k[:4]) for k in months)
+        vals = [v for k, v in sorted(months.items()) if int(k[:4]) == year]
+        out[name] = {'year': year, 'months': len(vals), 'value': _summary(name, vals)}
+    media = [out.get(n) for n in MEDIA]
+    if 'total' not in out and all(media) and len({(m['year'], m['months']) for m in media}) == 1:
+        out['total'] = {**media[0], 'value': sum(m['value'] for m in media)}
+    return out
+
+
+def split_pending(pending):
+    """(mensuales {serie: {'AAAA-MM': v}}, anuales retenidos {serie: {año: v}}) de ``pending.json``."""
+    monthly, annual = {}, {}
+    for name, values in pending.items():
+        for key, value in values.items():
+            if '-' in key:
+                monthly.setdefault(name, {})[key] = value
+            else:
+                annual.setdefault(name, {})[int(key)] = value
+    return monthly, annual
+
+
+def hold_partial(obs, last):
+    """(``obs`` hasta el último año completo, retenidos {serie: {'AAAA': v}}).
+
+    Los años posteriores a ``last`` entran en orden mientras cada uno traiga
+    todas las series de ``MEDIA`` y ``EXOG``; desde el primero incompleto, todo
+    lo posterior queda retenido (un hueco también se rellenaría).
+    """
+    required = MEDIA + EXOG
+    new = sorted({y for values in obs.values() for y in values if y > last})
+    for year in new:
+        if year != last + 1 or not all(year in obs.get(n, ()) for n in required):
+            break
+        last = year
+    kept, held = {}, {}
+    for name, values in obs.items():
+        kept[name] = {y: v for y, v in values.items() if y <= last}
+        rest = {str(y): v for y, v in values.items() if y > last}
+        if rest:
+            held[name] = rest
+    return kept, held
+
+
+def with_total(annual):
+    """``annual`` con ``total`` = suma de medios en los años que traen todos los medios y no el total."""
+    total = annual.get('total', {})
+    years = set.intersection(*(set(annual.get(n, ())) for n in MEDIA)) - set(total)
+    if not years:
+        return annual
+    return {**annual, 'total': {**total, **{y: sum(annual[n][y] for n in MEDIA) for y in years}}}
+
+
+# ─── SERVICIO ───────────────────────────────────────────────────
+
+class Ingestor:
+    """Procesa las entregas de ``drop`` contra el bundle de ``root``."""
+
+    def __init__(self, drop, root=DEFAULT_DATA_DIR, log=print):
+        self.drop = Path(drop)
+        self.root = Path(root)
+        self.log = log
+        self.last_error = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def pending(self):
+        """Meses recibidos que todavía no completan un año ({serie: {'AAAA-MM': valor}})."""
+        try:
+            with open(self.root / PENDING, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_pending(self, pending):
+        tmp = self.root / f'{PENDING}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(pending, f, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        os.replace(tmp, self.root / PENDING)
+
+    def _move(self, path, folder, reason=None):
+        dest = self.drop / folder
+        dest.mkdir(exist_ok=True)
+        target = dest / f"{time.strftime('%Y%m%d-%H%M%S')}-{path.name}"
+        os.replace(path, target)
+        if reason is not None:
+            target.with_name(target.name + '.txt').write_text(f'{reason}\n', encoding='utf-8')
+            self.log(f'  {path.name}: rechazado ({reason})')
+
+    def poll(self):
+        """Procesa los archivos presentes; devuelve la versión nueva del bundle o None si no cambió."""
+        with self._lock:
+            files = sorted(p for p in self.drop.iterdir()
+                           if p.is_file() and p.suffix.lower() in SUFFIXES and not p.name.startswith('.'))
+            if not files:
+                return None
+            tel = telemetry()
+            with tel.section('ingest'):
+                store = live_store(self.root)
+                base = base_observations(store)
+                pending, held = split_pending(self.pending())
+                obs, done = merge(base, held), []
+                for path in files:
+                    try:
+                        annual, monthly = read_drop(path)
+                    except (ValueError, OSError, json.JSONDecodeError) as exc:
+                        self._move(path, FAILED_DIR, exc)
+                        tel.count('ingest_files', result='error')
+                        continue
+                    obs, pending = merge(obs, with_total(annual)), merge(pending, monthly)
+                    done.append(path)
+                    self.log(f'  {path.name}: {sum(map(len, annual.values()))} datos anuales, '
+                             f'{sum(map(len, monthly.values()))} mensuales')
+                closed, pending = close_years(pending)
+                obs, held = hold_partial(with_total(merge(obs, closed)), int(store.years[-1]))
+                pending = merge(pending, held)
+                version = None
+                if obs != base:
+                    try:
+                        version = assemble(self.root, obs, store, prune=False, log=self.log)
+                        # Las columnas de las versiones que ya ninguna sesión retiene se borran
+                        prune_bundle(self.root, VERSIONS_KEPT)
+                    except ValueError as exc:
+                        for path in done:
+                            self._move(path, FAILED_DIR, exc)
+                        tel.count('ingest_files', len(done), result='error')
+                        return None
+                self._write_pending(pending)
+                for path in done:
+                    self._move(path, DONE_DIR)
+                tel.count('ingest_files', len(done), result='ok')
+            return version
+
+    def watch(self, interval=INTERVAL):
+        """Llama a ``poll`` cada ``interval`` segundos hasta ``stop``."""
+        while not self._stop.is_set():
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as exc:          # el hilo de fondo no debe morir por una entrega
+                self.last_error = f'{type(exc).__name__}: {exc}'
+                self.log(f'ingesta: {self.last_error}')
+            self._stop.wait(interval)
+
+    def start(self, interval=INTERVAL):
+        """``watch`` en un hilo de fondo (una vez por instancia)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.watch, args=(interval,), name='ingest', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+_INGESTORS = {}
+_LOCK = threading.Lock()
+
+
+def ingestor(drop, root=DEFAULT_DATA_DIR):
+    """``Ingestor`` del proceso para (directorio de entregas, bundle)."""
+    key = (Path(drop).resolve(), Path(root).resolve())
+    with _LOCK:
+        ing = _INGESTORS.get(key)
+        if ing is None:
+            ing = _INGESTORS[key] = Ingestor(drop, root)
+        return ing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dashboard.ingest', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('drop', type=Path, help='directorio de entregas')
+    parser.add_argument('--data', type=Path, default=DEFAULT_DATA_DIR, help='directorio del bundle')
+    parser.add_argument('--watch', action='store_true', help='sigue mirando el directorio')
+    parser.add_argument('--interval', type=float, default=INTERVAL, help='segundos entre lecturas')
+    args = parser.parse_args(argv)
+    if not args.drop.is_dir():
+        print(f'error: {args.drop} no es un directorio', file=sys.stderr)
+        return 1
+    ing = Ingestor(args.drop, args.data)
+    if args.watch:
+        try:
+            ing.watch(args.interval)
+        except KeyboardInterrupt:
+            pass
+        return 0
+    try:
+        version = ing.poll()
+    except (ValueError, OSError) as exc:
+        print(f'error: {exc}', file=sys.stderr)
+        return 1
+    print(f'Bundle {version}' if version else 'Sin cambios en el bundle')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
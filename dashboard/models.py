@@ -0,0 +1,363 @@
+"""
+Comparación de familias de modelos para la pestaña Modelos.
+
+Familias (todas sobre ``log(y)`` y resueltas con NumPy):
+  * loglineal — tendencia lineal, la misma del pronóstico.
+  * arimax    — ARIMA(1,1,0) con IPC, ΔlogTRM y ΔInternet como exógenas.
+  * prophet   — tendencia lineal por tramos con changepoints penalizados
+                (estilo Prophet, sin estacionalidad: la serie es anual).
+
+Cada ajuste recalcula AIC/BIC (sobre log y y la misma muestra en las tres
+familias) y el RMSE del backtest leave-last-3-out. Se ajustan las categorías
+y todos los nodos de la jerarquía del bundle (regiones en un bundle
+regional). Los ajustes corren en un hilo aparte (en lotes sobre un pool de
+procesos cuando el costo medido lo justifica), se pueden cancelar, informan
+progreso y se persisten en disco por hash de entradas, de modo que un
+reinicio no vuelve a ajustar lo que ya estaba hecho. Los que ya vienen en el
+bundle (tabla ``metrics`` de ``dashboard.build``) no se ajustan de nuevo si
+su hash coincide. El
+backtest rolling-origin por horizonte está en ``dashboard.backtest``.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+
+from dashboard.datastore import prune_runs
+from dashboard.forecast import CATEGORIES
+from dashboard.hierarchy import NATIONAL
+
+FAMILIES = {'loglineal': 'Log-Lineal', 'arimax': 'ARIMAX', 'prophet': 'Prophet'}
+EXOG = ('ipc', 'trm', 'internet')
+HOLDOUT = 3
+MAX_CHANGEPOINTS = 5
+RIDGE = 1.0
+# Años que ARIMAX consume como rezagos; AIC/BIC de todas las familias se miden sin ellos
+LAGS = 2
+_FAMILY_LAGS = {'arimax': LAGS}
+# Familias que usan las exógenas: sólo su hash cambia con IPC, TRM o Internet
+_EXOG_FAMILIES = {'arimax'}
+# Ajustes que se miden en el hilo antes de decidir si compensa el pool
+PROBE = 16
+# Segundos que tarda en arrancar un pool spawn (cada proceso importa numpy)
+POOL_STARTUP = 1.5
+# Lotes por proceso: pocos envíos, pero el progreso avanza más de una vez
+BATCHES_PER_WORKER = 4
+DEFAULT_CACHE_DIR = Path(os.environ.get(
+    'DASHBOARD_CACHE_DIR', Path(__file__).resolve().parent.parent / '.cache'))
+
+
+# ─── FAMILIAS ───────────────────────────────────────────────────
+# fit(t, logy, exog) -> (estado, residuos, k); predict(estado, t, logy, exog, t_f, exog_f) -> log ŷ
+
+def _fit_loglineal(t, logy, exog):
+    X = np.column_stack([np.ones_like(t), t])
+    beta = np.linalg.lstsq(X, logy, rcond=None)[0]
+    return beta, logy - X @ beta, 2
+
+
+def _predict_loglineal(beta, t, logy, exog, t_f, exog_f):
+    return beta[0] + beta[1] * t_f
+
+
+def _arimax_exog(exog):
+    # IPC en nivel (ya es una tasa), TRM e Internet en diferencias
+    ipc, trm, internet = exog
+    return np.column_stack([ipc[1:], np.diff(np.log(trm)), np.diff(internet)])
+
+
+def _fit_arimax(t, logy, exog):
+    d = np.diff(logy)
+    Z = _arimax_exog(exog)
+    X = np.column_stack([np.ones(len(d) - 1), d[:-1], Z[1:]])
+    beta = np.linalg.lstsq(X, d[1:], rcond=None)[0]
+    # d − d̂ es también el error a un paso en log y: log ŷ_t = log y_{t−1} + d̂_t
+    return beta, d[1:] - X @ beta, X.shape[1]
+
+
+def _predict_arimax(beta, t, logy, exog, t_f, exog_f):
+    full = np.concatenate([exog, exog_f], axis=1)
+    Z = _arimax_exog(full)[len(logy) - 1:]
+    level, d_prev = logy[-1], logy[-1] - logy[-2]
+    out = np.empty(len(t_f))
+    for i in range(len(t_f)):
+        d_prev = beta[0] + beta[1] * d_prev + Z[i] @ beta[2:]
+        level = out[i] = level + d_prev
+    return out
+
+
+def _hinges(t, cps):
+    return np.maximum(t[:, None] - cps[None, :], 0.0)
+
+
+def _fit_prophet(t, logy, exog):
+    n_cp = min(MAX_CHANGEPOINTS, max(len(t) // 4, 0))
+    cps = np.quantile(t[: max(int(len(t) * 0.8), 2)], np.linspace(0, 1, n_cp + 2)[1:-1])
+    X = np.column_stack([np.ones_like(t), t, _hinges(t, cps)])
+    P = np.diag([0.0, 0.0] + [RIDGE] * n_cp)
+    A = np.linalg.solve(X.T @ X + P, X.T)
+    beta = A @ logy
+    # Grados de libertad efectivos = traza de la matriz sombrero
+    return (beta, cps), logy - X @ beta, float(np.trace(X @ A))
+
+
+def _predict_prophet(state, t, logy, exog, t_f, exog_f):
+    beta, cps = state
+    return np.column_stack([np.ones_like(t_f), t_f, _hinges(t_f, cps)]) @ beta
+
+
+_FAMILY_FNS = {
+    'loglineal': (_fit_loglineal, _predict_loglineal),
+    'arimax': (_fit_arimax, _predict_arimax),
+    'prophet': (_fit_prophet, _predict_prophet),
+}
+
+
+def _information_criteria(resid, k):
+    n = len(resid)
+    sse = float(resid @ resid)
+    loglik = -n / 2 * (np.log(2 * np.pi) + np.log(sse / n) + 1)
+    return 2 * (k + 1) - 2 * loglik, (k + 1) * np.log(n) - 2 * loglik
+
+
+def fit_series(family, years, values, exog, holdout=HOLDOUT):
+    """Ajusta una familia a una serie: AIC/BIC y RMSE de backtest.
+
+    AIC/BIC salen de los residuos en log y de los mismos ``n − LAGS`` años en
+    todas las familias (las que no usan rezagos descartan los primeros), así
+    que se pueden comparar entre sí.
+    """
+    fit, predict = _FAMILY_FNS[family]
+    t = np.asarray(years, dtype=np.float64) - years[0]
+    logy = np.log(np.asarray(values, dtype=np.float64))
+    exog = np.asarray(exog, dtype=np.float64)
+    skip = LAGS - _FAMILY_LAGS.get(family, 0)
+    _, resid, k = fit(t[skip:], logy[skip:], exog[:, skip:])
+    aic, bic = _information_criteria(resid, k)
+
+    cut = len(t) - holdout
+    state, _, _ = fit(t[:cut], logy[:cut], exog[:, :cut])
+    pred = np.exp(predict(state, t[:cut], logy[:cut], exog[:, :cut], t[cut:], exog[:, cut:]))
+    rmse = float(np.sqrt(np.mean((pred - np.exp(logy[cut:])) ** 2)))
+    return {'family': family, 'n': len(resid), 'k': round(float(k), 2),
+            'aic': round(float(aic), 1), 'bic': round(float(bic), 1), 'rmse': round(rmse)}
+
+
+def input_key(family, label, period, values, exog):
+    """Hash de las entradas de un ajuste: nombra el resultado persistido y valida el del bundle."""
+    h = hashlib.sha1(f'{family}|{label}|{period[0]}-{period[1]}|{HOLDOUT}|{LAGS}'.encode())
+    h.update(np.ascontiguousarray(values).tobytes())
+    if family in _EXOG_FAMILIES:
+        h.update(np.ascontiguousarray(exog).tobytes())
+    return h.hexdigest()[:20]
+
+
+def model_series(years, columns, periods, observed, hierarchy):
+    """[(etiqueta, columna, (desde, hasta))] a ajustar.
+
+    Las categorías con su período real y el resto de los nodos de la jerarquía
+    (regiones, verticales, agregados como ``tv``) con su tramo observado desde
+    el primer valor positivo.
+    """
+    years = np.asarray(years)
+    out = [(c, col, tuple(periods[c])) for c, col in CATEGORIES.items() if c in periods]
+    seen = {col for _, col, _ in out}
+    for name in hierarchy:
+        if name in seen or name not in columns:
+            continue
+        first, last = observed.get(name, (years[0], years[-1]))
+        ok = (years >= first) & (years <= last) & (np.asarray(columns[name]) > 0)
+        if ok.sum() > HOLDOUT + LAGS + 1:
+            out.append((name, name, (int(years[ok][0]), int(last))))
+    return out
+
+
+def _run_job(job):
+    key, family, years, values, exog = job
+    return key, fit_series(family, years, values, exog)
+
+
+def _run_batch(jobs):
+    return [_run_job(job) for job in jobs]
+
+
+# ─── SERVICIO ───────────────────────────────────────────────────
+
+class ModelRun:
+    """Ejecución en segundo plano (cancelable).
+
+    Los primeros ``PROBE`` ajustes corren en el hilo y miden el costo por
+    ajuste; el resto va en lotes a un pool sólo si el tiempo estimado en el
+    hilo supera al del pool contando su arranque (``POOL_STARTUP``).
+    """
+
+    def __init__(self, jobs, persist, max_workers=None):
+        self.total = len(jobs)
+        self.done = 0
+        self.results = {}
+        self.error = None
+        self._jobs = jobs
+        self._persist = persist
+        self._max_workers = max_workers or os.cpu_count()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._work, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return not self.running
+
+    def _record(self, key, res):
+        self._persist(key, res)
+        self.results[key] = res
+        self.done += 1
+
+    def _work(self):
+        if not self._jobs:
+            return
+        try:
+            t0 = time.perf_counter()
+            self._work_inline(self._jobs[:PROBE])
+            rest = self._jobs[PROBE:]
+            inline = (time.perf_counter() - t0) / min(PROBE, len(self._jobs)) * len(rest)
+            workers = min(self._max_workers, len(rest))
+            if workers > 1 and POOL_STARTUP + inline / workers < inline:
+                self._work_pool(rest, workers)
+            else:
+                self._work_inline(rest)
+        except Exception as exc:  # se muestra en la UI en vez de perder el hilo
+            self.error = exc
+
+    def _work_inline(self, jobs):
+        for job in jobs:
+            if self._cancel.is_set():
+                return
+            self._record(*_run_job(job))
+
+    def _work_pool(self, jobs, workers):
+        ctx = multiprocessing.get_context('spawn')
+        size = -(-len(jobs) // (workers * BATCHES_PER_WORKER))
+        batches = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            pending = {pool.submit(_run_batch, batch) for batch in batches}
+            while pending and not self._cancel.is_set():
+                finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    for key, res in fut.result():
+                        self._record(key, res)
+            if self._cancel.is_set():
+                pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ModelService:
+    """Ajustes persistidos en ``cache_dir/models`` y ejecuciones de las últimas versiones del bundle."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.dir = Path(cache_dir) / 'models'
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.dir / f'{key}.json'
+
+    def load(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def bundled(self, store, family, label, key):
+        """Ajuste que ya trae el bundle (``python -m dashboard.build``) si se hizo con las mismas entradas."""
+        res = store.tables.get('metrics', {}).get(label, {}).get('models', {}).get(family)
+        return res if res is not None and res.get('input') == key else None
+
+    def persist(self, key, result):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._path(key).with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        os.replace(tmp, self._path(key))
+
+    def series(self, store):
+        t = store.tables
+        return model_series(store.years, store, t['periods'], t.get('observed', {}),
+                            t.get('hierarchy') or NATIONAL)
+
+    def jobs(self, store, families=FAMILIES):
+        """Un ajuste por familia y serie: las categorías y los nodos de la jerarquía del bundle."""
+        years = np.asarray(store.years)
+        exog_all = store.matrix(EXOG)
+        out = []
+        for label, col, (a, b) in self.series(store):
+            mask = (years >= a) & (years <= b)
+            values, exog = np.asarray(store[col])[mask], exog_all[:, mask]
+            for family in families:
+                key = input_key(family, label, (a, b), values, exog)
+                out.append(((family, label, key), family, years[mask], values, exog))
+        return out
+
+    def comparison(self, store):
+        """{familia: {serie: métricas | None}} con lo que ya está persistido."""
+        table = {f: {} for f in FAMILIES}
+        for (family, label, key), *_ in self.jobs(store):
+            table[family][label] = self.load(key) or self.bundled(store, family, label, key)
+        return table
+
+    def missing(self, store):
+        return [job for job in self.jobs(store)
+                if self.load(job[0][2]) is None and self.bundled(store, *job[0]) is None]
+
+    def last_error(self, store):
+        run = self._runs.get(store.version)
+        return run.error if run is not None else None
+
+    def active(self, store):
+        run = self._runs.get(store.version)
+        return run if run is not None and run.running else None
+
+    def start(self, store, force=False, max_workers=None):
+        """Lanza (o reutiliza) la ejecución del bundle; ``force`` reajusta todo."""
+        with self._lock:
+            run = self.active(store)
+            if run is None:
+                jobs = self.jobs(store) if force else self.missing(store)
+                persist = lambda key, res: self.persist(key[2], res)
+                self._runs.pop(store.version, None)
+                run = self._runs[store.version] = ModelRun(jobs, persist, max_workers).start()
+                prune_runs(self._runs)
+            return run
+
+
+_SERVICE = None
+
+
+def model_service():
+    global _SERVICE
+    if _SERVICE is None:
+        _SERVICE = ModelService()
+    return _SERVICE
@@ -0,0 +1,200 @@
+"""
+Optimizador de presupuesto entre medios (pestaña Presupuesto).
+
+El retorno de cada medio es el crecimiento de su inversión al final del
+horizonte según ``D['forecast']``: log-normal con mediana en el pronóstico y
+dispersión tomada del IC bootstrap (``lo``/``hi``), correlacionada entre medios
+como lo estuvieron sus crecimientos anuales en la historia. Una mezcla ``w``
+(participaciones del presupuesto) rinde ``w · g`` en cada sorteo ``g``.
+
+Las mezclas candidatas se sortean de una Dirichlet dentro de las restricciones
+(medios habilitados, participación mínima y máxima). Los sorteos se reparten en
+bloques de tamaño fijo con semillas derivadas de una misma ``SeedSequence``, se
+evalúan como una matriz (sorteos × mezclas) y cada bloque devuelve sumas
+parciales que se combinan al final, así que el resultado es el mismo con uno o
+con varios procesos. La frontera eficiente son las mezclas que ninguna otra
+supera en retorno esperado con menor o igual riesgo.
+"""
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from dashboard.datastore import VersionRegistry
+from dashboard.forecast import CATEGORIES, LEVEL, SEED
+
+MEDIA = ('TV Nacional', 'TV Local', 'Prensa', 'Radio', 'Digital', 'Revistas', 'Exterior')
+N_DRAWS = 100_000
+N_MIXES = 2_000
+CHUNK = 2_500
+# Por debajo de esto no compensa repartir entre procesos
+MIN_PARALLEL = 20_000
+CACHE_SIZE = 16
+
+
+def vertices(orders, min_share=0.0, max_share=1.0):
+    """Vértices del polítopo de restricciones: en cada orden, cada medio toma lo máximo posible."""
+    orders = np.asarray(orders)
+    m, k = orders.shape
+    W = np.full((m, k), min_share)
+    rest = np.full(m, 1 - k * min_share)
+    for j in range(k):
+        take = np.minimum(max_share - min_share, rest)
+        W[np.arange(m), orders[:, j]] += take
+        rest -= take
+    return W
+
+
+def sample_mixes(n, k, min_share=0.0, max_share=1.0, seed=SEED, orders=()):
+    """``n`` participaciones (n × k) que suman 1 con ``min_share ≤ w ≤ max_share``.
+
+    Un cuarto son vértices (órdenes al azar más ``orders``), donde están los
+    extremos de la frontera; el resto, sorteos Dirichlet en el interior.
+    """
+    if k * min_share > 1 + 1e-9 or k * max_share < 1 - 1e-9:
+        raise ValueError('Restricciones imposibles: revisar participación mínima y máxima')
+    rng = np.random.default_rng(seed)
+    perms = rng.permuted(np.tile(np.arange(k), (n // 4, 1)), axis=1)
+    corners = vertices(np.vstack([np.reshape(orders, (-1, k)), perms]).astype(int), min_share, max_share)
+    out = [np.full((1, k), 1 / k), np.unique(corners.round(12), axis=0)]
+    found = sum(len(w) for w in out)
+    free = 1 - k * min_share
+    for _ in range(50):
+        if found >= n:
+            break
+        # Mitad densas (α = 1), mitad concentradas en pocos medios (α = 0,3)
+        alpha = np.where(np.arange(n) % 2, 1.0, 0.3)[:, None] * np.ones(k)
+        g = rng.gamma(alpha)
+        w = min_share + free * g / g.sum(axis=1, keepdims=True)
+        w = w[(w <= max_share + 1e-12).all(axis=1)]
+        out.append(w)
+        found += len(w)
+    return np.concatenate(out)[:n]
+
+
+def _score_chunk(task):
+    """Sumas parciales de un bloque: (Σv, Σv², #v<1) por mezcla y Σg por medio."""
+    seed, n, mu, sigma, chol, W = task
+    rng = np.random.default_rng(seed)
+    G = np.exp(mu + sigma * (rng.standard_normal((n, len(mu))) @ chol.T))     # n × k
+    V = G @ W.T                                                               # n × mezclas
+    return V.sum(axis=0), np.einsum('ij,ij->j', V, V), (V < 1).sum(axis=0), G.sum(axis=0)
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            ctx = multiprocessing.get_context('spawn')
+            _POOL = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=ctx)
+        return _POOL
+
+
+def _run(tasks, parallel):
+    if parallel:
+        return list(_pool().map(_score_chunk, tasks))
+    return [_score_chunk(t) for t in tasks]
+
+
+class BudgetOptimizer:
+    """Distribuciones de crecimiento por medio para un bundle y corridas cacheadas."""
+
+    def __init__(self, store, forecast, media=MEDIA, level=LEVEL):
+        self.store = store
+        self.forecast = forecast
+        self.media = list(media)
+        self.level = level
+        self.fc_year = None
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prepare(self):
+        """Distribuciones por medio; se arman en la primera corrida (usan los pronósticos)."""
+        if self.fc_year is not None:
+            return
+        forecast, store = self.forecast, self.store
+        z = NormalDist().inv_cdf(1 - (100 - self.level) / 200)
+        mu, sigma = [], []
+        for m in self.media:
+            fc = forecast[m]
+            mu.append(np.log(fc['fc'][-1] / fc['hist_y'][-1]))
+            sigma.append((np.log(fc['hi'][-1]) - np.log(fc['lo'][-1])) / (2 * z))
+        self.mu, self.sigma = np.array(mu), np.array(sigma)
+
+        # Correlación de los crecimientos anuales en los años con todos los medios
+        years = np.asarray(store.years)
+        start = max(store.tables['periods'][m][0] for m in self.media)
+        X = np.log(store.matrix([CATEGORIES[m] for m in self.media])[:, years >= start])
+        corr = np.corrcoef(np.diff(X, axis=1))
+        vals, vecs = np.linalg.eigh(corr)
+        corr = vecs @ np.diag(np.clip(vals, 1e-6, None)) @ vecs.T
+        d = np.sqrt(np.diag(corr))
+        self.corr = corr / np.outer(d, d)
+        # Mezcla de referencia: participación de mercado del último año
+        last = np.array([forecast[m]['hist_y'][-1] for m in self.media])
+        self.market = last / last.sum()
+        self.fc_year = forecast[self.media[0]]['fc_yrs'][-1]
+
+    def run(self, media=None, min_share=0.0, max_share=1.0, n_draws=N_DRAWS, n_mixes=N_MIXES, seed=SEED):
+        """Evalúa ``n_mixes`` mezclas sobre ``n_draws`` sorteos; cacheado por parámetros.
+
+        Devuelve {'media', 'weights' (M × k), 'mean', 'std', 'p_loss' (M), 'frontier'
+        (índices ordenados por riesgo), 'market' (fila de referencia o None), 'expected' (k)}.
+        """
+        media = list(media or self.media)
+        key = (tuple(media), float(min_share), float(max_share), int(n_draws), int(n_mixes), seed)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        res = self._run(media, min_share, max_share, n_draws, n_mixes, seed)
+        with self._lock:
+            self._results[key] = res
+            while len(self._results) > CACHE_SIZE:
+                self._results.popitem(last=False)
+        return res
+
+    def _run(self, media, min_share, max_share, n_draws, n_mixes, seed):
+        with self._lock:
+            self._prepare()
+        idx = [self.media.index(m) for m in media]
+        mu, sigma = self.mu[idx], self.sigma[idx]
+        chol = np.linalg.cholesky(self.corr[np.ix_(idx, idx)])
+        # El orden por crecimiento esperado da la mezcla de mayor retorno
+        best = np.argsort(-(mu + sigma ** 2 / 2))
+        W = sample_mixes(n_mixes, len(idx), min_share, max_share, seed, orders=[best])
+        market = self.market[idx] / self.market[idx].sum()
+        feasible = bool((market >= min_share - 1e-12).all() and (market <= max_share + 1e-12).all())
+        if feasible:
+            W = np.vstack([W, market])
+
+        sizes = [CHUNK] * (n_draws // CHUNK) + ([n_draws % CHUNK] if n_draws % CHUNK else [])
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        tasks = [(s, n, mu, sigma, chol, W) for s, n in zip(seeds, sizes)]
+        parts = _run(tasks, parallel=n_draws >= MIN_PARALLEL and (os.cpu_count() or 1) > 1)
+        s1, s2, below, g = (np.sum(p, axis=0) for p in zip(*parts))
+        mean = s1 / n_draws
+        std = np.sqrt(np.maximum(s2 / n_draws - mean ** 2, 0))
+
+        # Frontera: recorriendo por riesgo creciente, cada mezcla que mejora el mejor retorno
+        order = np.lexsort((-mean, std))
+        frontier = order[mean[order] > np.maximum.accumulate(np.r_[-np.inf, mean[order][:-1]])]
+        return {'media': media, 'weights': W, 'mean': mean, 'std': std, 'p_loss': below / n_draws,
+                'frontier': frontier, 'market': len(W) - 1 if feasible else None,
+                'expected': g / n_draws, 'n_draws': n_draws, 'fc_year': self.fc_year}
+
+
+_OPTIMIZERS = VersionRegistry(BudgetOptimizer)
+
+
+def optimizer_for(store, forecast):
+    """Optimizador compartido por las sesiones para la versión del bundle."""
+    return _OPTIMIZERS.get(store, forecast)
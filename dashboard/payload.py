@@ -0,0 +1,224 @@
+"""
+Serialización compacta de las figuras que viajan al navegador.
+
+``st.plotly_chart`` manda cada figura como un JSON aparte, con la plantilla
+``streamlit`` completa (unos 3,7 KB de colores de marcador que el frontend
+reemplaza por los del tema) y los arreglos numéricos en ``float64``. Aquí
+cada spec se reescribe antes de entrar a la caché de figuras:
+
+- la plantilla conserva sólo lo que sus trazas pueden leer: ``colorway`` y
+  las entradas de los tipos de traza presentes; las escalas de color, sólo si
+  alguna traza colorea por valor sin escala propia. El frontend sigue
+  armando ``template.layout`` desde el tema, así que el aspecto no cambia;
+- los números de las trazas se redondean a ``DIGITS`` cifras significativas
+  sin tocar la parte entera (``,.0f`` se sigue viendo igual);
+- cada arreglo numérico va como arreglo tipado de Plotly
+  (``{'dtype', 'bdata'}`` en base64) con el tipo más angosto que conserva
+  esa precisión (``i1``…``i4``, ``f4`` o ``f8``), o como lista si el texto
+  sale más corto.
+
+No hay capa compartida entre figuras: Streamlit manda cada elemento con su
+spec completo, así que lo común sólo puede achicarse, no factorizarse.
+``report`` compara bytes antes y después por figura
+(``python -m dashboard.payload``).
+"""
+import base64
+import json
+import math
+import os
+import sys
+
+import numpy as np
+import plotly.io as pio
+
+DIGITS = int(os.environ.get('DASHBOARD_PAYLOAD_DIGITS', 6))
+# Claves de la plantilla que sólo usa una traza que colorea por valor
+_SCALES = ('colorscale', 'coloraxis')
+_INTS = ('i1', 'u1', 'i2', 'u2', 'i4', 'u4')
+
+
+# ─── PLANTILLA ──────────────────────────────────────────────────
+
+def _by_value(trace):
+    """True si la traza colorea por valor sin traer su propia escala."""
+    marker = trace.get('marker') or {}
+    if 'z' in trace:
+        return 'colorscale' not in trace
+    color = marker.get('color')
+    numeric = isinstance(color, dict) or (
+        isinstance(color, list) and any(isinstance(c, (int, float)) for c in color))
+    return numeric and 'colorscale' not in marker
+
+
+def template(tpl, data):
+    """``tpl`` reducida a lo que pueden leer las trazas de ``data``."""
+    if not tpl:
+        return tpl
+    types = {trace.get('type', 'scatter') for trace in data}
+    scales = any(map(_by_value, data))
+    out = {}
+    layout = {k: v for k, v in tpl.get('layout', {}).items() if scales or k not in _SCALES}
+    if layout:
+        out['layout'] = layout
+    entries = {k: v for k, v in tpl.get('data', {}).items() if k in types}
+    if entries:
+        out['data'] = entries
+    return out
+
+
+# ─── NÚMEROS ────────────────────────────────────────────────────
+
+def _decimals(a, digits):
+    """Decimales por elemento para ``digits`` cifras significativas (nunca menos de 0)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mag = np.floor(np.log10(np.abs(a)))
+    mag = np.where(np.isfinite(mag), mag, 0)
+    return np.clip(digits - 1 - mag, 0, 15)
+
+
+def rounded(a, digits=DIGITS):
+    """``a`` redondeado a ``digits`` cifras significativas, sin tocar la parte entera."""
+    a = np.asarray(a, dtype=float)
+    scale = 10.0 ** _decimals(a, digits)
+    with np.errstate(invalid='ignore'):
+        return np.where(np.isfinite(a), np.round(a * scale) / scale, a)
+
+
+def _round(value, digits):
+    """``rounded`` para un escalar (sin pasar por numpy)."""
+    if not value or not math.isfinite(value):
+        return value
+    return round(value, max(0, min(15, digits - 1 - math.floor(math.log10(abs(value))))))
+
+
+def _typed(a):
+    """Arreglo tipado de Plotly para ``a`` (ya en su dtype final)."""
+    spec = {'dtype': a.dtype.str[1:], 'bdata': base64.b64encode(np.ascontiguousarray(a).tobytes()).decode()}
+    if a.ndim > 1:
+        spec['shape'] = ','.join(map(str, a.shape))
+    return spec
+
+
+def _narrow(a, digits):
+    """(arreglo en el dtype más angosto que conserva ``digits`` cifras, valores como lista)."""
+    finite = np.isfinite(a)
+    r = rounded(a, digits)
+    if finite.all() and np.array_equal(r, np.round(r)):
+        lo, hi = (r.min(), r.max()) if r.size else (0, 0)
+        for code in _INTS:
+            info = np.iinfo(code)
+            if info.min <= lo and hi <= info.max:
+                return r.astype(code), r.astype(np.int64).tolist()
+    f4 = r.astype('<f4')
+    tol = 0.5 * 10.0 ** -_decimals(r, digits)
+    with np.errstate(invalid='ignore'):
+        ok = np.where(finite, np.abs(f4.astype(float) - r) <= tol, True)
+    values = np.where(finite, r, np.nan).tolist()
+    return (f4 if ok.all() else r.astype('<f8')), values
+
+
+def encode(a, digits=DIGITS):
+    """Lista o arreglo tipado (el que ocupe menos) para el arreglo numérico ``a``."""
+    a = np.asarray(a, dtype=float)
+    typed, values = _narrow(a, digits)
+    spec = _typed(typed)
+    # NaN no existe en JSON: como lista se manda null (Plotly lo trata igual)
+    text = json.dumps(values, separators=(',', ':')).replace('NaN', 'null')
+    # plotly.io.to_json escapa '/' como \u002f: cuenta para el base64
+    size = len(json.dumps(spec)) + 5 * spec['bdata'].count('/')
+    return spec if size < len(text) else json.loads(text)
+
+
+def _numeric(value):
+    """El arreglo float de ``value`` si es una lista (o lista de listas) numérica, si no None."""
+    if isinstance(value, dict):
+        if 'bdata' not in value or 'dtype' not in value:
+            return None
+        a = np.frombuffer(base64.b64decode(value['bdata']), dtype=np.dtype(value['dtype']).newbyteorder('<'))
+        if 'shape' in value:
+            a = a.reshape([int(n) for n in str(value['shape']).split(',')])
+        return a.astype(float)
+    if not value or not isinstance(value, list):
+        return None
+    rows = value if isinstance(value[0], list) else [value]
+    width = len(rows[0])
+    for row in rows:
+        if not isinstance(row, list) or len(row) != width or not all(
+                v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in row):
+            return None
+    if all(v is None for row in rows for v in row):
+        return None
+    a = np.array([[np.nan if v is None else v for v in row] for row in rows], dtype=float)
+    return a if isinstance(value[0], list) else a[0]
+
+
+def _compact(value, digits):
+    if isinstance(value, float):
+        return _round(value, digits)
+    a = _numeric(value)
+    if a is not None:
+        return encode(a, digits)
+    if isinstance(value, dict):
+        return {k: _compact(v, digits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_compact(v, digits) for v in value]
+    return value
+
+
+def compact(spec, digits=DIGITS):
+    """Spec (dict) de una figura con la plantilla reducida y los números de sus trazas compactados."""
+    data = [_compact(trace, digits) for trace in spec.get('data', [])]
+    layout = dict(spec.get('layout', {}))
+    if 'template' in layout:
+        layout['template'] = template(layout['template'], data)
+    return {**spec, 'data': data, 'layout': layout}
+
+
+def compact_json(raw, digits=DIGITS):
+    """JSON (bytes) compacto del JSON ``raw`` de una figura, escrito como lo manda ``st.plotly_chart``."""
+    return pio.to_json(compact(json.loads(raw), digits), validate=False).encode()
+
+
+# ─── REPORTE ────────────────────────────────────────────────────
+
+def report(figs, digits=DIGITS):
+    """[(id, bytes de ``to_json``, bytes compactos)] de ``figs`` ({id: go.Figure})."""
+    rows = []
+    for chart_id, fig in figs.items():
+        raw = fig.to_json().encode()
+        rows.append((chart_id, len(raw), len(compact_json(raw, digits))))
+    return rows
+
+
+def main(argv=None):
+    import argparse
+
+    import streamlit  # noqa: F401  registra la plantilla 'streamlit', como en la app
+
+    from dashboard import figures
+    from dashboard.context import data_view
+    from dashboard.datastore import DEFAULT_DATA_DIR, DataStore
+    from dashboard.models import FAMILIES, model_service
+    from dashboard.warm import default_charts
+
+    parser = argparse.ArgumentParser(prog='python -m dashboard.payload',
+                                     description='Bytes por figura antes y después de compactar')
+    parser.add_argument('--data', default=DEFAULT_DATA_DIR, help='directorio del bundle')
+    parser.add_argument('--digits', type=int, default=DIGITS, help='cifras significativas')
+    args = parser.parse_args(argv)
+    store = DataStore.open(args.data)
+    D = data_view(store)
+    figs = {}
+    for chart_id, params in default_charts(D, model_service().comparison(store), FAMILIES):
+        key = chart_id + ''.join(f' {v}' for v in params.values() if isinstance(v, str))
+        figs[key] = getattr(figures, chart_id)(D, **params)
+    rows = report(figs, args.digits)
+    for name, raw, small in rows:
+        print(f'{name[:40]:<40} {raw:9,} → {small:8,}  {small / raw:6.1%}')
+    raw, small = sum(r[1] for r in rows), sum(r[2] for r in rows)
+    print(f"{'total':<40} {raw:9,} → {small:8,}  {small / raw:6.1%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Simulador de escenarios macro para la pestaña Escenarios.
+
+Cada categoría usa la estructura ARIMAX de la pestaña Modelos sobre su período
+real: ``Δlog y_t = a + φ·Δlog y_{t-1} + γ·(IPC_t, ΔlogTRM_t, ΔInternet_t)``,
+con ridge en las exógenas estandarizadas (Exterior tiene 12 años para 5
+coeficientes). Los coeficientes se ajustan una vez por versión de datos.
+
+Un escenario fija el valor de IPC, TRM e Internet al final del horizonte; el
+camino central va en línea recta desde el último dato y las trayectorias Monte
+Carlo le suman un paseo aleatorio con la volatilidad histórica de cada driver
+(TRM en log). Como el modelo es lineal en las exógenas, cada trayectoria es
+
+    log y = central(escenario) + vol · A + B
+
+donde A (ruido de drivers propagado) y B (residuos) no dependen del escenario:
+se simulan una vez por versión de datos como arrays (trayectorias × años ×
+categorías) y sus cuantiles se cachean por nivel de incertidumbre. Mover un
+control sólo recalcula el camino central, y ``central`` evalúa muchos
+escenarios a la vez.
+"""
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+
+import numpy as np
+
+from dashboard.datastore import VersionRegistry
+from dashboard.forecast import CATEGORIES, HORIZON, LEVEL, SEED
+from dashboard.models import EXOG
+
+N_PATHS = 10_000
+RIDGE = 2.0
+TREND_YEARS = 10
+# Paso de los controles de la pestaña (IPC 0,5 pp, TRM 10, Internet 1 pp)
+STEPS = {'ipc': 0.005, 'trm': 10.0, 'internet': 0.01}
+CACHE_SIZE = 64
+# Rango admisible de cada driver (IPC e Internet como fracción)
+BOUNDS = {'ipc': (-0.05, 0.5), 'trm': (500.0, 20000.0), 'internet': (0.0, 1.0)}
+
+
+def _features(levels):
+    """(IPC, ΔlogTRM, ΔInternet) a partir de niveles (..., T, 3) → (..., T-1, 3)."""
+    ipc, trm, internet = levels[..., 0], levels[..., 1], levels[..., 2]
+    return np.stack([ipc[..., 1:], np.diff(np.log(trm), axis=-1), np.diff(internet, axis=-1)], axis=-1)
+
+
+def fit_driver_model(logy, levels, ridge=RIDGE):
+    """Coeficientes (a, φ, γ_ipc, γ_trm, γ_internet) en unidades originales y σ residual."""
+    d = np.diff(logy)
+    Z = _features(levels)[1:]
+    mu, sd = Z.mean(axis=0), Z.std(axis=0)
+    sd = np.where(sd > 0, sd, 1.0)
+    X = np.column_stack([np.ones(len(d) - 1), d[:-1], (Z - mu) / sd])
+    P = np.diag([0.0, 0.0] + [ridge] * Z.shape[1])
+    beta = np.linalg.solve(X.T @ X + P, X.T @ d[1:])
+    resid = d[1:] - X @ beta
+    sigma = float(np.sqrt(resid @ resid / max(len(resid) - X.shape[1], 1)))
+    gamma = beta[2:] / sd
+    return np.concatenate([[beta[0] - gamma @ mu, beta[1]], gamma]), sigma
+
+
+class ScenarioModel:
+    """Coeficientes por categoría y números aleatorios comunes para un bundle."""
+
+    def __init__(self, store, categories=CATEGORIES, horizon=HORIZON, n_paths=N_PATHS, seed=SEED):
+        self.categories = list(categories)
+        self.horizon = horizon
+        years = np.asarray(store.years)
+        levels = np.asarray(store.matrix(EXOG), dtype=np.float64).T          # T × 3
+        self.last_year = int(years[-1])
+        self.fc_yrs = list(range(self.last_year + 1, self.last_year + 1 + horizon))
+        self.last = levels[-1]
+        self.prev = levels[-2]
+
+        coefs, sigmas, level0, d0 = [], [], [], []
+        for c in self.categories:
+            a, b = store.tables['periods'][c]
+            mask = (years >= a) & (years <= b)
+            values = np.asarray(store[categories[c]], dtype=np.float64)
+            beta, sigma = fit_driver_model(np.log(values[mask]), levels[mask])
+            coefs.append(beta)
+            sigmas.append(sigma)
+            # Punto de partida común: los dos últimos años del bundle
+            level0.append(np.log(values[-1]))
+            d0.append(np.log(values[-1] / values[-2]))
+        self.coefs = np.array(coefs)                                        # K × 5
+        self.sigma = np.array(sigmas)
+        self.level0 = np.array(level0)
+        self.d0 = np.array(d0)
+
+        # Volatilidad anual de cada driver (TRM en log) y tendencia reciente
+        steps = np.column_stack([np.diff(levels[:, 0]), np.diff(np.log(levels[:, 1])), np.diff(levels[:, 2])])
+        self.vol = steps.std(axis=0)
+        recent = steps[-TREND_YEARS:].mean(axis=0)
+        trend = np.array([self.last[0] + recent[0] * horizon, self.last[1] * np.exp(recent[1] * horizon),
+                          self.last[2] + recent[2] * horizon])
+        # Redondeados al paso de los controles: el escenario inicial es el tendencial
+        self.defaults = {n: float(np.clip(np.round(v / STEPS[n]) * STEPS[n], *BOUNDS[n]))
+                         for n, v in zip(EXOG, trend)}
+
+        self._spreads = OrderedDict()
+        self._lock = threading.Lock()
+        rng = np.random.default_rng(seed)
+        z = rng.standard_normal((n_paths, horizon, 3)) * self.vol
+        # Ruido en las exógenas del modelo: IPC en nivel (paseo), TRM e Internet en diferencias
+        z_features = np.stack([np.cumsum(z[..., 0], axis=1), z[..., 1], z[..., 2]], axis=-1)
+        zero = np.zeros(len(self.categories))
+        self._A = self._recurse(z_features @ self.coefs[:, 2:].T, zero, zero)
+        self._B = self._recurse(rng.standard_normal((n_paths, horizon, len(self.categories))) * self.sigma,
+                                zero, zero)
+
+    def _recurse(self, shocks, d, level):
+        """Integra ``d_h = shock_h + φ·d_{h-1}`` y acumula en log: (..., H, K)."""
+        out = np.empty_like(shocks)
+        phi = self.coefs[:, 1]
+        for h in range(self.horizon):
+            d = shocks[..., h, :] + phi * d
+            level = out[..., h, :] = level + d
+        return out
+
+    def central_path(self, targets):
+        """Camino lineal (..., H, 3) desde el último dato hasta ``targets`` (..., 3)."""
+        targets = np.asarray(targets, dtype=np.float64)
+        w = np.arange(1, self.horizon + 1) / self.horizon
+        log_last, log_tgt = np.log(self.last[1]), np.log(targets[..., None, 1])
+        ipc = self.last[0] + w * (targets[..., None, 0] - self.last[0])
+        trm = np.exp(log_last + w * (log_tgt - log_last))
+        internet = self.last[2] + w * (targets[..., None, 2] - self.last[2])
+        return np.stack([ipc, trm, internet], axis=-1)
+
+    def central_log(self, targets):
+        """log y sin ruido (..., H, K) para uno o varios escenarios ``targets`` (..., 3)."""
+        paths = self.central_path(targets)
+        prev = np.broadcast_to(np.stack([self.prev, self.last]), paths.shape[:-2] + (2, 3))
+        Z = _features(np.concatenate([prev, paths], axis=-2))[..., 1:, :]
+        return self._recurse(Z @ self.coefs[:, 2:].T + self.coefs[:, 0], self.d0, self.level0)
+
+    def central(self, targets):
+        """Proyección central de varios escenarios a la vez: targets (S, 3) → y (S, H, K)."""
+        return np.exp(self.central_log(targets))
+
+    def spread(self, volatility=1.0, level=LEVEL):
+        """Cuantiles (mediana, lo, hi) de ``vol·A + B`` sobre las trayectorias: 3 × H × K."""
+        key = (float(volatility), level)
+        with self._lock:
+            if key in self._spreads:
+                self._spreads.move_to_end(key)
+                return self._spreads[key]
+        tail = (100 - level) / 2
+        q = np.percentile(volatility * self._A + self._B, [50, tail, 100 - tail], axis=0)
+        with self._lock:
+            self._spreads[key] = q
+            while len(self._spreads) > CACHE_SIZE:
+                self._spreads.popitem(last=False)
+        return q
+
+    def driver_bands(self, targets, volatility=1.0, level=LEVEL):
+        """{driver: {'fc', 'lo', 'hi'}}: camino central y banda del paseo aleatorio."""
+        central = self.central_path(targets)
+        zq = NormalDist().inv_cdf(1 - (100 - level) / 200)
+        width = zq * self.vol * volatility * np.sqrt(np.arange(1, self.horizon + 1))[:, None]
+        lo = np.column_stack([central[:, 0] - width[:, 0], central[:, 1] * np.exp(-width[:, 1]),
+                              central[:, 2] - width[:, 2]])
+        hi = np.column_stack([central[:, 0] + width[:, 0], central[:, 1] * np.exp(width[:, 1]),
+                              central[:, 2] + width[:, 2]])
+        b_lo, b_hi = np.array([BOUNDS[n] for n in EXOG]).T
+        return {n: {'fc': central[:, i].tolist(), 'lo': np.clip(lo[:, i], b_lo[i], b_hi[i]).tolist(),
+                    'hi': np.clip(hi[:, i], b_lo[i], b_hi[i]).tolist()} for i, n in enumerate(EXOG)}
+
+    def simulate(self, targets, volatility=1.0, level=LEVEL):
+        """({categoría: {'fc', 'lo', 'hi', 'fc_yrs'}}, bandas de drivers) para un escenario."""
+        q = np.exp(self.central_log(targets) + self.spread(volatility, level))  # 3 × H × K
+        out = {c: {'fc': q[0, :, k].tolist(), 'lo': q[1, :, k].tolist(), 'hi': q[2, :, k].tolist(),
+                   'fc_yrs': self.fc_yrs} for k, c in enumerate(self.categories)}
+        return out, self.driver_bands(targets, volatility, level)
+
+
+_MODELS = VersionRegistry(ScenarioModel)
+
+
+def scenario_for(store):
+    return _MODELS.get(store)
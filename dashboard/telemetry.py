@@ -0,0 +1,211 @@
+"""
+Instrumentación de la app: tiempos por sección, aciertos de caché y bytes.
+
+    DASHBOARD_METRICS=1                  activa la instrumentación al arrancar
+    DASHBOARD_METRICS_LOG=runs.jsonl     además, una línea JSON por ejecución
+
+Cada ``section(nombre, **etiquetas)`` mide su bloque y lo acumula en un
+resumen (cantidad, suma, máximo) por nombre y etiquetas; ``count`` suma
+contadores (aciertos y fallos de caché) y ``observe`` valores (bytes de cada
+figura). Además, cada ejecución del script o de un fragmento guarda su propia
+lista de secciones (la sección más externa abre la ejecución si no hay una en
+curso en el hilo); las últimas ``RECENT`` quedan en memoria para el panel de
+administración de la app (``?admin=1``).
+
+Exporta texto Prometheus (``prometheus()``, también en ``/metrics`` de
+``dashboard.api``) y JSONL. Desactivada, ``section`` devuelve un contexto
+vacío compartido y los contadores retornan de inmediato.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+ENABLED = os.environ.get('DASHBOARD_METRICS', '') not in ('', '0')
+LOG_PATH = os.environ.get('DASHBOARD_METRICS_LOG')
+PREFIX = 'dashboard'
+RECENT = 50
+_NOOP = nullcontext()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class _Section:
+    __slots__ = ('tel', 'name', 'labels', 'owner', 't0')
+
+    def __init__(self, tel, name, labels):
+        self.tel, self.name, self.labels = tel, name, labels
+
+    def __enter__(self):
+        run = self.tel.current_run()
+        self.owner = run is None
+        if self.owner:
+            run = self.tel._new_run(self.name)
+        run['depth'] += 1
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.t0
+        run = self.tel.current_run()
+        run['depth'] -= 1
+        run['sections'].append({'name': self.name, 'labels': self.labels, 'depth': run['depth'],
+                                'start_ms': round((self.t0 - run['t0']) * 1000, 3),
+                                'ms': round(elapsed * 1000, 3)})
+        self.tel.observe('section_seconds', elapsed, section=self.name, **self.labels)
+        if self.owner:
+            self.tel.end_run()
+        return False
+
+
+class Telemetry:
+    """Registro del proceso: resúmenes, contadores y la ejecución en curso de cada hilo."""
+
+    def __init__(self, enabled=ENABLED, log_path=LOG_PATH):
+        self.enabled = enabled
+        self.log_path = log_path
+        self._summaries = {}
+        self._counters = {}
+        self._local = threading.local()
+        self._recent = deque(maxlen=RECENT)
+        self._lock = threading.Lock()
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    def section(self, name, **labels):
+        """Contexto que mide su bloque; sin efecto si la instrumentación está desactivada."""
+        if not self.enabled:
+            return _NOOP
+        return _Section(self, name, labels)
+
+    def timed(self, name, **labels):
+        """Decorador: ``section`` alrededor de cada llamada (p. ej. debajo de ``st.fragment``)."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.section(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+        run = self.current_run()
+        if run is not None:
+            run['counts'][key] = run['counts'].get(key, 0) + n
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            s = self._summaries.get(key)
+            if s is None:
+                self._summaries[key] = [1, value, value]
+            else:
+                s[0] += 1
+                s[1] += value
+                s[2] = max(s[2], value)
+
+    # ─── Ejecuciones ────────────────────────────────────────────
+    def current_run(self):
+        return getattr(self._local, 'run', None)
+
+    def begin_run(self, kind):
+        if self.enabled:
+            self._new_run(kind)
+
+    def _new_run(self, kind):
+        run = self._local.run = {'kind': kind, 'ts': time.time(), 't0': time.perf_counter(),
+                                 'sections': [], 'counts': {}, 'depth': 0}
+        return run
+
+    def end_run(self):
+        """Cierra la ejecución del hilo, la guarda entre las recientes y la escribe en el JSONL."""
+        run = self.current_run()
+        if run is None:
+            return None
+        self._local.run = None
+        out = {'kind': run['kind'], 'ts': round(run['ts'], 3),
+               'total_ms': round((time.perf_counter() - run['t0']) * 1000, 3),
+               'sections': sorted(run['sections'], key=lambda x: x['start_ms']),
+               'counts': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in run['counts'].items()]}
+        self._recent.append(out)
+        self.observe('run_seconds', out['total_ms'] / 1000, kind=run['kind'])
+        if self.log_path:
+            line = json.dumps(out, ensure_ascii=False, separators=(',', ':'))
+            with self._lock, open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        return out
+
+    def recent(self):
+        """Últimas ejecuciones terminadas del proceso, de la más nueva a la más vieja."""
+        return list(reversed(self._recent))
+
+    # ─── Exportación ────────────────────────────────────────────
+    def snapshot(self):
+        with self._lock:
+            summaries = {k: list(v) for k, v in self._summaries.items()}
+            counters = dict(self._counters)
+        return {'summaries': [{'name': n, 'labels': dict(l), 'count': c, 'sum': s, 'max': m}
+                              for (n, l), (c, s, m) in sorted(summaries.items())],
+                'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in sorted(counters.items())]}
+
+    def prometheus(self):
+        """Texto de exposición Prometheus (resúmenes con _count/_sum y un gauge _max)."""
+        snap = self.snapshot()
+        lines = []
+
+        def labels(d):
+            if not d:
+                return ''
+            esc = (str(v).replace('\\', '\\\\').replace('"', '\\"') for v in d.values())
+            return '{' + ','.join(f'{k}="{v}"' for k, v in zip(d, esc)) + '}'
+
+        families = {}
+        for c in snap['counters']:
+            families.setdefault((f"{PREFIX}_{c['name']}_total", 'counter'), []).append(
+                f"{PREFIX}_{c['name']}_total{labels(c['labels'])} {c['value']}")
+        for x in snap['summaries']:
+            name, lab = f"{PREFIX}_{x['name']}", labels(x['labels'])
+            families.setdefault((name, 'summary'), []).extend(
+                [f"{name}_count{lab} {x['count']}", f"{name}_sum{lab} {x['sum']:.6g}"])
+            families.setdefault((f'{name}_max', 'gauge'), []).append(f"{name}_max{lab} {x['max']:.6g}")
+        for (name, kind), samples in families.items():
+            lines.append(f'# TYPE {name} {kind}')
+            lines += samples
+        return '\n'.join(lines) + '\n'
+
+    def jsonl(self):
+        return ''.join(json.dumps(r, ensure_ascii=False, separators=(',', ':')) + '\n' for r in self._recent)
+
+    def reset(self):
+        with self._lock:
+            self._summaries.clear()
+            self._counters.clear()
+            self._recent.clear()
+
+
+_TELEMETRY = None
+_LOCK = threading.Lock()
+
+
+def telemetry():
+    """Registro único del proceso (lo comparten app, caché de figuras y API)."""
+    global _TELEMETRY
+    if _TELEMETRY is not None:
+        return _TELEMETRY
+    with _LOCK:
+        if _TELEMETRY is None:
+            _TELEMETRY = Telemetry()
+        return _TELEMETRY
@@ -0,0 +1,130 @@
+"""
+Arranque en caliente: carga los datos y llena las cachés antes de aceptar tráfico.
+
+    python -m dashboard.warm --port 8501      # precalienta y levanta app.py
+    python -m dashboard.warm --check          # sólo precalienta e informa tiempos
+    python -m dashboard.warm --api-port 8502  # además, la API de datos en el mismo proceso
+    python -m dashboard.warm --ingest entregas --port 8501   # y la ingesta de entregas
+
+El bundle es el mismo que abre la app (``DASHBOARD_DATA_DIR``).
+
+La app y el servidor de Streamlit corren en el mismo proceso, así que todo lo
+que se calcula acá (``D`` de la versión de datos, pronósticos, ajustes de
+modelos y figuras con los valores iniciales de los widgets) ya está en
+memoria cuando llega la primera sesión. El puerto no se abre hasta terminar,
+de modo que el chequeo de salud del balanceador sólo pasa con la réplica lista.
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+from pathlib import Path
+
+from dashboard.datastore import DEFAULT_DATA_DIR, live_store
+
+APP = Path(__file__).resolve().parent.parent / 'app.py'
+# Se importan a demanda en la app; en el arranque en caliente se pagan antes
+PRELOAD = ('pandas', 'scipy.stats', 'plotly.subplots')
+
+
+def default_charts(D, comparison, families):
+    """(gráfico, parámetros) con los valores iniciales de los widgets de app.py."""
+    yrs = D['hist']['years']
+    window = dict(start=int(yrs[0]), end=int(yrs[-1]), method='pearson')
+    models = dict(comparison=comparison, families=families)
+    budget = dict(media=list(D['optimizer'].media), min_share=0, max_share=100, n_draws=100_000)
+    sc = D['scenario'].defaults
+    scenario = dict(ipc=round(sc['ipc'] * 100, 1), trm=int(sc['trm']), internet=int(round(sc['internet'] * 100)),
+                    vol=1.0)
+    return [
+        ('total_trend', dict(chart_type='Línea')), ('media_stack', {}), ('media_share', {}),
+        ('total_yoy', {}), ('macro_context', {}),
+        ('forecast_category', dict(category='TOTAL')), ('cagr_bars', {}), ('forecast_comparison', {}),
+        ('media_lines', dict(media=['TV Nacional', 'Prensa', 'Radio', 'Digital'], x_range=None)),
+        ('share_pie', dict(year=2025)), ('media_ranking', dict(year=2025)),
+        ('digital_vs_internet', {}), ('digital_growth', dict(x_range=None)), ('digital_share', {}),
+        ('internet_vs_digital', {}),
+        ('corr_heatmap', window), ('trm_scatter', {}), ('ipc_scatter', {}), ('corr_ranking', window),
+        ('rolling_corr', dict(target='Total', window=8, **window)),
+        ('model_aic', models), ('model_rmse', models), ('forecast_ci', {}),
+        ('backtest_horizon', dict(category='TOTAL', metric='mape', families=families)),
+        ('scenario_drivers', scenario), ('scenario_total', dict(category='TOTAL', **scenario)),
+        ('scenario_categories', scenario),
+        ('budget_frontier', budget), ('budget_allocation', budget),
+    ]
+
+
+def warm(root=DEFAULT_DATA_DIR, log=print):
+    """Precalienta el proceso para el bundle en ``root``; devuelve {etapa: segundos}."""
+    from dashboard import figures
+    from dashboard.context import data_view
+    from dashboard.figcache import figure_cache
+    from dashboard.forecast import CATEGORIES
+    from dashboard.models import FAMILIES, model_service
+
+    timings = {}
+
+    def step(name, fn):
+        t = time.perf_counter()
+        out = fn()
+        timings[name] = time.perf_counter() - t
+        log(f'  {name:<10} {timings[name] * 1000:7.0f} ms')
+        return out
+
+    log(f'Precalentando {root}')
+    step('imports', lambda: [importlib.import_module(m) for m in PRELOAD])
+    store = step('datos', lambda: live_store(root))
+    D = step('contexto', lambda: data_view(store))
+    step('pronóstico', lambda: [D['forecast'][c] for c in CATEGORIES])
+    step('anomalías', lambda: D['anomalies'].alerts())
+    svc = model_service()
+    step('modelos', lambda: svc.start(store).wait() if svc.missing(store) else None)
+    if svc.last_error(store):
+        log(f'  los ajustes fallaron: {svc.last_error(store)}')
+    cache = figure_cache()
+    charts = default_charts(D, svc.comparison(store), FAMILIES)
+    step('figuras', lambda: [cache.figure(cid, figures.chart_version(store, cid), getattr(figures, cid), D, **params)
+                             for cid, params in charts])
+    log(f"Listo en {sum(timings.values()) * 1000:.0f} ms · versión {store.version} · "
+        f'{len(cache)} figuras en caché')
+    return timings
+
+
+def serve(app=APP, port=None, address=None):
+    """Levanta el servidor de Streamlit en este proceso (comparte las cachés)."""
+    from streamlit.web import bootstrap
+
+    flags = {'server_headless': True}
+    if port is not None:
+        flags['server_port'] = port
+    if address is not None:
+        flags['server_address'] = address
+    bootstrap.load_config_options(flag_options=flags)
+    bootstrap.run(str(app), False, [], flag_options=flags)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dashboard.warm', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--address')
+    parser.add_argument('--api-port', type=int, help='levanta también dashboard.api (comparte cachés)')
+    parser.add_argument('--ingest', type=Path, help='directorio de entregas para dashboard.ingest')
+    parser.add_argument('--check', action='store_true', help='precalienta y sale sin levantar el servidor')
+    args = parser.parse_args(argv)
+    warm()
+    if args.ingest is not None and not args.check:
+        # La app arranca el mismo Ingestor (uno por proceso) y sigue las versiones nuevas
+        os.environ['DASHBOARD_INGEST_DIR'] = str(args.ingest)
+        from dashboard.ingest import ingestor
+        ingestor(args.ingest).start()
+    if args.api_port is not None and not args.check:
+        from dashboard import api
+        api.start(args.address or '127.0.0.1', args.api_port)
+    if not args.check:
+        serve(port=args.port, address=args.address)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
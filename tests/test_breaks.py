@@ -0,0 +1,55 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from dashboard.breaks import _cumsums, _segment_cost, detect, pelt
+from dashboard.datastore import DEFAULT_DATA_DIR, DataStore
+
+
+def _total_cost(x, cps, penalty):
+    sums = _cumsums(np.asarray(x, dtype=np.float64))
+    bounds = [0, *cps, len(x)]
+    return sum(float(_segment_cost(sums, s, e)) for s, e in zip(bounds[:-1], bounds[1:])) + penalty * len(cps)
+
+
+def _brute_force(x, penalty, min_size):
+    """Partición óptima recorriendo todas las combinaciones de cortes."""
+    n, best = len(x), (np.inf, [])
+    for k in range(n // min_size):
+        for cps in itertools.combinations(range(min_size, n - min_size + 1), k):
+            bounds = [0, *cps, n]
+            if any(e - s < min_size for s, e in zip(bounds[:-1], bounds[1:])):
+                continue
+            cost = _total_cost(x, cps, penalty)
+            if cost < best[0]:
+                best = (cost, list(cps))
+    return best
+
+
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('penalty', [0.05, 0.5, 2.0])
+@pytest.mark.parametrize('min_size', [2, 3])
+def test_pelt_matches_brute_force(seed, penalty, min_size):
+    rng = np.random.default_rng(seed)
+    t = np.arange(13, dtype=np.float64)
+    x = 0.1 * t + np.where(t >= 5, 0.8, 0.0) - np.where(t >= 9, 0.05 * (t - 9), 0.0) + rng.normal(0, 0.2, 13)
+    cost, best = _brute_force(x, penalty, min_size)
+    cps = pelt(x, penalty, min_size)
+    assert _total_cost(x, cps, penalty) == pytest.approx(cost, abs=1e-9)
+    assert cps == best
+
+
+def test_detect_level_jump():
+    years = np.arange(2000, 2020)
+    values = 100 * 1.05 ** (years - 2000) * np.where(years >= 2010, 1.3, 1.0)
+    values *= np.exp(np.random.default_rng(1).normal(0, 0.01, len(years)))
+    (brk,) = detect(years, values)
+    assert brk['year'] == 2010
+    assert brk['delta'] == pytest.approx(30, abs=1)
+
+
+def test_total_keeps_known_breaks():
+    store = DataStore.open(DEFAULT_DATA_DIR)
+    years = {b['year'] for b in detect(store.years, store['total'])}
+    assert {1998, 2003, 2020} <= years
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from dashboard.downsample import lttb, minmax
+
+
+@pytest.mark.parametrize('n, n_out', [(10_000, 2_000), (1_000, 3), (1_000, 999), (37, 10)])
+def test_lttb_size_and_endpoints(n, n_out):
+    rng = np.random.default_rng(n)
+    x, y = np.arange(n), np.cumsum(rng.normal(size=n))
+    idx = lttb(x, y, n_out)
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert (np.diff(idx) > 0).all()
+
+
+@pytest.mark.parametrize('n_out', [50, 100, 2])
+def test_lttb_keeps_short_series(n_out):
+    idx = lttb(np.arange(50), np.ones(50), n_out)
+    np.testing.assert_array_equal(idx, np.arange(50))
+
+
+def test_lttb_dates():
+    x = np.arange('2000-01-01', '2010-01-01', dtype='datetime64[D]')
+    idx = lttb(x, np.sin(np.arange(len(x)) / 30), 500)
+    assert len(idx) == 500 and idx[0] == 0 and idx[-1] == len(x) - 1
+
+
+def test_minmax_keeps_extremes():
+    rng = np.random.default_rng(5)
+    y = rng.normal(size=5_000)
+    idx = minmax(np.arange(len(y)), y, 200)
+    assert {0, len(y) - 1, int(y.argmin()), int(y.argmax())} <= set(idx.tolist())
+    assert (np.diff(idx) > 0).all()
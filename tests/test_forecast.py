@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from dashboard.forecast import LogLinearFit
+
+
+@pytest.mark.parametrize('split', [2, 5, 12])
+def test_extend_matches_full_fit(split):
+    rng = np.random.default_rng(split)
+    years = np.arange(1995, 2015)
+    values = 100 * 1.06 ** (years - 1995) * np.exp(rng.normal(0, 0.05, len(years)))
+    fit = LogLinearFit(years[:split], values[:split]).extend(years[split:], values[split:])
+    full = LogLinearFit(years, values)
+    np.testing.assert_allclose(fit.beta, full.beta, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(fit.P, full.P, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(fit.pinv, full.pinv, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(fit.resid, full.resid, atol=1e-9)
+
+
+def test_extend_leaves_original_untouched():
+    years, values = np.arange(2000, 2010), np.linspace(10, 30, 10)
+    fit = LogLinearFit(years, values)
+    beta = fit.beta.copy()
+    fit.extend([2010], [35.0])
+    assert len(fit.years) == 10
+    np.testing.assert_array_equal(fit.beta, beta)
+
+
+def test_extend_rejects_non_positive():
+    fit = LogLinearFit(np.arange(2000, 2005), np.arange(1.0, 6.0))
+    with pytest.raises(ValueError):
+        fit.extend([2005], [0.0])
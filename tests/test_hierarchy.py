@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from dashboard import hierarchy
+from dashboard.hierarchy import METHODS, NATIONAL, Hierarchy
+
+
+def _regional(n_regions=3, n_media=4):
+    return {f'r{i}_m{j}': ('Colombia', f'R{i}', f'M{j}', f'M{j}')
+            for i in range(n_regions) for j in range(n_media)}
+
+
+def _base(h, seed=0, horizon=6):
+    rng = np.random.default_rng(seed)
+    return h.aggregate(rng.uniform(10, 100, (len(h.leaves), horizon))) * rng.uniform(0.8, 1.2, (len(h), horizon))
+
+
+@pytest.mark.parametrize('paths', [NATIONAL, _regional()])
+@pytest.mark.parametrize('method', METHODS)
+def test_reconcile_is_coherent(paths, method):
+    h = Hierarchy(paths)
+    base = _base(h)
+    var = np.random.default_rng(1).uniform(0.5, 2.0, base.shape)
+    fc = h.reconcile(base, method, var)
+    assert fc.shape == base.shape
+    np.testing.assert_allclose(fc, h.aggregate(fc[h.leaf_rows]), rtol=1e-10)
+
+
+@pytest.mark.parametrize('method', ['ols', 'wls_struct'])
+def test_mint_matches_projection(method):
+    h = Hierarchy(_regional())
+    base = _base(h, seed=2)
+    S, Winv = h.S, np.diag(1 / h.weights(method))
+    expected = S @ np.linalg.solve(S.T @ Winv @ S, S.T @ Winv @ base)
+    np.testing.assert_allclose(h.reconcile(base, method), expected, rtol=1e-9)
+
+
+def test_sparse_matches_dense(monkeypatch):
+    paths = _regional()
+    dense = Hierarchy(paths)
+    monkeypatch.setattr(hierarchy, 'DENSE_MAX', 0)
+    sparse = Hierarchy(paths)
+    assert sparse.sparse and not dense.sparse
+    base = _base(dense, seed=3)
+    np.testing.assert_allclose(sparse.reconcile(base, 'wls_struct'), dense.reconcile(base, 'wls_struct'), rtol=1e-9)
+
+
+def test_coherent_base_is_unchanged():
+    h = Hierarchy(_regional())
+    base = h.aggregate(np.random.default_rng(4).uniform(1, 5, (len(h.leaves), 3)))
+    for method in ('ols', 'wls_struct'):
+        np.testing.assert_allclose(h.reconcile(base, method), base, rtol=1e-10)
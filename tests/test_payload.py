@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from dashboard.payload import _numeric, encode, rounded
+
+
+@pytest.mark.parametrize('a', [
+    np.arange(200),                                  # enteros: i1/u1…
+    np.arange(-40_000, 40_000, 7),                   # enteros que no caben en i2
+    np.linspace(0, 1, 300),                          # f4 alcanza para 6 cifras
+    np.geomspace(1e-3, 1e9, 300),                    # f8
+    np.r_[np.linspace(1, 2, 100), np.nan, 3.5],      # NaN en el arreglo
+    np.random.default_rng(0).normal(size=(20, 30)),  # matriz (heatmap)
+    np.array([1.5, 2.25]),                           # corto: sale como lista
+], ids=['int8', 'int32', 'f4', 'f8', 'nan', '2d', 'list'])
+def test_encode_round_trip(a):
+    out = _numeric(encode(a))
+    assert out.shape == a.shape
+    np.testing.assert_allclose(out, rounded(a), rtol=1e-6, equal_nan=True)
+
+
+def test_encode_picks_typed_array_when_shorter():
+    assert isinstance(encode(np.arange(500)), dict)
+    assert encode(np.array([1.0, 2.0])) == [1, 2]
+
+
+def test_integer_part_is_kept():
+    big = np.array([123_456_789.123, 987_654_321.987] * 50)
+    np.testing.assert_array_equal(_numeric(encode(big)), np.round(big))